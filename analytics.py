@@ -0,0 +1,237 @@
+"""
+Analytics engine for YourCarbonFootprint application.
+Rolling-window, period-over-period and cumulative emission totals, answered
+from cumulative sums over the ledger sorted by date.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Rolling window lengths (months) computed by rolling_summary()
+ROLLING_WINDOWS = [3, 6, 12]
+
+
+def _month_start(value):
+    """Return the first instant of the month containing a date or "YYYY-MM"."""
+    return pd.Period(value, freq="M").to_timestamp()
+
+
+class _SortedSeries:
+    """Dates of a set of entries in ascending order with running emission sums."""
+
+    def __init__(self, dates, emissions):
+        order = np.argsort(dates, kind="stable")
+        self.dates = dates[order]
+        # cumsum[i] is the sum of the first i entries, so any date range
+        # [start, end) sums to cumsum[j] - cumsum[i] after two binary searches
+        self.cumsum = np.concatenate([[0.0], np.cumsum(emissions[order])])
+
+    def positions(self, dates):
+        """Number of entries dated before each of the given dates."""
+        return np.searchsorted(self.dates, np.asarray(dates, dtype=self.dates.dtype), side="left")
+
+    def between(self, start, end):
+        """Sum of emissions dated in [start, end), or before end if start is None."""
+        if start is None:
+            i, j = 0, self.positions([end])[0]
+        else:
+            i, j = self.positions([start, end])
+        return float(self.cumsum[j] - self.cumsum[i])
+
+
+class EmissionsAnalytics:
+    """
+    Period totals over a snapshot of the ledger.
+
+    The entries are sorted by date once, overall and per value of each
+    dimension used (scope, category, ...), with running sums of
+    emissions_kgCO2e. Any period total is then the difference of two
+    running sums found by binary search, so comparisons cost O(log N)
+    per period instead of a scan of the ledger. Entries without a valid
+    date are left out.
+    """
+
+    def __init__(self, data):
+        """
+        Initialize the EmissionsAnalytics class.
+
+        Args:
+            data (pandas.DataFrame): Ledger with date and emissions_kgCO2e columns
+        """
+        dates = pd.to_datetime(data["date"], errors="coerce")
+        valid = dates.notna().to_numpy()
+        self._data = data.loc[valid]
+        self._dates = dates[valid].to_numpy(dtype="datetime64[ns]")
+        self._emissions = self._data["emissions_kgCO2e"].to_numpy(dtype="float64")
+        self._overall = _SortedSeries(self._dates, self._emissions)
+        # dimension -> {value: _SortedSeries}, built on first use
+        self._by = {}
+
+    def _series(self, by=None):
+        """Return {label: _SortedSeries}, one per value of by (a dimension or list)."""
+        if by is None:
+            return {"total": self._overall}
+        if isinstance(by, list):
+            by = by[0] if len(by) == 1 else tuple(by)
+        if by not in self._by:
+            groups = self._data.groupby(list(by) if isinstance(by, tuple) else by, observed=True, sort=True).indices
+            self._by[by] = {
+                value: _SortedSeries(self._dates[rows], self._emissions[rows])
+                for value, rows in groups.items()
+            }
+        return self._by[by]
+
+    def _result(self, columns, index, by):
+        """Shape per-group values as a Series (overall) or DataFrame (by)."""
+        frame = pd.DataFrame(columns, index=index)
+        if by is None:
+            return frame["total"].rename("emissions_kgCO2e")
+        frame.columns.name = by
+        return frame
+
+    def months(self):
+        """
+        Get the reporting months covered by the ledger.
+
+        Returns:
+            pandas.PeriodIndex: Every month from the first to the last entry
+        """
+        if len(self._overall.dates) == 0:
+            return pd.PeriodIndex([], freq="M")
+        first, last = self._overall.dates[0], self._overall.dates[-1]
+        return pd.period_range(pd.Period(first, freq="M"), pd.Period(last, freq="M"), freq="M")
+
+    def period_total(self, start, end, scope=None, category=None):
+        """
+        Get the emissions dated in [start, end).
+
+        Args:
+            start (datetime or str): First day of the period
+            end (datetime or str): Day after the period
+            scope (str, optional): Only count this scope
+            category (str, optional): Only count this category
+
+        Returns:
+            float: Emissions in kgCO2e
+        """
+        filters = {"scope": scope, "category": category}
+        by = [dimension for dimension, value in filters.items() if value is not None]
+        if not by:
+            series = self._overall
+        else:
+            key = tuple(filters[dimension] for dimension in by)
+            series = self._series(by).get(key if len(key) > 1 else key[0])
+        if series is None:
+            return 0.0
+        return series.between(pd.Timestamp(start), pd.Timestamp(end))
+
+    def monthly_totals(self, by=None):
+        """
+        Get emissions per month, including months without entries.
+
+        Args:
+            by (str, optional): Dimension to break totals down by, e.g. "scope"
+
+        Returns:
+            pandas.Series or pandas.DataFrame: Emissions per month ("YYYY-MM"),
+                one column per value of by if given
+        """
+        months = self.months()
+        columns = {label: [] for label in self._series(by)}
+        if len(months):
+            bounds = pd.period_range(months[0], months[-1] + 1, freq="M").to_timestamp()
+            for label, series in self._series(by).items():
+                columns[label] = np.diff(series.cumsum[series.positions(bounds)])
+        return self._result(columns, months.strftime("%Y-%m"), by)
+
+    def rolling(self, window, by=None):
+        """
+        Get trailing sums over the given number of months, ending each month.
+
+        Args:
+            window (int): Window length in months, e.g. 3, 6 or 12
+            by (str, optional): Dimension to break sums down by
+
+        Returns:
+            pandas.Series or pandas.DataFrame: Rolling emissions per month
+                ("YYYY-MM"); early months sum the months available
+        """
+        months = self.months()
+        columns = {label: [] for label in self._series(by)}
+        if len(months):
+            ends = pd.period_range(months[0] + 1, months[-1] + 1, freq="M").to_timestamp()
+            starts = (pd.PeriodIndex(months) - (window - 1)).to_timestamp()
+            for label, series in self._series(by).items():
+                cumsum = series.cumsum
+                columns[label] = cumsum[series.positions(ends)] - cumsum[series.positions(starts)]
+        return self._result(columns, months.strftime("%Y-%m"), by)
+
+    def rolling_summary(self, by=None):
+        """
+        Get rolling sums for every window in ROLLING_WINDOWS.
+
+        Returns:
+            dict: {window: rolling(window, by)}
+        """
+        return {window: self.rolling(window, by) for window in ROLLING_WINDOWS}
+
+    def period_over_period(self, month, lag, by=None):
+        """
+        Compare a month with the month lag months earlier.
+
+        Args:
+            month (datetime or str): Month to compare, e.g. "2024-05"
+            lag (int): Months between the compared months (1 = MoM, 12 = YoY)
+            by (str, optional): Dimension to break the comparison down by
+
+        Returns:
+            pandas.DataFrame: current, previous, delta and change_pct (None
+                where the earlier month has no emissions), one row per value
+                of by or a single "total" row
+        """
+        current_start = _month_start(month)
+        current_end = current_start + pd.DateOffset(months=1)
+        previous_start = current_start - pd.DateOffset(months=lag)
+        previous_end = previous_start + pd.DateOffset(months=1)
+
+        rows = {}
+        for label, series in self._series(by).items():
+            current = series.between(current_start, current_end)
+            previous = series.between(previous_start, previous_end)
+            rows[label] = {
+                "current": current,
+                "previous": previous,
+                "delta": current - previous,
+                "change_pct": (current - previous) / previous * 100 if previous > 0 else None,
+            }
+        result = pd.DataFrame.from_dict(rows, orient="index", columns=["current", "previous", "delta", "change_pct"])
+        result.index.name = by
+        return result
+
+    def month_over_month(self, month, by=None):
+        """Compare a month with the previous month. See period_over_period()."""
+        return self.period_over_period(month, 1, by)
+
+    def year_over_year(self, month, by=None):
+        """Compare a month with the same month a year earlier. See period_over_period()."""
+        return self.period_over_period(month, 12, by)
+
+    def cumulative_to_date(self, date, by=None, start=None):
+        """
+        Get emissions dated up to and including a date.
+
+        Args:
+            date (datetime or str): Last day to include
+            by (str, optional): Dimension to break totals down by
+            start (datetime or str, optional): First day to include, e.g. the
+                start of the year for year-to-date; defaults to all history
+
+        Returns:
+            pandas.Series: Emissions per value of by, or a single "total"
+        """
+        end = pd.Timestamp(date).normalize() + pd.Timedelta(days=1)
+        start = pd.Timestamp(start) if start is not None else None
+        totals = {label: series.between(start, end) for label, series in self._series(by).items()}
+        result = pd.Series(totals, dtype="float64", name="emissions_kgCO2e")
+        result.index.name = by
+        return result
@@ -9,7 +9,11 @@ import plotly.express as px
 import plotly.graph_objects as go
 from dotenv import load_dotenv
 import base64
-from io import BytesIO
+from config import DASHBOARD_CACHE_ENTRIES, LEDGER_COLUMNS
+from csv_import import CSVImportError, iter_csv_chunks, read_csv_files
+from ledger_store import get_ledger_store
+from report_jobs import DONE, FAILED, QUEUED, RUNNING, get_report_queue
+from shared_ledger import get_shared_ledger
 
 # Load environment variables
 load_dotenv()
@@ -17,95 +21,44 @@ load_dotenv()
 # Ensure data directory exists
 os.makedirs("data", exist_ok=True)
 
+# Process-wide emissions ledger (snapshot + append-only journal) and the
+# cached copy of it shared by every session
+ledger_store = get_ledger_store()
+shared_ledger = get_shared_ledger(ledger_store)
+
+# Process-wide queue rendering reports in the background (data/reports/)
+report_queue = get_report_queue()
+
 # Set page config for wide layout
 st.set_page_config(page_title="YourCarbonFootprint", page_icon="🌍", layout="wide")
 
 # Initialize session state variables if they don't exist
 if "language" not in st.session_state:
     st.session_state.language = "English"
-if "emissions_data" not in st.session_state:
-    # Load data if exists, otherwise create empty dataframe
-    if os.path.exists("data/emissions.json"):
-        try:
-            with open("data/emissions.json", "r") as f:
-                data = f.read().strip()
-                if data:  # Check if file is not empty
-                    try:
-                        st.session_state.emissions_data = pd.DataFrame(json.loads(data))
-                    except json.JSONDecodeError:
-                        # Create a backup of the corrupted file
-                        backup_file = f"data/emissions_backup_{int(time.time())}.json"
-                        shutil.copy("data/emissions.json", backup_file)
-                        st.warning(
-                            f"Corrupted emissions data file found. A backup has been created at {backup_file}"
-                        )
-                        # Create empty dataframe
-                        st.session_state.emissions_data = pd.DataFrame(
-                            columns=[
-                                "date",
-                                "scope",
-                                "category",
-                                "activity",
-                                "quantity",
-                                "unit",
-                                "emission_factor",
-                                "emissions_kgCO2e",
-                                "notes",
-                            ]
-                        )
-                else:
-                    # Empty file, create new DataFrame
-                    st.session_state.emissions_data = pd.DataFrame(
-                        columns=[
-                            "date",
-                            "scope",
-                            "category",
-                            "activity",
-                            "quantity",
-                            "unit",
-                            "emission_factor",
-                            "emissions_kgCO2e",
-                            "notes",
-                        ]
-                    )
-        except Exception as e:
-            st.error(f"Error loading emissions data: {str(e)}")
-            # Create empty dataframe if loading fails
-            st.session_state.emissions_data = pd.DataFrame(
-                columns=[
-                    "date",
-                    "scope",
-                    "category",
-                    "activity",
-                    "quantity",
-                    "unit",
-                    "emission_factor",
-                    "emissions_kgCO2e",
-                    "notes",
-                ]
-            )
-            # Make sure data directory exists
-            os.makedirs("data", exist_ok=True)
-    else:
-        st.session_state.emissions_data = pd.DataFrame(
-            columns=[
-                "date",
-                "scope",
-                "category",
-                "activity",
-                "quantity",
-                "unit",
-                "emission_factor",
-                "emissions_kgCO2e",
-                "notes",
-            ]
+if "ledger_loaded" not in st.session_state:
+    # Load the shared ledger once per process; later sessions reuse it
+    try:
+        shared_ledger.frame()
+    except json.JSONDecodeError:
+        # Move the corrupted file aside so the ledger starts from the journal
+        backup_file = f"data/emissions_backup_{int(time.time())}.json"
+        shutil.move("data/emissions.json", backup_file)
+        st.warning(
+            f"Corrupted emissions data file found. A backup has been created at {backup_file}"
         )
-        # Make sure data directory exists
-        os.makedirs("data", exist_ok=True)
+    except Exception as e:
+        st.error(f"Error loading emissions data: {str(e)}")
+    st.session_state.ledger_loaded = True
 if "theme" not in st.session_state:
     st.session_state.theme = "dark"
 if "active_page" not in st.session_state:
     st.session_state.active_page = "AI Insights"
+if "report_jobs" not in st.session_state:
+    # Ids of the report jobs this session submitted
+    st.session_state.report_jobs = []
+if "imported_uploads" not in st.session_state:
+    # Ids of uploaded files already imported, so reruns do not import them again
+    st.session_state.imported_uploads = set()
 
 # Translation dictionary
 translations = {
@@ -204,35 +157,34 @@ def t(key):
     return translations.get(lang, {}).get(key, key)
 
 
-# Function to save emissions data
-def save_emissions_data():
+# Function to get the emissions data
+def get_emissions_data():
+    """Return the ledger shared by all sessions of this process."""
     try:
-        # Create data directory if it doesn't exist
-        os.makedirs("data", exist_ok=True)
-
-        # Create a backup of the existing file if it exists
-        if os.path.exists("data/emissions.json"):
-            backup_path = "data/emissions_backup.json"
-            try:
-                with (
-                    open("data/emissions.json", "r") as src,
-                    open(backup_path, "w") as dst,
-                ):
-                    dst.write(src.read())
-            except Exception:
-                # Continue even if backup fails
-                pass
-
-        # Save data to JSON file with proper formatting
-        with open("data/emissions.json", "w") as f:
-            if len(st.session_state.emissions_data) > 0:
-                json.dump(
-                    st.session_state.emissions_data.to_dict("records"), f, indent=2
-                )
-            else:
-                # Write empty array if no data
-                f.write("[]")
+        return shared_ledger.frame()
+    except Exception as e:
+        st.error(f"Error loading emissions data: {str(e)}")
+        return pd.DataFrame(columns=LEDGER_COLUMNS)
+
+
+@st.cache_resource(max_entries=DASHBOARD_CACHE_ENTRIES, show_spinner=False)
+def memoize_by_version(key, ledger_version, _compute):
+    """
+    Compute a dashboard value once per ledger version, shared by all sessions.
+
+    Entries are keyed by (key, ledger_version); the least recently used are
+    evicted once more than DASHBOARD_CACHE_ENTRIES are held, so results for
+    superseded versions age out. The returned object is shared and must not
+    be modified.
+    """
+    return _compute()
 
+
+# Function to persist new emission entries
+def append_emissions_data(entries):
+    """Append entries to the ledger, updating the shared copy in place."""
+    try:
+        shared_ledger.append(entries)
         return True
     except Exception as e:
         st.error(f"Error saving data: {str(e)}")
@@ -286,29 +238,26 @@ def add_emission_entry(
             ]
         )
 
-        # Add to existing data
-        st.session_state.emissions_data = pd.concat(
-            [st.session_state.emissions_data, new_entry], ignore_index=True
-        )
-
         # Save data and return success/failure
-        return save_emissions_data()
+        return append_emissions_data(new_entry)
     except Exception as e:
         st.error(f"Error adding entry: {str(e)}")
         return False
 
 
-def delete_emission_entry(index):
+def delete_emission_entry(index, entry_ids):
+    """
+    Delete the entry at a row of the table as it was shown.
+
+    The ledger is shared and may have changed since the table was rendered,
+    so the row is resolved against the entry ids displayed, not the
+    current frame.
+    """
     try:
-        # Make a copy of the current data
-        if len(st.session_state.emissions_data) > index:
-            # Drop the row at the specified index
-            st.session_state.emissions_data = st.session_state.emissions_data.drop(
-                index
-            ).reset_index(drop=True)
-
-            # Save data and return success/failure
-            return save_emissions_data()
+        if entry_ids is not None and len(entry_ids) > index:
+            # Record a tombstone for the entry and drop it from the shared copy
+            shared_ledger.delete([entry_ids.iloc[index]])
+            return True
         else:
             st.error("Invalid index for deletion")
             return False
@@ -318,88 +267,129 @@ def delete_emission_entry(index):
 
 
 # Function to process uploaded CSV
-def process_csv(uploaded_file):
-    """Process uploaded CSV file and add to emissions data."""
-    try:
-        # Read CSV file
-        df = pd.read_csv(uploaded_file)
-        required_columns = [
-            "date",
-            "scope",
-            "category",
-            "activity",
-            "quantity",
-            "unit",
-            "emission_factor",
-        ]
-
-        # Check if all required columns exist
-        if not all(col in df.columns for col in required_columns):
-            st.error(
-                f"CSV must contain all required columns: {', '.join(required_columns)}"
-            )
-            return False
-
-        # Validate data types
-        try:
-            # Convert quantity and emission_factor to float
-            df["quantity"] = df["quantity"].astype(float)
-            df["emission_factor"] = df["emission_factor"].astype(float)
+def skipped_note(skipped):
+    """Describe rows skipped by an import because they were already present."""
+    if skipped == 0:
+        return ""
+    return f" ({skipped} already present, skipped)"
 
-            # Validate dates
-            df["date"] = pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d")
-        except Exception as e:
-            st.error(f"Data validation error: {str(e)}")
-            return False
-
-        # Calculate emissions if not provided
-        if "emissions_kgCO2e" not in df.columns:
-            df["emissions_kgCO2e"] = df["quantity"] * df["emission_factor"]
-
-        # Add enterprise fields if not present
-        enterprise_fields = {
-            "business_unit": "Corporate",
-            "project": "Not Applicable",
-            "country": "India",
-            "facility": "",
-            "responsible_person": "",
-            "data_quality": "Medium",
-            "verification_status": "Unverified",
-            "notes": "",
-        }
 
-        # Add missing columns with default values
-        for field, default_value in enterprise_fields.items():
-            if field not in df.columns:
-                df[field] = default_value
+def process_csv(uploaded_file, resolve_factors=False):
+    """Import an uploaded CSV file in chunks, showing progress."""
+    progress_bar = st.progress(0.0, text="Validating CSV...")
 
-        # Append to existing data
-        st.session_state.emissions_data = pd.concat(
-            [st.session_state.emissions_data, df], ignore_index=True
+    def show_progress(done, total):
+        progress_bar.progress(
+            done / total if total else 1.0, text=f"Imported {done:,} of {total:,} rows"
         )
 
-        # Save data
-        if save_emissions_data():
-            st.success(f"Successfully added {len(df)} entries")
-            return True
-        else:
-            st.error("Failed to save data")
-            return False
+    try:
+        count, skipped = shared_ledger.append_chunks(
+            iter_csv_chunks(
+                uploaded_file, progress=show_progress, resolve_factors=resolve_factors
+            )
+        )
+        st.success(f"Successfully added {count} entries{skipped_note(skipped)}")
+        return True
+    except CSVImportError as e:
+        st.error(str(e))
+        return False
     except Exception as e:
         st.error(f"Error processing CSV: {str(e)}")
         return False
+    finally:
+        progress_bar.empty()
+
+
+def process_csv_files(uploaded_files, resolve_factors=False):
+    """Import several uploaded CSV files, parsed in parallel, in one batch."""
+    progress_bar = st.progress(0.0, text="Validating CSV files...")
 
+    def show_progress(done, total):
+        progress_bar.progress(done / total, text=f"Processed {done} of {total} files")
 
-# Function to generate PDF report
-def generate_report():
-    # Create a BytesIO object
-    buffer = BytesIO()
+    try:
+        frames = read_csv_files(
+            [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files],
+            progress=show_progress,
+            resolve_factors=resolve_factors,
+        )
+        count, skipped = shared_ledger.append_files(frames)
+        st.success(
+            f"Successfully added {count} entries from {len(uploaded_files)} files"
+            f"{skipped_note(skipped)}"
+        )
+        return True
+    except CSVImportError as e:
+        st.error(str(e))
+        return False
+    except Exception as e:
+        st.error(f"Error processing CSV files: {str(e)}")
+        return False
+    finally:
+        progress_bar.empty()
 
-    # Create a simple CSV report for now
-    st.session_state.emissions_data.to_csv(buffer, index=False)
-    buffer.seek(0)
 
-    return buffer
+# Function to queue a report for background rendering
+def submit_report(kind, start_date=None, end_date=None):
+    """Queue a PDF report ("pdf") or CSV export ("csv") of the shared ledger."""
+    if kind == "pdf":
+        job_id = report_queue.submit_pdf(shared_ledger, start_date, end_date)
+    else:
+        job_id = report_queue.submit_csv(shared_ledger, start_date, end_date)
+    st.session_state.report_jobs.insert(0, job_id)
+    return job_id
+
+
+def request_report_download(job_id):
+    """Select the finished report whose file the jobs list offers for download."""
+    st.session_state.report_download = job_id
+
+
+def show_report_jobs():
+    """List this session's report jobs, polling their progress while any is unfinished."""
+    jobs = report_queue.jobs(st.session_state.report_jobs)
+    polling = any(job["status"] in (QUEUED, RUNNING) for job in jobs)
+    st.fragment(list_report_jobs, run_every=2 if polling else None)(polling)
+
+
+def list_report_jobs(polling):
+    """Render the report jobs; run as a fragment by show_report_jobs()."""
+    jobs = report_queue.jobs(st.session_state.report_jobs)
+    if not jobs:
+        st.info("No reports requested yet.")
+        return
+    for job in jobs:
+        label = f"{job['file_name']} (requested {job['submitted_at'].replace('T', ' ')})"
+        if job["status"] == DONE:
+            # Only the report the user asked for is read, once they ask for it
+            if st.session_state.get("report_download") == job["id"]:
+                data = report_queue.read(job["id"])
+                if data is None:
+                    st.warning(f"{label}: no longer available")
+                else:
+                    st.download_button(
+                        label=f"⬇️ {label}",
+                        data=data,
+                        file_name=job["file_name"],
+                        mime=job["mime"],
+                        key=f"download_{job['id']}",
+                    )
+            else:
+                st.button(
+                    f"📄 {label}",
+                    key=f"fetch_{job['id']}",
+                    help="Prepare this report for download",
+                    on_click=request_report_download,
+                    args=(job["id"],),
+                )
+        elif job["status"] == FAILED:
+            st.error(f"{label}: {job['error']}")
+        else:
+            st.progress(job["progress"], text=f"{label}: {job['status']}")
+    if polling and not any(job["status"] in (QUEUED, RUNNING) for job in jobs):
+        # Everything finished: rerun the page so the list stops polling
+        st.rerun()
 
 
 # Custom CSS
@@ -1103,11 +1093,14 @@ with st.sidebar:
         unsafe_allow_html=True,
     )
 
+# Emissions data for this run, shared with every other session
+emissions_data = get_emissions_data()
+
 # Main content
 if st.session_state.active_page == "Dashboard":
     st.markdown(f"<h1 class='fade-in'>🌍 {t('dashboard')}</h1>", unsafe_allow_html=True)
 
-    if len(st.session_state.emissions_data) == 0:
+    if len(emissions_data) == 0:
         st.markdown(
             f"""
             <div class='info-box fade-in'>
@@ -1164,56 +1157,55 @@ if st.session_state.active_page == "Dashboard":
                 color_scheme="success",
             )
     else:
-        # Calculate metrics
-        # Ensure emissions_kgCO2e is numeric
-        st.session_state.emissions_data["emissions_kgCO2e"] = pd.to_numeric(
-            st.session_state.emissions_data["emissions_kgCO2e"], errors="coerce"
-        )
+        # Calculate metrics from the aggregate cube, which the shared ledger
+        # keeps up to date, so no metric or chart scans the ledger rows.
+        # Results are memoized per ledger version and shared by all sessions.
+        ledger_version, _, cube = shared_ledger.snapshot()
+        current_month = datetime.now().replace(day=1)
+        current_month_key = current_month.strftime("%Y-%m")
 
-        # Replace NaN with 0
-        st.session_state.emissions_data["emissions_kgCO2e"].fillna(0, inplace=True)
+        def compute_metrics():
+            monthly_totals = cube.by(["month"]).set_index("month")["emissions_kgCO2e"]
 
-        total_emissions = st.session_state.emissions_data["emissions_kgCO2e"].sum()
+            # Current month emissions (including any future-dated entries)
+            current_month_emissions = monthly_totals[
+                monthly_totals.index >= current_month_key
+            ].sum()
 
-        # Calculate additional metrics
-        df = st.session_state.emissions_data.copy()
-        df["date"] = pd.to_datetime(df["date"], errors="coerce")
+            # Previous month for comparison
+            previous_month = current_month - pd.DateOffset(months=1)
+            previous_month_emissions = monthly_totals.get(
+                previous_month.strftime("%Y-%m"), 0
+            )
 
-        # Current month emissions
-        current_month = datetime.now().replace(day=1)
-        current_month_data = df[df["date"] >= current_month]
-        current_month_emissions = (
-            current_month_data["emissions_kgCO2e"].sum()
-            if len(current_month_data) > 0
-            else 0
-        )
+            # Calculate trend
+            trend = None
+            if previous_month_emissions > 0:
+                trend = (
+                    (current_month_emissions - previous_month_emissions)
+                    / previous_month_emissions
+                ) * 100
+
+            # Average monthly emissions
+            monthly_avg = monthly_totals.mean() if len(monthly_totals) > 0 else 0
+            return (
+                cube.total(),
+                current_month_emissions,
+                trend,
+                monthly_avg,
+                cube.entries(),
+            )
 
-        # Previous month for comparison
-        previous_month = current_month - pd.DateOffset(months=1)
-        previous_month_data = df[
-            (df["date"] >= previous_month) & (df["date"] < current_month)
-        ]
-        previous_month_emissions = (
-            previous_month_data["emissions_kgCO2e"].sum()
-            if len(previous_month_data) > 0
-            else 0
+        (
+            total_emissions,
+            current_month_emissions,
+            trend,
+            monthly_avg,
+            entry_count,
+        ) = memoize_by_version(
+            f"metrics-{current_month_key}", ledger_version, compute_metrics
         )
 
-        # Calculate trend
-        trend = None
-        if previous_month_emissions > 0:
-            trend = (
-                (current_month_emissions - previous_month_emissions)
-                / previous_month_emissions
-            ) * 100
-
-        # Average monthly emissions
-        if len(df) > 0:
-            df["month"] = df["date"].dt.to_period("M")
-            monthly_avg = df.groupby("month")["emissions_kgCO2e"].sum().mean()
-        else:
-            monthly_avg = 0
-
         # Display enhanced metrics
         col1, col2, col3, col4 = st.columns(4)
         with col1:
@@ -1245,7 +1237,6 @@ if st.session_state.active_page == "Dashboard":
                 color_scheme="accent",
             )
         with col4:
-            entry_count = len(st.session_state.emissions_data)
             # Calculate carbon intensity (emissions per entry)
             intensity = total_emissions / entry_count if entry_count > 0 else 0
             metric_card(
@@ -1266,10 +1257,8 @@ if st.session_state.active_page == "Dashboard":
         # Check if there are any non-zero emissions before creating charts
         if total_emissions > 0:
             # Create scope data for pie chart
-            scope_data = (
-                st.session_state.emissions_data.groupby("scope")["emissions_kgCO2e"]
-                .sum()
-                .reset_index()
+            scope_data = memoize_by_version(
+                "scope_data", ledger_version, lambda: cube.by(["scope"])
             )
 
             # Only create chart if we have data with emissions
@@ -1277,41 +1266,45 @@ if st.session_state.active_page == "Dashboard":
                 col_chart, col_summary = st.columns([2, 1])
 
                 with col_chart:
-                    fig1 = px.pie(
-                        scope_data,
-                        values="emissions_kgCO2e",
-                        names="scope",
-                        color="scope",
-                        color_discrete_map={
-                            "Scope 1": "#059669",
-                            "Scope 2": "#3b82f6",
-                            "Scope 3": "#f59e0b",
-                        },
-                        hole=0.5,
-                        title="Emissions Distribution by Scope",
-                    )
-                    fig1.update_traces(
-                        textposition="auto",
-                        textinfo="percent+label",
-                        hovertemplate="<b>%{label}</b><br>Emissions: %{value:.2f} kgCO2e<br>Percentage: %{percent}<extra></extra>",
-                        textfont_size=12,
-                        marker=dict(line=dict(color="#ffffff", width=2)),
-                    )
-                    fig1.update_layout(
-                        margin=dict(t=60, b=40, l=40, r=40),
-                        legend=dict(
-                            orientation="v",
-                            yanchor="middle",
-                            y=0.5,
-                            xanchor="left",
-                            x=1.05,
-                        ),
-                        height=450,
-                        font=dict(family="Inter, sans-serif", size=12),
-                        title=dict(font=dict(size=16, color="#111827"), x=0.5),
-                        plot_bgcolor="rgba(0,0,0,0)",
-                        paper_bgcolor="rgba(0,0,0,0)",
-                    )
+                    def build_scope_figure():
+                        fig1 = px.pie(
+                            scope_data,
+                            values="emissions_kgCO2e",
+                            names="scope",
+                            color="scope",
+                            color_discrete_map={
+                                "Scope 1": "#059669",
+                                "Scope 2": "#3b82f6",
+                                "Scope 3": "#f59e0b",
+                            },
+                            hole=0.5,
+                            title="Emissions Distribution by Scope",
+                        )
+                        fig1.update_traces(
+                            textposition="auto",
+                            textinfo="percent+label",
+                            hovertemplate="<b>%{label}</b><br>Emissions: %{value:.2f} kgCO2e<br>Percentage: %{percent}<extra></extra>",
+                            textfont_size=12,
+                            marker=dict(line=dict(color="#ffffff", width=2)),
+                        )
+                        fig1.update_layout(
+                            margin=dict(t=60, b=40, l=40, r=40),
+                            legend=dict(
+                                orientation="v",
+                                yanchor="middle",
+                                y=0.5,
+                                xanchor="left",
+                                x=1.05,
+                            ),
+                            height=450,
+                            font=dict(family="Inter, sans-serif", size=12),
+                            title=dict(font=dict(size=16, color="#111827"), x=0.5),
+                            plot_bgcolor="rgba(0,0,0,0)",
+                            paper_bgcolor="rgba(0,0,0,0)",
+                        )
+                        return fig1
+
+                    fig1 = memoize_by_version("scope_figure", ledger_version, build_scope_figure)
                     st.plotly_chart(
                         fig1, use_container_width=True, config={"displayModeBar": False}
                     )
@@ -1367,15 +1360,12 @@ if st.session_state.active_page == "Dashboard":
 
             if total_emissions > 0:
                 # Create category data for bar chart
-                category_data = (
-                    st.session_state.emissions_data.groupby("category")[
-                        "emissions_kgCO2e"
-                    ]
-                    .sum()
-                    .reset_index()
-                )
-                category_data = category_data.sort_values(
-                    "emissions_kgCO2e", ascending=False
+                category_data = memoize_by_version(
+                    "category_data",
+                    ledger_version,
+                    lambda: cube.by(["category"]).sort_values(
+                        "emissions_kgCO2e", ascending=False
+                    ),
                 )
 
                 # Only create chart if we have data with emissions
@@ -1386,36 +1376,40 @@ if st.session_state.active_page == "Dashboard":
                     # Take top 8 categories to avoid clutter
                     top_categories = category_data.head(8)
 
-                    fig2 = px.bar(
-                        top_categories,
-                        x="emissions_kgCO2e",
-                        y="category",
-                        orientation="h",
-                        color="emissions_kgCO2e",
-                        color_continuous_scale="Viridis",
-                        labels={
-                            "emissions_kgCO2e": "Emissions (kgCO2e)",
-                            "category": "Category",
-                        },
-                        title="Top Emission Categories",
-                    )
-                    fig2.update_traces(
-                        hovertemplate="<b>%{y}</b><br>Emissions: %{x:.2f} kgCO2e<extra></extra>",
-                        texttemplate="%{x:.1f}",
-                        textposition="outside",
-                    )
-                    fig2.update_layout(
-                        showlegend=False,
-                        margin=dict(t=60, b=40, l=40, r=40),
-                        height=450,
-                        font=dict(family="Inter, sans-serif", size=12),
-                        title=dict(font=dict(size=16, color="#111827"), x=0.5),
-                        plot_bgcolor="rgba(0,0,0,0)",
-                        paper_bgcolor="rgba(0,0,0,0)",
-                        xaxis=dict(showgrid=True, gridcolor="rgba(0,0,0,0.1)"),
-                        yaxis=dict(showgrid=False),
-                        coloraxis_colorbar=dict(title="kgCO2e"),
-                    )
+                    def build_category_figure():
+                        fig2 = px.bar(
+                            top_categories,
+                            x="emissions_kgCO2e",
+                            y="category",
+                            orientation="h",
+                            color="emissions_kgCO2e",
+                            color_continuous_scale="Viridis",
+                            labels={
+                                "emissions_kgCO2e": "Emissions (kgCO2e)",
+                                "category": "Category",
+                            },
+                            title="Top Emission Categories",
+                        )
+                        fig2.update_traces(
+                            hovertemplate="<b>%{y}</b><br>Emissions: %{x:.2f} kgCO2e<extra></extra>",
+                            texttemplate="%{x:.1f}",
+                            textposition="outside",
+                        )
+                        fig2.update_layout(
+                            showlegend=False,
+                            margin=dict(t=60, b=40, l=40, r=40),
+                            height=450,
+                            font=dict(family="Inter, sans-serif", size=12),
+                            title=dict(font=dict(size=16, color="#111827"), x=0.5),
+                            plot_bgcolor="rgba(0,0,0,0)",
+                            paper_bgcolor="rgba(0,0,0,0)",
+                            xaxis=dict(showgrid=True, gridcolor="rgba(0,0,0,0.1)"),
+                            yaxis=dict(showgrid=False),
+                            coloraxis_colorbar=dict(title="kgCO2e"),
+                        )
+                        return fig2
+
+                    fig2 = memoize_by_version("category_figure", ledger_version, build_category_figure)
                     st.plotly_chart(
                         fig2, use_container_width=True, config={"displayModeBar": False}
                     )
@@ -1446,73 +1440,63 @@ if st.session_state.active_page == "Dashboard":
                 unsafe_allow_html=True,
             )
 
-            if (
-                total_emissions > 0
-                and "date" in st.session_state.emissions_data.columns
-            ):
-                # Convert date column to datetime
-                time_data = st.session_state.emissions_data.copy()
-                time_data["date"] = pd.to_datetime(time_data["date"], errors="coerce")
-
-                # Filter out rows with invalid dates
-                time_data = time_data.dropna(subset=["date"])
-
-                if not time_data.empty:
-                    # Create month column for aggregation
-                    time_data["month"] = time_data["date"].dt.strftime("%Y-%m")
-
-                    # Group by month and scope
-                    monthly_data = (
-                        time_data.groupby(["month", "scope"])["emissions_kgCO2e"]
-                        .sum()
-                        .reset_index()
-                    )
+            if total_emissions > 0:
+                # Monthly emissions by scope; entries without a valid date
+                # are left out
+                monthly_data = memoize_by_version(
+                    "monthly_data", ledger_version, lambda: cube.by(["month", "scope"])
+                )
 
+                if not monthly_data.empty:
                     if len(monthly_data["month"].unique()) > 0:
                         # Create enhanced line chart
-                        fig3 = px.line(
-                            monthly_data,
-                            x="month",
-                            y="emissions_kgCO2e",
-                            color="scope",
-                            markers=True,
-                            color_discrete_map={
-                                "Scope 1": "#059669",
-                                "Scope 2": "#3b82f6",
-                                "Scope 3": "#f59e0b",
-                            },
-                            labels={
-                                "emissions_kgCO2e": "Emissions (kgCO2e)",
-                                "month": "Month",
-                                "scope": "Scope",
-                            },
-                            title="Monthly Emissions Trend",
-                        )
-                        fig3.update_traces(
-                            line=dict(width=3),
-                            marker=dict(size=8, line=dict(width=2, color="white")),
-                            hovertemplate="<b>%{fullData.name}</b><br>Month: %{x}<br>Emissions: %{y:.2f} kgCO2e<extra></extra>",
-                        )
-                        fig3.update_layout(
-                            margin=dict(t=60, b=40, l=40, r=40),
-                            xaxis_title="Month",
-                            yaxis_title="Emissions (kgCO2e)",
-                            legend_title="Scope",
-                            height=450,
-                            font=dict(family="Inter, sans-serif", size=12),
-                            title=dict(font=dict(size=16, color="#111827"), x=0.5),
-                            plot_bgcolor="rgba(0,0,0,0)",
-                            paper_bgcolor="rgba(0,0,0,0)",
-                            xaxis=dict(showgrid=True, gridcolor="rgba(0,0,0,0.1)"),
-                            yaxis=dict(showgrid=True, gridcolor="rgba(0,0,0,0.1)"),
-                            legend=dict(
-                                orientation="h",
-                                yanchor="bottom",
-                                y=1.02,
-                                xanchor="center",
-                                x=0.5,
-                            ),
-                        )
+                        def build_trend_figure():
+                            fig3 = px.line(
+                                monthly_data,
+                                x="month",
+                                y="emissions_kgCO2e",
+                                color="scope",
+                                markers=True,
+                                color_discrete_map={
+                                    "Scope 1": "#059669",
+                                    "Scope 2": "#3b82f6",
+                                    "Scope 3": "#f59e0b",
+                                },
+                                labels={
+                                    "emissions_kgCO2e": "Emissions (kgCO2e)",
+                                    "month": "Month",
+                                    "scope": "Scope",
+                                },
+                                title="Monthly Emissions Trend",
+                            )
+                            fig3.update_traces(
+                                line=dict(width=3),
+                                marker=dict(size=8, line=dict(width=2, color="white")),
+                                hovertemplate="<b>%{fullData.name}</b><br>Month: %{x}<br>Emissions: %{y:.2f} kgCO2e<extra></extra>",
+                            )
+                            fig3.update_layout(
+                                margin=dict(t=60, b=40, l=40, r=40),
+                                xaxis_title="Month",
+                                yaxis_title="Emissions (kgCO2e)",
+                                legend_title="Scope",
+                                height=450,
+                                font=dict(family="Inter, sans-serif", size=12),
+                                title=dict(font=dict(size=16, color="#111827"), x=0.5),
+                                plot_bgcolor="rgba(0,0,0,0)",
+                                paper_bgcolor="rgba(0,0,0,0)",
+                                xaxis=dict(showgrid=True, gridcolor="rgba(0,0,0,0.1)"),
+                                yaxis=dict(showgrid=True, gridcolor="rgba(0,0,0,0.1)"),
+                                legend=dict(
+                                    orientation="h",
+                                    yanchor="bottom",
+                                    y=1.02,
+                                    xanchor="center",
+                                    x=0.5,
+                                ),
+                            )
+                            return fig3
+
+                        fig3 = memoize_by_version("trend_figure", ledger_version, build_trend_figure)
                         st.plotly_chart(
                             fig3,
                             use_container_width=True,
@@ -1565,7 +1549,7 @@ elif st.session_state.active_page == "Data Entry":
         unsafe_allow_html=True,
     )
 
-    tabs = st.tabs(["🖊️ Manual Entry", "📁 CSV Upload"])
+    tabs = st.tabs(["🖊️ Manual Entry", "📁 CSV Upload", "📄 Reports"])
 
     with tabs[0]:
         st.markdown(
@@ -2068,11 +2052,15 @@ elif st.session_state.active_page == "Data Entry":
                 st.info("💾 Draft saved! You can return to complete this entry later.")
 
     # Show existing data table
-    if len(st.session_state.emissions_data) > 0:
+    if len(emissions_data) > 0:
         st.markdown("<h3>Existing Emissions Data</h3>", unsafe_allow_html=True)
 
         # Create a copy of the dataframe with an action column
-        display_df = st.session_state.emissions_data.copy()
+        display_df = emissions_data.copy()
+
+        # Entry ids of the table as last shown, which a delete click refers to
+        shown_entry_ids = st.session_state.get("shown_entry_ids")
+        st.session_state.shown_entry_ids = emissions_data["entry_id"]
 
         # Add a column for the delete action
         col1, col2 = st.columns([3, 1])
@@ -2082,6 +2070,7 @@ elif st.session_state.active_page == "Data Entry":
             st.dataframe(
                 display_df,
                 column_config={
+                    "entry_id": None,
                     "date": st.column_config.DateColumn("Date"),
                     "business_unit": st.column_config.TextColumn("Business Unit"),
                     "project": st.column_config.TextColumn("Project"),
@@ -2120,10 +2109,11 @@ elif st.session_state.active_page == "Data Entry":
                 max_value=len(display_df) - 1 if len(display_df) > 0 else 0,
                 step=1,
                 help="Enter the index number of the entry you want to delete",
+                key="entry_to_delete",
             )
 
             if st.button("🗑️ Delete Selected Entry", type="primary"):
-                if delete_emission_entry(entry_to_delete):
+                if delete_emission_entry(entry_to_delete, shown_entry_ids):
                     st.success(f"Entry {entry_to_delete} deleted successfully!")
                     st.rerun()
                 else:
@@ -2132,9 +2122,17 @@ elif st.session_state.active_page == "Data Entry":
     with tabs[1]:
         st.markdown("<h3>Upload CSV File</h3>", unsafe_allow_html=True)
 
+        resolve_factors = st.checkbox(
+            "Look up missing emission factors",
+            help="Rows without an emission_factor get the factor for their category, "
+            "activity and unit from the built-in factor database; unit may be left out",
+        )
         uploaded_file = st.file_uploader(t("upload_csv"), type="csv")
         if uploaded_file is not None:
-            if process_csv(uploaded_file):
+            if uploaded_file.file_id in st.session_state.imported_uploads:
+                st.info("This file has already been imported.")
+            elif process_csv(uploaded_file, resolve_factors):
+                st.session_state.imported_uploads.add(uploaded_file.file_id)
                 st.success(t("csv_uploaded"))
                 # Redirect to Dashboard after successful upload
                 st.session_state.active_page = "Dashboard"
@@ -2142,6 +2140,22 @@ elif st.session_state.active_page == "Data Entry":
             else:
                 st.error("Failed to process CSV file. Please check the format.")
 
+        st.markdown("<h3>Bulk Import</h3>", unsafe_allow_html=True)
+        st.caption(
+            "Upload several CSV files at once. They are validated in parallel "
+            "and imported together, or not at all if any file is invalid."
+        )
+        uploaded_files = st.file_uploader(
+            "Upload CSV files", type="csv", accept_multiple_files=True, key="bulk_upload"
+        )
+        if uploaded_files and st.button(f"Import {len(uploaded_files)} files", type="primary"):
+            if process_csv_files(uploaded_files, resolve_factors):
+                st.session_state.imported_uploads.update(
+                    uploaded_file.file_id for uploaded_file in uploaded_files
+                )
+                st.session_state.active_page = "Dashboard"
+                st.rerun()
+
         # Sample CSV download with enterprise-grade fields
         sample_data = {
             "date": ["2025-01-15", "2025-01-20"],
@@ -2170,6 +2184,30 @@ elif st.session_state.active_page == "Data Entry":
             mime="text/csv",
         )
 
+    with tabs[2]:
+        st.markdown("<h3>Reports</h3>", unsafe_allow_html=True)
+        st.caption(
+            "Reports are rendered in the background; keep working and download them here when ready."
+        )
+        whole_ledger = st.checkbox("All dates", value=True, key="report_all_dates")
+        start_date = end_date = None
+        if not whole_ledger:
+            col1, col2 = st.columns(2)
+            with col1:
+                start_date = pd.Timestamp(st.date_input("From", key="report_start"))
+            with col2:
+                end_date = pd.Timestamp(st.date_input("To", key="report_end"))
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Generate PDF report", type="primary", key="report_pdf"):
+                submit_report("pdf", start_date, end_date)
+        with col2:
+            if st.button("Export CSV", key="report_csv"):
+                submit_report("csv", start_date, end_date)
+
+        show_report_jobs()
+
 # Reports page removed - focusing on AI features only
 
 elif st.session_state.active_page == "Settings":
@@ -2364,14 +2402,14 @@ elif st.session_state.active_page == "AI Insights":
         st.markdown("<h3>Report Summary Generator</h3>", unsafe_allow_html=True)
         st.markdown("Generate a human-readable summary of your emissions data.")
 
-        if len(st.session_state.emissions_data) == 0:
+        if len(emissions_data) == 0:
             st.warning("No emissions data available. Please add data first.")
         else:
             if st.button("Generate Summary", key="report_summary_btn"):
                 with st.spinner("Generating report summary..."):
                     try:
                         # Convert DataFrame to string representation for the AI
-                        emissions_str = st.session_state.emissions_data.to_string()
+                        emissions_str = emissions_data.to_string()
                         result = st.session_state.ai_agents.run_report_summary_crew(
                             emissions_str
                         )
@@ -2408,10 +2446,10 @@ elif st.session_state.active_page == "AI Insights":
                 ],
             )
 
-        if len(st.session_state.emissions_data) == 0:
+        if len(emissions_data) == 0:
             st.warning("No emissions data available. Please add data first.")
         else:
-            total_emissions = st.session_state.emissions_data["emissions_kgCO2e"].sum()
+            total_emissions = emissions_data["emissions_kgCO2e"].sum()
             st.markdown(
                 f"<p>Total emissions to offset: <strong>{total_emissions:.2f} kgCO2e</strong></p>",
                 unsafe_allow_html=True,
@@ -2503,7 +2541,7 @@ elif st.session_state.active_page == "AI Insights":
         st.markdown("<h3>Emission Optimizer</h3>", unsafe_allow_html=True)
         st.markdown("Get AI-powered recommendations to reduce your carbon footprint.")
 
-        if len(st.session_state.emissions_data) == 0:
+        if len(emissions_data) == 0:
             st.warning("No emissions data available. Please add data first.")
         else:
             if st.button(
@@ -2512,7 +2550,7 @@ elif st.session_state.active_page == "AI Insights":
                 with st.spinner("Analyzing your emissions data..."):
                     try:
                         # Convert DataFrame to string representation for the AI
-                        emissions_str = st.session_state.emissions_data.to_string()
+                        emissions_str = emissions_data.to_string()
                         result = st.session_state.ai_agents.run_optimization_crew(
                             emissions_str
                         )
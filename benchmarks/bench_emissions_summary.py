@@ -0,0 +1,119 @@
+"""
+Benchmark for DataHandler.get_emissions_summary.
+Compares the vectorized monthly time series with the previous row-by-row
+(iterrows) implementation on a synthetic ledger.
+
+Usage:
+    python benchmarks/bench_emissions_summary.py [rows]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# DataHandler keeps its ledger under ./data; keep the benchmark's out of the repo
+os.chdir(tempfile.mkdtemp(prefix="ycf-bench-"))
+
+from config import LEDGER_COLUMNS  # noqa: E402
+from data_handler import DataHandler  # noqa: E402
+from storage_backends import apply_schema  # noqa: E402
+
+SCOPES = ["Scope 1", "Scope 2", "Scope 3"]
+CATEGORIES = [
+    "Stationary Combustion",
+    "Mobile Combustion",
+    "Electricity",
+    "Business Travel",
+    "Waste",
+    "Purchased Goods",
+]
+
+
+def synthetic_ledger(rows, seed=0):
+    """Build a ledger of random entries spread over five years."""
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame(index=range(rows), columns=LEDGER_COLUMNS)
+    data["entry_id"] = [f"bench-{i}" for i in range(rows)]
+    data["date"] = pd.Timestamp("2020-01-01") + pd.to_timedelta(
+        rng.integers(0, 5 * 365, rows), unit="D"
+    )
+    data["scope"] = rng.choice(SCOPES, rows)
+    data["category"] = rng.choice(CATEGORIES, rows)
+    data["quantity"] = rng.random(rows) * 1000
+    data["emission_factor"] = rng.random(rows)
+    data["emissions_kgCO2e"] = data["quantity"] * data["emission_factor"]
+    return apply_schema(data)
+
+
+def iterrows_time_series(data):
+    """The previous implementation of the summary's monthly time series."""
+    time_data = data.copy()
+    time_data["month"] = time_data["date"].dt.strftime("%Y-%m")
+    time_series = (
+        time_data.groupby(["month", "scope"], observed=True)["emissions_kgCO2e"]
+        .sum()
+        .reset_index()
+    )
+    time_series_dict = {}
+    for _, row in time_series.iterrows():
+        if row["month"] not in time_series_dict:
+            time_series_dict[row["month"]] = {}
+        time_series_dict[row["month"]][row["scope"]] = row["emissions_kgCO2e"]
+    return time_series_dict
+
+
+def best_of(function, repeat=3):
+    """Return the fastest of several timed runs and the last result."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"Building a synthetic ledger of {rows:,} rows...")
+    data = synthetic_ledger(rows)
+
+    handler = DataHandler()
+    if handler.ledger_store.supports_aggregates:
+        sys.exit("Run with a ledger backend that summarizes in pandas (e.g. LEDGER_BACKEND=json)")
+    handler.emissions_data = data
+
+    def legacy_summary():
+        # The previous summary: the same totals plus the iterrows time series
+        return (
+            data["emissions_kgCO2e"].sum(),
+            data.groupby("scope", observed=True)["emissions_kgCO2e"].sum().to_dict(),
+            data.groupby("category", observed=True)["emissions_kgCO2e"].sum().to_dict(),
+            iterrows_time_series(data),
+        )
+
+    legacy_time, legacy = best_of(legacy_summary)
+    vectorized_time, summary = best_of(handler.get_emissions_summary)
+    arrays_time, _ = best_of(lambda: handler.get_emissions_summary(as_arrays=True))
+
+    expected = legacy[3]
+    actual = summary["time_series"]
+    assert actual.keys() == expected.keys()
+    for month, scopes in expected.items():
+        assert actual[month].keys() == scopes.keys()
+        for scope, emissions in scopes.items():
+            assert np.isclose(actual[month][scope], emissions)
+
+    print(f"iterrows summary:     {legacy_time * 1000:9.1f} ms")
+    print(f"vectorized summary:   {vectorized_time * 1000:9.1f} ms")
+    print(f"  with NumPy arrays:  {arrays_time * 1000:9.1f} ms")
+    print(f"speedup:              {legacy_time / vectorized_time:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
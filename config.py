@@ -22,6 +22,88 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 DATA_DIR = "data"
 EMISSIONS_FILE = os.path.join(DATA_DIR, "emissions.json")
 COMPANY_INFO_FILE = os.path.join(DATA_DIR, "company_info.json")
+JOURNAL_DIR = os.path.join(DATA_DIR, "journal")
+REPORTS_DIR = os.path.join(DATA_DIR, "reports")
+CHARTS_DIR = os.path.join(DATA_DIR, "charts")
+
+# Ledger storage backend: "json" (emissions.json), "parquet" (emissions.parquet),
+# "partitioned" (emissions/<YYYY-MM>/, date filters read only matching months)
+# or "sqlite" (emissions.db, with filters and aggregates run in SQL)
+LEDGER_BACKEND = os.getenv("LEDGER_BACKEND", "json")
+
+# Journal segment size (bytes) that triggers a background compaction
+JOURNAL_SEGMENT_BYTES = int(os.getenv("JOURNAL_SEGMENT_BYTES", 1024 * 1024))
+
+# Seconds between background compactions of the journal (0 disables)
+LEDGER_COMPACT_INTERVAL = int(os.getenv("LEDGER_COMPACT_INTERVAL", 300))
+
+# Numbered snapshot backups (emissions.json.1, .2, ...) kept on each compaction
+LEDGER_BACKUP_COUNT = int(os.getenv("LEDGER_BACKUP_COUNT", 3))
+
+# Rows read, validated and stored at a time when importing CSV files
+IMPORT_CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", 50000))
+
+# Worker processes used to parse CSV files in a bulk import
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", os.cpu_count() or 1))
+
+# Dashboard results (metrics, chart data, figures) memoized per ledger version
+DASHBOARD_CACHE_ENTRIES = int(os.getenv("DASHBOARD_CACHE_ENTRIES", 64))
+
+# Entries listed in a PDF report's data table; the rest are summarized in an appendix
+REPORT_TABLE_MAX_ROWS = int(os.getenv("REPORT_TABLE_MAX_ROWS", 5000))
+
+# Rendered PDF reports (and their aggregates) cached per period and ledger version
+REPORT_CACHE_ENTRIES = int(os.getenv("REPORT_CACHE_ENTRIES", 16))
+
+# Chart images kept in CHARTS_DIR for reuse by PDF reports, least recently used removed first
+CHART_CACHE_FILES = int(os.getenv("CHART_CACHE_FILES", 256))
+
+# Reports rendered at a time by the background report queue
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", 2))
+
+# Hours finished report jobs and their files are kept in REPORTS_DIR for download
+REPORT_RETENTION_HOURS = int(os.getenv("REPORT_RETENTION_HOURS", 24))
+
+# Worker processes rendering the per-entity reports of a batch
+REPORT_BATCH_WORKERS = int(os.getenv("REPORT_BATCH_WORKERS", os.cpu_count() or 1))
+
+# Declared ledger schema: column types applied once when the ledger is loaded.
+# Low-cardinality text is categorical; measures stay float64 because float32
+# loses precision on summed kgCO2e totals.
+LEDGER_SCHEMA = {
+    "entry_id": "object",
+    "date": "datetime64[ns]",
+    "business_unit": "category",
+    "project": "category",
+    "scope": "category",
+    "category": "category",
+    "activity": "category",
+    "country": "category",
+    "facility": "object",
+    "responsible_person": "object",
+    "quantity": "float64",
+    "unit": "category",
+    "emission_factor": "float64",
+    "emissions_kgCO2e": "float64",
+    "data_quality": "category",
+    "verification_status": "category",
+    "notes": "object",
+}
+
+# Defaults for enterprise fields missing from older or imported entries
+LEDGER_DEFAULTS = {
+    "business_unit": "Corporate",
+    "project": "Not Applicable",
+    "country": "India",
+    "facility": "",
+    "responsible_person": "",
+    "data_quality": "Medium",
+    "verification_status": "Unverified",
+    "notes": "",
+}
+
+# Columns written for every emission entry
+LEDGER_COLUMNS = list(LEDGER_SCHEMA)
 
 # Supported languages
 SUPPORTED_LANGUAGES = ["English", "Hindi"]
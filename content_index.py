@@ -0,0 +1,166 @@
+"""
+Content index for YourCarbonFootprint application.
+Stable content hashes of ledger rows and a hash index used to skip rows that
+are already in the ledger when importing.
+"""
+
+import numpy as np
+import pandas as pd
+
+from config import LEDGER_COLUMNS
+from storage_backends import FLOAT_COLUMNS, apply_schema
+
+# Columns that make up a row's content; entry ids differ between copies
+CONTENT_COLUMNS = [column for column in LEDGER_COLUMNS if column != "entry_id"]
+
+# Missing text hashes like an empty string, as the ledger stores either
+_MISSING_HASH = pd.util.hash_array(np.array([""], dtype=object))[0]
+
+
+def _column_hashes(values, column):
+    """Hash each value of a ledger column, independent of how it is stored."""
+    if column == "date":
+        # Day resolution, whatever the datetime64 unit
+        return pd.util.hash_array(values.to_numpy(dtype="datetime64[D]").view("int64"))
+    if column in FLOAT_COLUMNS:
+        return pd.util.hash_array(values.to_numpy(dtype="float64"))
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Hash the few categories, then pick each row's by its code
+        categories = np.asarray(values.cat.categories.astype(str), dtype=object)
+        hashes = np.append(pd.util.hash_array(categories), _MISSING_HASH)
+        return hashes[values.cat.codes.to_numpy()]
+    return pd.util.hash_array(values.astype(object).fillna("").astype(str).to_numpy(dtype=object))
+
+
+def content_hashes(data):
+    """
+    Get a stable 64-bit content hash of each ledger row.
+
+    The hash covers every column except entry_id and is the same across
+    processes and runs, and whether the row came from a CSV file, the
+    journal or a snapshot.
+
+    Args:
+        data (pandas.DataFrame): Emission entries
+
+    Returns:
+        numpy.ndarray: uint64 hash per row
+    """
+    data = apply_schema(data)
+    combined = np.zeros(len(data), dtype=np.uint64)
+    for column in CONTENT_COLUMNS:
+        combined = (combined * np.uint64(0x100000001B3)) ^ _column_hashes(data[column], column)
+    return combined
+
+
+class ContentIndex:
+    """
+    Count of ledger rows per content hash.
+
+    Lookups are dictionary hits, so checking a batch of N rows costs O(N)
+    regardless of the ledger size. Identical rows are counted, so a row
+    repeated k times in an import is only skipped as often as the ledger
+    already holds it: re-importing a file adds nothing, while genuinely
+    repeated rows of a new file are all kept.
+    """
+
+    def __init__(self, data=None):
+        """Initialize the ContentIndex class, optionally from a ledger frame."""
+        self._counts = {}
+        if data is not None:
+            self.add(data)
+
+    def _update(self, entries, sign):
+        hashes, counts = np.unique(content_hashes(entries), return_counts=True)
+        for content_hash, count in zip(hashes.tolist(), counts.tolist()):
+            count = self._counts.get(content_hash, 0) + sign * count
+            if count > 0:
+                self._counts[content_hash] = count
+            else:
+                self._counts.pop(content_hash, None)
+
+    def add(self, entries):
+        """Count entries added to the ledger."""
+        self._update(entries, 1)
+
+    def remove(self, entries):
+        """Stop counting entries deleted from the ledger."""
+        self._update(entries, -1)
+
+    def count(self, content_hash):
+        """Number of ledger rows with the given content hash."""
+        return self._counts.get(content_hash, 0)
+
+    def new_rows(self, entries):
+        """
+        Find the entries that are not in the ledger yet.
+
+        Args:
+            entries (pandas.DataFrame): Entries to import
+
+        Returns:
+            numpy.ndarray: Boolean mask of the entries to import
+        """
+        return ImportFilter(self).new_rows(entries)
+
+
+class ImportFilter:
+    """
+    Selects the rows of an import that are not in the ledger yet.
+
+    An import is one or more files, each read in one or more chunks. Rows
+    are counted per file, and the rows kept from earlier files count as
+    present for later ones, so importing files together gives the same
+    result as importing them one after another: files that overlap add
+    their shared rows once.
+    """
+
+    def __init__(self, index):
+        """Initialize the ImportFilter class for a ContentIndex."""
+        self.index = index
+        # Rows kept per content hash by earlier files of this import
+        self._kept_before = {}
+        # Rows seen and kept per content hash in the current file
+        self._seen = {}
+        self._kept = {}
+
+    def next_file(self):
+        """Start the next file of the import."""
+        for key, count in self._kept.items():
+            self._kept_before[key] = self._kept_before.get(key, 0) + count
+        self._seen = {}
+        self._kept = {}
+
+    def new_rows(self, entries):
+        """
+        Find the rows of the next chunk of the current file to import.
+
+        Args:
+            entries (pandas.DataFrame): Entries to import
+
+        Returns:
+            numpy.ndarray: Boolean mask of the entries to import
+        """
+        hashes = content_hashes(entries)
+        unique, inverse = np.unique(hashes, return_inverse=True)
+
+        # Occurrence number of each row among the file's rows with its hash
+        order = np.argsort(inverse, kind="stable")
+        group_starts = np.searchsorted(inverse[order], np.arange(len(unique)))
+        occurrence = np.empty(len(hashes), dtype=np.int64)
+        occurrence[order] = np.arange(len(hashes)) - group_starts[inverse[order]]
+
+        keys = unique.tolist()
+        present = np.array(
+            [self.index.count(key) + self._kept_before.get(key, 0) for key in keys], dtype=np.int64
+        )
+        seen = np.array([self._seen.get(key, 0) for key in keys], dtype=np.int64)
+        new = (occurrence + seen[inverse]) >= present[inverse]
+
+        counts = np.bincount(inverse, minlength=len(keys)).tolist()
+        kept = np.bincount(inverse[new], minlength=len(keys)).tolist()
+        for key, count, kept_count in zip(keys, counts, kept):
+            self._seen[key] = self._seen.get(key, 0) + count
+            if kept_count:
+                self._kept[key] = self._kept.get(key, 0) + kept_count
+        return new
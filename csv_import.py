@@ -0,0 +1,251 @@
+"""
+CSV import for YourCarbonFootprint application.
+Reads emission entries from CSV files in fixed-size chunks, validating and
+normalizing each chunk, so imports use bounded memory regardless of file size,
+and parses many files at once in a process pool for bulk imports.
+"""
+
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from config import IMPORT_CHUNK_ROWS, IMPORT_WORKERS, LEDGER_DEFAULTS
+from emission_factors import lookup_emission_factors
+
+# Columns every imported CSV must have
+REQUIRED_COLUMNS = [
+    "date",
+    "scope",
+    "category",
+    "activity",
+    "quantity",
+    "unit",
+    "emission_factor",
+]
+
+# Columns that may be left out when missing emission factors are looked up
+FACTOR_COLUMNS = ["unit", "emission_factor"]
+
+# Columns parsed (and so validated) before anything is stored
+TYPED_COLUMNS = ["date", "quantity", "emission_factor"]
+
+
+class CSVImportError(ValueError):
+    """Raised when a CSV file cannot be imported."""
+
+
+def _read_csv(source, **kwargs):
+    """Read a CSV path or file object from its start."""
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return pd.read_csv(source, **kwargs)
+
+
+def _resolve_factors(chunk):
+    """Fill missing emission factors (and units) of a chunk from the factor table."""
+    missing = chunk["emission_factor"].isna().to_numpy()
+    if not missing.any():
+        return
+    # Units come back from the table as text, even where the file has none
+    chunk["unit"] = chunk["unit"].astype(object) if "unit" in chunk.columns else None
+    rows = chunk.loc[missing]
+    factors, units = lookup_emission_factors(rows["category"], rows["activity"], rows["unit"])
+
+    unresolved = np.isnan(factors)
+    if unresolved.any():
+        keys = rows.loc[unresolved, ["category", "activity", "unit"]].fillna("").drop_duplicates().head(3)
+        raise ValueError(
+            f"No emission factor for {int(unresolved.sum())} rows, e.g. "
+            + ", ".join(f"({c}, {a}, {u})" for c, a, u in keys.itertuples(index=False))
+        )
+    chunk.loc[missing, "emission_factor"] = factors
+    chunk.loc[missing, "unit"] = rows["unit"].where(rows["unit"].notna(), units)
+
+
+def _parse(chunk, resolve_factors=False):
+    """Convert the typed columns of a chunk in place."""
+    chunk["quantity"] = chunk["quantity"].astype(float)
+    if "emission_factor" in chunk.columns:
+        chunk["emission_factor"] = chunk["emission_factor"].astype(float)
+    else:
+        chunk["emission_factor"] = np.nan
+    chunk["date"] = pd.to_datetime(chunk["date"])
+    if resolve_factors:
+        _resolve_factors(chunk)
+
+
+def validate_csv(source, chunk_rows=IMPORT_CHUNK_ROWS, resolve_factors=False):
+    """
+    Check a CSV file's columns and values without keeping it in memory.
+
+    Only the date, quantity and emission factor columns (plus category,
+    activity and unit when looking up factors) are parsed, one chunk at a
+    time.
+
+    Args:
+        source: Path to a CSV file or a seekable file-like object
+        chunk_rows (int, optional): Rows parsed at a time
+        resolve_factors (bool, optional): Look up missing emission factors
+            in the factor table; unit and emission_factor are then optional
+
+    Returns:
+        int: Number of data rows
+
+    Raises:
+        CSVImportError: If a required column is missing or a value is invalid
+    """
+    columns = _read_csv(source, nrows=0).columns
+    required_columns = [
+        column for column in REQUIRED_COLUMNS
+        if not (resolve_factors and column in FACTOR_COLUMNS)
+    ]
+    missing_columns = [column for column in required_columns if column not in columns]
+    if missing_columns:
+        raise CSVImportError(f"Missing required columns: {', '.join(missing_columns)}")
+
+    usecols = TYPED_COLUMNS + (["category", "activity", "unit"] if resolve_factors else [])
+    rows = 0
+    for chunk in _read_csv(source, usecols=[c for c in usecols if c in columns], chunksize=chunk_rows):
+        try:
+            _parse(chunk, resolve_factors)
+        except (ValueError, TypeError) as e:
+            raise CSVImportError(
+                f"Invalid data in rows {rows + 1}-{rows + len(chunk)}: {str(e)}"
+            ) from e
+        rows += len(chunk)
+    return rows
+
+
+def normalize_chunk(chunk, resolve_factors=False):
+    """
+    Prepare a chunk of CSV rows for storage.
+
+    Parses dates and measures, optionally looks up missing emission
+    factors, calculates emissions where the file has none, and fills
+    missing enterprise fields with their defaults. An entry_id column, as
+    in a re-imported export, is dropped: imported rows are new entries and
+    get their ids from the ledger store.
+
+    Args:
+        chunk (pandas.DataFrame): Rows as read from the CSV file
+        resolve_factors (bool, optional): Look up missing emission factors
+
+    Returns:
+        pandas.DataFrame: The normalized rows
+    """
+    chunk = chunk.drop(columns="entry_id", errors="ignore")
+    _parse(chunk, resolve_factors)
+    emissions = chunk["quantity"] * chunk["emission_factor"]
+    if "emissions_kgCO2e" not in chunk.columns:
+        chunk["emissions_kgCO2e"] = emissions
+    elif resolve_factors:
+        chunk["emissions_kgCO2e"] = chunk["emissions_kgCO2e"].fillna(emissions)
+    if "notes" not in chunk.columns:
+        chunk["notes"] = ""
+    for field, default_value in LEDGER_DEFAULTS.items():
+        if field not in chunk.columns:
+            chunk[field] = default_value
+    return chunk
+
+
+def iter_csv_chunks(source, chunk_rows=IMPORT_CHUNK_ROWS, progress=None, resolve_factors=False):
+    """
+    Read a CSV file as normalized chunks of emission entries.
+
+    The whole file is validated first, so nothing is yielded (and nothing
+    stored by the caller) for a file with invalid rows. At most one chunk
+    is held in memory at a time.
+
+    Args:
+        source: Path to a CSV file or a seekable file-like object
+        chunk_rows (int, optional): Rows per chunk
+        progress (callable, optional): Called with (rows_done, rows_total)
+            after each chunk has been consumed
+        resolve_factors (bool, optional): Look up missing emission factors
+            by (category, activity, unit) in the factor table
+
+    Yields:
+        pandas.DataFrame: Normalized entries, at most chunk_rows at a time
+
+    Raises:
+        CSVImportError: If a required column is missing or a value is invalid
+    """
+    total = validate_csv(source, chunk_rows, resolve_factors)
+    done = 0
+    for chunk in _read_csv(source, chunksize=chunk_rows):
+        yield normalize_chunk(chunk, resolve_factors)
+        done += len(chunk)
+        if progress is not None:
+            progress(done, total)
+
+
+def _read_file(name, source, resolve_factors=False):
+    """
+    Validate and normalize a whole CSV file; runs in a worker process.
+
+    Returns:
+        tuple: (name, pandas.DataFrame or None, error message or None)
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    try:
+        chunks = list(iter_csv_chunks(source, resolve_factors=resolve_factors))
+    except CSVImportError as e:
+        return name, None, str(e)
+    except Exception as e:
+        return name, None, f"Error processing CSV: {str(e)}"
+    return name, pd.concat(chunks, ignore_index=True) if chunks else None, None
+
+
+def read_csv_files(files, max_workers=IMPORT_WORKERS, progress=None, resolve_factors=False):
+    """
+    Validate and normalize several CSV files in parallel.
+
+    Each file is parsed, validated and given emissions_kgCO2e in its own
+    worker process. Nothing is returned unless every file is valid, so the
+    caller can store all entries in one batch or none at all.
+
+    Args:
+        files (list): (name, source) pairs; a source is a path or the
+            file's contents as bytes
+        max_workers (int, optional): Worker processes to use at most
+        progress (callable, optional): Called with (files_done, files_total)
+            as files finish
+        resolve_factors (bool, optional): Look up missing emission factors
+
+    Returns:
+        list: pandas.DataFrame of entries per file, in the order given
+
+    Raises:
+        CSVImportError: If any file is invalid, listing each file's error
+    """
+    files = list(files)
+    results = [None] * len(files)
+    if max_workers <= 1 or len(files) <= 1:
+        for position, (name, source) in enumerate(files):
+            results[position] = _read_file(name, source, resolve_factors)
+            if progress is not None:
+                progress(position + 1, len(files))
+    else:
+        # Spawned workers, as forking a threaded server process is unsafe
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(files)), mp_context=context) as pool:
+            futures = {
+                pool.submit(_read_file, name, source, resolve_factors): position
+                for position, (name, source) in enumerate(files)
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                results[futures[future]] = future.result()
+                if progress is not None:
+                    progress(done, len(files))
+
+    errors = [f"{name}: {error}" for name, _, error in results if error]
+    if errors:
+        raise CSVImportError("; ".join(errors))
+    return [
+        frame if frame is not None else pd.DataFrame(columns=REQUIRED_COLUMNS)
+        for _, frame, _ in results
+    ]
@@ -3,51 +3,108 @@ Data handler for YourCarbonFootprint application.
 Manages data import, export, and processing.
 """
 
+import argparse
 import pandas as pd
 import json
 import os
 from datetime import datetime
 import csv
 from io import StringIO
-from fpdf import FPDF
 import matplotlib.pyplot as plt
 import seaborn as sns
 from emission_factors import get_emission_factor, get_categories, get_activities
+from config import IMPORT_WORKERS, LEDGER_COLUMNS, REPORT_BATCH_WORKERS, REPORT_TABLE_MAX_ROWS
+from ledger_store import get_ledger_store, merge_concurrent_changes
+from storage_backends import LedgerConflictError, apply_schema, concat_ledger
+from file_utils import atomic_write_text
+from analytics import EmissionsAnalytics
+from ledger_index import LedgerIndex, filter_values
+from csv_import import CSVImportError, iter_csv_chunks, read_csv_files
+from content_index import ContentIndex, ImportFilter
+from report_engine import ReportEngine, write_batch_reports, write_report
 
 # Constants
 DATA_DIR = "data"
 EMISSIONS_FILE = os.path.join(DATA_DIR, "emissions.json")
 COMPANY_INFO_FILE = os.path.join(DATA_DIR, "company_info.json")
 
+# Attempts to save the ledger when other writers keep changing it
+LEDGER_SAVE_RETRIES = 5
+
 # Ensure data directory exists
 os.makedirs(DATA_DIR, exist_ok=True)
 
+def _month_scope_matrix(monthly):
+    """Pivot emissions indexed by (month, scope) to a months x scopes frame."""
+    if len(monthly) == 0:
+        return pd.DataFrame(dtype='float64')
+    return monthly.unstack('scope').sort_index()
+
+
+def time_series_dict(monthly):
+    """
+    Convert monthly emissions per scope to {month: {scope: emissions}}.
+    
+    Args:
+        monthly (pandas.Series): Emissions indexed by (month, scope)
+    
+    Returns:
+        dict: Emissions per scope for each month; scopes without emissions
+            in a month are left out
+    """
+    matrix = _month_scope_matrix(monthly)
+    return {
+        month: {scope: value for scope, value in row.items() if pd.notna(value)}
+        for month, row in matrix.to_dict('index').items()
+    }
+
+
+def time_series_arrays(monthly):
+    """
+    Convert monthly emissions per scope to NumPy arrays for charting.
+    
+    Args:
+        monthly (pandas.Series): Emissions indexed by (month, scope)
+    
+    Returns:
+        dict: "months" and "scopes" label arrays and the months x scopes
+            "emissions" float matrix, with 0 where a scope has no emissions
+    """
+    matrix = _month_scope_matrix(monthly)
+    return {
+        "months": matrix.index.to_numpy(dtype=object),
+        "scopes": matrix.columns.to_numpy(dtype=object),
+        "emissions": matrix.fillna(0).to_numpy(dtype='float64')
+    }
+
+
+def _skipped_note(skipped):
+    """Describe rows skipped by an import because they were already present."""
+    return f" ({skipped} already present, skipped)" if skipped else ""
+
+
 class DataHandler:
     def __init__(self):
         """Initialize the DataHandler class."""
+        self.ledger_store = get_ledger_store(data_dir=DATA_DIR)
         self.load_emissions_data()
         self.load_company_info()
     
     def load_emissions_data(self):
-        """Load emissions data from file."""
-        if os.path.exists(EMISSIONS_FILE):
-            with open(EMISSIONS_FILE, 'r') as f:
-                try:
-                    self.emissions_data = pd.DataFrame(json.load(f))
-                    # Convert date strings to datetime objects
-                    if 'date' in self.emissions_data.columns:
-                        self.emissions_data['date'] = pd.to_datetime(self.emissions_data['date'])
-                except json.JSONDecodeError:
-                    self.create_empty_emissions_data()
-        else:
+        """Load emissions data from the snapshot and journal."""
+        # Version and entry ids the in-memory data was loaded from, used to
+        # merge concurrent changes when saving
+        self.ledger_version = None
+        self.base_entry_ids = set()
+        try:
+            self.emissions_data, self.ledger_version = self.ledger_store.load_versioned()
+            self.base_entry_ids = set(self.emissions_data['entry_id'])
+        except json.JSONDecodeError:
             self.create_empty_emissions_data()
     
     def create_empty_emissions_data(self):
         """Create empty emissions dataframe."""
-        self.emissions_data = pd.DataFrame(columns=[
-            'date', 'scope', 'category', 'activity', 'quantity', 
-            'unit', 'emission_factor', 'emissions_kgCO2e', 'notes'
-        ])
+        self.emissions_data = apply_schema(pd.DataFrame(columns=LEDGER_COLUMNS))
     
     def load_company_info(self):
         """Load company information from file."""
@@ -76,19 +133,69 @@ class DataHandler:
         }
     
     def save_emissions_data(self):
-        """Save emissions data to file."""
-        # Convert datetime objects to strings
-        data_to_save = self.emissions_data.copy()
-        if 'date' in data_to_save.columns:
-            data_to_save['date'] = data_to_save['date'].dt.strftime('%Y-%m-%d')
-        
-        with open(EMISSIONS_FILE, 'w') as f:
-            json.dump(data_to_save.to_dict('records'), f, indent=2)
+        """
+        Rewrite the full emissions snapshot and clear the journal.
+
+        If another session or process changed the ledger since it was loaded,
+        its added and deleted rows are merged in and the save is retried.
+        """
+        for _ in range(LEDGER_SAVE_RETRIES):
+            try:
+                self.ledger_version = self.ledger_store.rewrite(
+                    self.emissions_data, expected_version=self.ledger_version
+                )
+                self.base_entry_ids = set(self.emissions_data['entry_id'])
+                return
+            except LedgerConflictError:
+                current, self.ledger_version = self.ledger_store.load_versioned()
+                self.emissions_data = merge_concurrent_changes(
+                    self.emissions_data, self.base_entry_ids, current
+                )
+                self.base_entry_ids = set(current['entry_id'])
+        raise LedgerConflictError(self.ledger_version, self.ledger_store.version())
     
     def save_company_info(self):
         """Save company information to file."""
-        with open(COMPANY_INFO_FILE, 'w') as f:
-            json.dump(self.company_info, f, indent=2)
+        atomic_write_text(COMPANY_INFO_FILE, json.dumps(self.company_info, indent=2))
+    
+    def _append_entries(self, entries):
+        """Add stored entries to the in-memory data, extending its index."""
+        data = concat_ledger([self.emissions_data, entries])
+        if getattr(self, '_index_data', None) is self.emissions_data:
+            # Only the new rows are indexed
+            self._ledger_index = self._ledger_index.extended(data)
+            self._index_data = data
+        if getattr(self, '_content_data', None) is self.emissions_data:
+            self._content_index.add(entries)
+            self._content_data = data
+        self.emissions_data = data
+    
+    def _store_new_entries(self, chunks, skip_existing=True):
+        """
+        Store the entries of the given chunks that are not in the ledger yet.
+        
+        Args:
+            chunks (iterable): DataFrames of entries to import, read from one file
+            skip_existing (bool, optional): Skip rows whose content is already
+                in the ledger; otherwise store every row
+            
+        Returns:
+            tuple: (pandas.DataFrame stored entries, int rows skipped as
+                already present)
+        """
+        select = ImportFilter(self.get_content_index()) if skip_existing else None
+        stored = []
+        skipped = 0
+        for chunk in chunks:
+            if select is not None:
+                new = select.new_rows(chunk)
+                skipped += int((~new).sum())
+                chunk = chunk[new]
+            if len(chunk) > 0:
+                stored.append(self.ledger_store.append(chunk))
+        entries = concat_ledger(stored)
+        self._append_entries(entries)
+        return entries, skipped
     
     def add_emission_entry(self, date, scope, category, activity, quantity, unit, emission_factor, notes=""):
         """
@@ -124,56 +231,43 @@ class DataHandler:
                 'notes': notes
             }])
             
-            # Append to existing data
-            self.emissions_data = pd.concat([self.emissions_data, new_entry], ignore_index=True)
-            
-            # Save data
-            self.save_emissions_data()
+            # Append to the journal, then to the in-memory data
+            self._append_entries(self.ledger_store.append(new_entry))
             
             return True
         except Exception as e:
             print(f"Error adding emission entry: {str(e)}")
             return False
     
-    def import_csv(self, file_path_or_buffer):
+    def import_csv(self, file_path_or_buffer, progress=None, resolve_factors=False):
         """
         Import emissions data from CSV.
         
+        The file is validated, then read and stored in chunks of
+        IMPORT_CHUNK_ROWS rows, so memory use does not grow with its size.
+        Rows whose content is already in the ledger are skipped, so
+        importing a file twice adds its rows once.
+        
         Args:
             file_path_or_buffer: Path to CSV file or file-like object
+            progress (callable, optional): Called with (rows_done, rows_total)
+                after each stored chunk
+            resolve_factors (bool, optional): Look up missing emission
+                factors by (category, activity, unit) in EMISSION_FACTORS
             
         Returns:
             tuple: (success, message)
         """
         try:
-            # Read CSV
-            df = pd.read_csv(file_path_or_buffer)
-            
-            # Check required columns
-            required_columns = ['date', 'scope', 'category', 'activity', 'quantity', 'unit', 'emission_factor']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            
-            if missing_columns:
-                return False, f"Missing required columns: {', '.join(missing_columns)}"
-            
-            # Convert date strings to datetime objects
-            df['date'] = pd.to_datetime(df['date'])
-            
-            # Calculate emissions if not provided
-            if 'emissions_kgCO2e' not in df.columns:
-                df['emissions_kgCO2e'] = df['quantity'].astype(float) * df['emission_factor'].astype(float)
-            
-            # Add notes column if not present
-            if 'notes' not in df.columns:
-                df['notes'] = ""
-            
-            # Append to existing data
-            self.emissions_data = pd.concat([self.emissions_data, df], ignore_index=True)
-            
-            # Save data
-            self.save_emissions_data()
-            
-            return True, f"Successfully imported {len(df)} entries"
+            # Append each chunk's new rows to the journal, then all to the
+            # in-memory data
+            entries, skipped = self._store_new_entries(iter_csv_chunks(
+                file_path_or_buffer, progress=progress, resolve_factors=resolve_factors
+            ))
+            
+            return True, f"Successfully imported {len(entries)} entries{_skipped_note(skipped)}"
+        except CSVImportError as e:
+            return False, str(e)
         except Exception as e:
             return False, f"Error importing CSV: {str(e)}"
     
@@ -191,14 +285,15 @@ class DataHandler:
         """
         try:
             # Filter data by date range if specified
-            data = self.emissions_data.copy()
-            if start_date and end_date:
-                mask = (data['date'] >= pd.Timestamp(start_date)) & (data['date'] <= pd.Timestamp(end_date))
-                data = data.loc[mask]
+            data = self.get_filtered_data(start_date, end_date)
+            
+            # Entry ids are internal to the ledger store
+            data = data.drop(columns='entry_id', errors='ignore')
             
-            # Convert datetime objects to strings
+            # Convert datetime objects to strings (on a new frame, as the
+            # filtered data may share columns with the ledger)
             if 'date' in data.columns:
-                data['date'] = data['date'].dt.strftime('%Y-%m-%d')
+                data = data.assign(date=data['date'].dt.strftime('%Y-%m-%d'))
             
             if file_path:
                 # Save to file
@@ -213,170 +308,314 @@ class DataHandler:
             print(f"Error exporting CSV: {str(e)}")
             return False
     
-    def generate_pdf_report(self, file_path=None, start_date=None, end_date=None):
+    def generate_pdf_report(self, file_path=None, start_date=None, end_date=None,
+                            max_rows=REPORT_TABLE_MAX_ROWS):
         """
         Generate PDF report.
         
         Args:
-            file_path (str, optional): Path to save PDF file
+            file_path (str or file-like, optional): Path or binary file object
+                to save the PDF to
             start_date (datetime, optional): Start date for filtering
             end_date (datetime, optional): End date for filtering
+            max_rows (int, optional): Entries listed in the data table; when
+                the period has more, an appendix summarizes them per month,
+                scope and category
             
         Returns:
             bytes or bool: PDF bytes if file_path is None, otherwise True if successful
         """
         try:
-            # Filter data by date range if specified
-            data = self.emissions_data.copy()
-            if start_date and end_date:
-                mask = (data['date'] >= pd.Timestamp(start_date)) & (data['date'] <= pd.Timestamp(end_date))
-                data = data.loc[mask]
-            
-            # Create PDF
-            pdf = FPDF()
-            pdf.add_page()
-            
-            # Set font
-            pdf.set_font("Arial", "B", 16)
-            
-            # Title
-            pdf.cell(0, 10, "Carbon Emissions Report", 0, 1, "C")
-            pdf.set_font("Arial", "", 12)
-            
-            # Company info
-            pdf.cell(0, 10, f"Company: {self.company_info['name']}", 0, 1)
-            pdf.cell(0, 10, f"Reporting Period: {start_date.strftime('%Y-%m-%d') if start_date else 'All'} to {end_date.strftime('%Y-%m-%d') if end_date else 'All'}", 0, 1)
-            pdf.cell(0, 10, f"Generated on: {datetime.now().strftime('%Y-%m-%d')}", 0, 1)
-            
-            # Summary
-            pdf.ln(10)
-            pdf.set_font("Arial", "B", 14)
-            pdf.cell(0, 10, "Summary", 0, 1)
-            pdf.set_font("Arial", "", 12)
-            
-            total_emissions = data['emissions_kgCO2e'].sum()
-            pdf.cell(0, 10, f"Total Emissions: {total_emissions:.2f} kgCO2e", 0, 1)
-            
-            # Emissions by scope
-            scope_data = data.groupby('scope')['emissions_kgCO2e'].sum().reset_index()
-            pdf.ln(5)
-            pdf.cell(0, 10, "Emissions by Scope:", 0, 1)
-            for _, row in scope_data.iterrows():
-                pdf.cell(0, 10, f"{row['scope']}: {row['emissions_kgCO2e']:.2f} kgCO2e ({row['emissions_kgCO2e'] / total_emissions * 100:.1f}%)", 0, 1)
-            
-            # Emissions by category
-            category_data = data.groupby('category')['emissions_kgCO2e'].sum().reset_index()
-            pdf.ln(5)
-            pdf.cell(0, 10, "Top Categories:", 0, 1)
-            for _, row in category_data.nlargest(5, 'emissions_kgCO2e').iterrows():
-                pdf.cell(0, 10, f"{row['category']}: {row['emissions_kgCO2e']:.2f} kgCO2e ({row['emissions_kgCO2e'] / total_emissions * 100:.1f}%)", 0, 1)
-            
-            # Data table
-            pdf.ln(10)
-            pdf.set_font("Arial", "B", 14)
-            pdf.cell(0, 10, "Emissions Data", 0, 1)
-            pdf.set_font("Arial", "B", 10)
-            
-            # Table header
-            col_widths = [25, 25, 30, 30, 20, 15, 25, 30]
-            headers = ['Date', 'Scope', 'Category', 'Activity', 'Quantity', 'Unit', 'Factor', 'Emissions (kgCO2e)']
-            
-            for i, header in enumerate(headers):
-                pdf.cell(col_widths[i], 10, header, 1)
-            pdf.ln()
-            
-            # Table data
-            pdf.set_font("Arial", "", 8)
-            for _, row in data.iterrows():
-                pdf.cell(col_widths[0], 10, row['date'].strftime('%Y-%m-%d') if isinstance(row['date'], pd.Timestamp) else str(row['date']), 1)
-                pdf.cell(col_widths[1], 10, str(row['scope']), 1)
-                pdf.cell(col_widths[2], 10, str(row['category']), 1)
-                pdf.cell(col_widths[3], 10, str(row['activity']), 1)
-                pdf.cell(col_widths[4], 10, f"{row['quantity']:.2f}", 1)
-                pdf.cell(col_widths[5], 10, str(row['unit']), 1)
-                pdf.cell(col_widths[6], 10, f"{row['emission_factor']:.4f}", 1)
-                pdf.cell(col_widths[7], 10, f"{row['emissions_kgCO2e']:.2f}", 1)
-                pdf.ln()
+            pdf_bytes = self.get_report_engine().render(
+                start_date, end_date, self.company_info, max_rows
+            )
             
             if file_path:
                 # Save to file
-                pdf.output(file_path)
+                write_report(pdf_bytes, file_path)
                 return True
             else:
                 # Return PDF bytes
-                return pdf.output(dest='S').encode('latin1')
+                return pdf_bytes
         except Exception as e:
             print(f"Error generating PDF report: {str(e)}")
             return False
     
-    def get_emissions_summary(self):
+    def get_emissions_summary(self, as_arrays=False):
         """
         Get emissions summary statistics.
         
+        Args:
+            as_arrays (bool, optional): Also return the monthly time series as
+                NumPy arrays ("months", "scopes" and a months x scopes
+                "emissions" matrix) under "time_series_arrays", for charts
+        
         Returns:
             dict: Summary statistics
         """
         if len(self.emissions_data) == 0:
-            return {
+            summary = {
                 "total_emissions": 0,
                 "scope_breakdown": {},
                 "category_breakdown": {},
                 "time_series": {}
             }
+            if as_arrays:
+                summary["time_series_arrays"] = time_series_arrays(pd.Series(dtype='float64'))
+            return summary
+        
+        if self.ledger_store.supports_aggregates:
+            return self._get_emissions_summary_from_store(as_arrays)
+        
+        data = self.emissions_data
         
         # Total emissions
-        total_emissions = self.emissions_data['emissions_kgCO2e'].sum()
+        total_emissions = data['emissions_kgCO2e'].sum()
         
         # Emissions by scope
-        scope_data = self.emissions_data.groupby('scope')['emissions_kgCO2e'].sum().to_dict()
+        scope_data = data.groupby('scope', observed=True)['emissions_kgCO2e'].sum().to_dict()
         
         # Emissions by category
-        category_data = self.emissions_data.groupby('category')['emissions_kgCO2e'].sum().to_dict()
+        category_data = data.groupby('category', observed=True)['emissions_kgCO2e'].sum().to_dict()
         
-        # Time series data (monthly)
-        time_data = self.emissions_data.copy()
-        if 'date' in time_data.columns and len(time_data) > 0:
-            time_data['month'] = time_data['date'].dt.strftime('%Y-%m')
-            time_series = time_data.groupby(['month', 'scope'])['emissions_kgCO2e'].sum().reset_index()
-            time_series_dict = {}
-            for _, row in time_series.iterrows():
-                if row['month'] not in time_series_dict:
-                    time_series_dict[row['month']] = {}
-                time_series_dict[row['month']][row['scope']] = row['emissions_kgCO2e']
+        # Time series data (monthly); months are grouped as periods and only
+        # the distinct months are formatted as strings
+        if 'date' in data.columns:
+            months = data['date'].dt.to_period('M')
+            monthly = data.groupby([months, data['scope']], observed=True)['emissions_kgCO2e'].sum()
+            monthly.index = monthly.index.set_levels(
+                monthly.index.levels[0].strftime('%Y-%m'), level=0
+            )
         else:
-            time_series_dict = {}
+            monthly = pd.Series(dtype='float64')
         
-        return {
+        summary = {
             "total_emissions": total_emissions,
             "scope_breakdown": scope_data,
             "category_breakdown": category_data,
-            "time_series": time_series_dict
+            "time_series": time_series_dict(monthly)
+        }
+        if as_arrays:
+            summary["time_series_arrays"] = time_series_arrays(monthly)
+        return summary
+    
+    def _get_emissions_summary_from_store(self, as_arrays=False):
+        """Compute the emissions summary with aggregates run by the store."""
+        scope_data = self.ledger_store.aggregate(['scope'])
+        category_data = self.ledger_store.aggregate(['category'])
+        monthly = self.ledger_store.aggregate(['month', 'scope']).set_index(['month', 'scope'])['emissions_kgCO2e']
+        
+        summary = {
+            "total_emissions": scope_data['emissions_kgCO2e'].sum(),
+            "scope_breakdown": dict(zip(scope_data['scope'], scope_data['emissions_kgCO2e'])),
+            "category_breakdown": dict(zip(category_data['category'], category_data['emissions_kgCO2e'])),
+            "time_series": time_series_dict(monthly)
         }
+        if as_arrays:
+            summary["time_series_arrays"] = time_series_arrays(monthly)
+        return summary
     
-    def get_filtered_data(self, start_date=None, end_date=None, scope=None, category=None):
+    def import_csv_files(self, paths, max_workers=IMPORT_WORKERS, resolve_factors=False):
+        """
+        Import several CSV files in one batch.
+        
+        The files are parsed, validated and given emissions in parallel
+        worker processes, then stored with a single append, so either all
+        of them are imported or none. Rows already in the ledger are skipped.
+        
+        Args:
+            paths (list): Paths to CSV files
+            max_workers (int, optional): Worker processes to use at most
+            resolve_factors (bool, optional): Look up missing emission
+                factors by (category, activity, unit) in EMISSION_FACTORS
+            
+        Returns:
+            tuple: (success, message)
+        """
+        try:
+            frames = read_csv_files(
+                [(path, path) for path in paths],
+                max_workers=max_workers,
+                resolve_factors=resolve_factors,
+            )
+            # Skip rows already present file by file, then store the rest at once
+            select = ImportFilter(self.get_content_index())
+            kept = []
+            skipped = 0
+            for frame in frames:
+                new = select.new_rows(frame)
+                skipped += int((~new).sum())
+                kept.append(frame[new])
+                select.next_file()
+            entries, _ = self._store_new_entries(
+                [pd.concat(kept, ignore_index=True)] if kept else [], skip_existing=False
+            )
+            
+            return True, (
+                f"Successfully imported {len(entries)} entries from {len(paths)} files"
+                f"{_skipped_note(skipped)}"
+            )
+        except CSVImportError as e:
+            return False, str(e)
+        except Exception as e:
+            return False, f"Error importing CSV: {str(e)}"
+    
+    def get_analytics(self):
+        """
+        Get rolling, period-over-period and cumulative analytics.
+        
+        Returns:
+            EmissionsAnalytics: Analytics over the current emissions data,
+                reused until the data changes
+        """
+        if getattr(self, '_analytics_data', None) is not self.emissions_data:
+            self._analytics = EmissionsAnalytics(self.emissions_data)
+            self._analytics_data = self.emissions_data
+        return self._analytics
+    
+    def report_version(self):
+        """
+        Get a token that changes whenever the data reports are built from does.
+        
+        Returns:
+            tuple: (store version, in-memory data generation); the store's
+                version changes with every write by any process, and the
+                generation whenever the in-memory data is replaced
+        """
+        if getattr(self, '_report_data', None) is not self.emissions_data:
+            self._report_generation = getattr(self, '_report_generation', 0) + 1
+            self._report_data = self.emissions_data
+        return self.ledger_store.version(), self._report_generation
+    
+    def get_report_engine(self):
+        """
+        Get the engine rendering PDF reports of the emissions data.
+        
+        Returns:
+            ReportEngine: Engine caching report aggregates and documents
+        """
+        if getattr(self, '_report_engine', None) is None:
+            self._report_engine = ReportEngine(self)
+        return self._report_engine
+    
+    def get_content_index(self):
+        """
+        Get the content hash index over the current emissions data.
+        
+        Returns:
+            ContentIndex: Index reused until the data changes, and extended
+                when entries are added
+        """
+        if getattr(self, '_content_data', None) is not self.emissions_data:
+            self._content_index = ContentIndex(self.emissions_data)
+            self._content_data = self.emissions_data
+        return self._content_index
+    
+    def get_ledger_index(self):
+        """
+        Get the date and category index over the current emissions data.
+        
+        Returns:
+            LedgerIndex: Index reused until the data changes, and extended
+                when entries are added
+        """
+        if getattr(self, '_index_data', None) is not self.emissions_data:
+            self._ledger_index = LedgerIndex(self.emissions_data)
+            self._index_data = self.emissions_data
+        return self._ledger_index
+    
+    def get_filtered_data(self, start_date=None, end_date=None, scope=None, category=None, **filters):
         """
         Get filtered emissions data.
         
+        Every filter accepts a single value or a list of accepted values.
+        
         Args:
             start_date (datetime, optional): Start date for filtering
             end_date (datetime, optional): End date for filtering
-            scope (str, optional): Scope for filtering
-            category (str, optional): Category for filtering
+            scope (str or list, optional): Scope(s) for filtering
+            category (str or list, optional): Category(ies) for filtering
+            **filters: Other ledger columns to filter on, e.g.
+                business_unit, facility, country, project, data_quality or
+                verification_status
             
         Returns:
-            pandas.DataFrame: Filtered data
+            pandas.DataFrame: Filtered data, in date order when filtered by
+                date; it may share memory with the ledger, so copy it before
+                modifying it
         """
-        data = self.emissions_data.copy()
-        
-        # Apply filters
-        if start_date and end_date:
-            mask = (data['date'] >= pd.Timestamp(start_date)) & (data['date'] <= pd.Timestamp(end_date))
-            data = data.loc[mask]
-        
-        if scope:
-            data = data[data['scope'] == scope]
+        filters = {"scope": scope, "category": category, **filters}
         
-        if category:
-            data = data[data['category'] == category]
+        if self.ledger_store.supports_queries:
+            # Let the store filter (in SQL, or by pruning month partitions)
+            # so only matching rows are loaded
+            if not (start_date and end_date):
+                start_date = end_date = None
+            return self.ledger_store.query(
+                start_date, end_date,
+                **{column: filter_values(value) for column, value in filters.items()}
+            )
         
-        return data
+        # Two binary searches over the date-sorted index, and masks over
+        # per-column value codes; only the matching rows are selected
+        return self.get_ledger_index().filter(start_date, end_date, **filters)
+
+
+def main(argv=None):
+    """Command line entry point: python data_handler.py import|reports ..."""
+    parser = argparse.ArgumentParser(description="Manage the YourCarbonFootprint emissions ledger.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="Bulk import CSV files in parallel")
+    import_parser.add_argument("files", nargs="+", help="CSV files to import")
+    import_parser.add_argument("--workers", type=int, default=IMPORT_WORKERS, help="Worker processes to use")
+    import_parser.add_argument(
+        "--resolve-factors", action="store_true",
+        help="Look up missing emission factors by category, activity and unit"
+    )
+    reports_parser = subparsers.add_parser(
+        "reports", help="Write a report per business unit, facility or country in parallel"
+    )
+    reports_parser.add_argument("output_dir", help="Directory to write the reports to")
+    reports_parser.add_argument(
+        "--by", default="business_unit",
+        help="Column to split by: business_unit (default), facility, country, ..."
+    )
+    reports_parser.add_argument("--start", type=pd.Timestamp, help="First date to include (YYYY-MM-DD)")
+    reports_parser.add_argument("--end", type=pd.Timestamp, help="Last date to include (YYYY-MM-DD)")
+    reports_parser.add_argument(
+        "--format", nargs="+", choices=["pdf", "csv"], default=["pdf", "csv"], dest="formats",
+        help="Report formats to write"
+    )
+    reports_parser.add_argument(
+        "--workers", type=int, default=REPORT_BATCH_WORKERS, help="Worker processes to use"
+    )
+    args = parser.parse_args(argv)
+    
+    handler = DataHandler()
+    if args.command == "reports":
+        data = handler.get_filtered_data(args.start, args.end)
+        if len(data) == 0:
+            print("No data available for the selected period.")
+            return 1
+        results = write_batch_reports(
+            data, args.by, args.output_dir, args.start, args.end, handler.company_info,
+            formats=tuple(args.formats), max_workers=args.workers,
+        )
+        failed = {value: paths["error"] for value, paths in results.items() if "error" in paths}
+        for value, error in failed.items():
+            print(f"Error writing reports for {value}: {error}")
+        print(
+            f"Wrote reports for {len(results) - len(failed)} {args.by.replace('_', ' ')} values "
+            f"to {args.output_dir}"
+        )
+        return 1 if failed else 0
+    
+    success, message = handler.import_csv_files(
+        args.files, max_workers=args.workers, resolve_factors=args.resolve_factors
+    )
+    print(message)
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,6 +3,9 @@ Emission factors database for YourCarbonFootprint application.
 Based on DEFRA/IPCC datasets for common emission sources.
 """
 
+import numpy as np
+import pandas as pd
+
 # Emission factors by category (in kgCO2e per unit)
 EMISSION_FACTORS = {
     # Scope 1 - Direct emissions
@@ -169,3 +172,61 @@ def get_unit(category, activity):
     if ef:
         return ef["unit"]
     return None
+
+# Factor lookup table built from EMISSION_FACTORS on first use
+_factor_table = None
+
+# Get the emission factor table for bulk lookups
+def get_factor_table():
+    """
+    Get all emission factors as a lookup table.
+    
+    Returns:
+        pandas.DataFrame: unit and emission_factor columns, indexed by
+            (category, activity)
+    """
+    global _factor_table
+    if _factor_table is None:
+        rows = [
+            (category, activity, ef["unit"], ef["factor"])
+            for category, activities in EMISSION_FACTORS.items()
+            for activity, ef in activities.items()
+        ]
+        _factor_table = pd.DataFrame(
+            rows, columns=["category", "activity", "unit", "emission_factor"]
+        ).set_index(["category", "activity"])
+    return _factor_table
+
+# Look up emission factors for many entries at once
+def lookup_emission_factors(categories, activities, units=None):
+    """
+    Look up emission factors for many entries in one vectorized join.
+    
+    Entries are matched on (category, activity, unit); an entry without a
+    unit takes the unit of its factor.
+    
+    Args:
+        categories (array-like): Emission category of each entry
+        activities (array-like): Activity of each entry
+        units (array-like, optional): Unit of each entry
+        
+    Returns:
+        tuple: (numpy.ndarray of factors, NaN where no factor matches;
+            numpy.ndarray of the matched factors' units, None where none matches)
+    """
+    table = get_factor_table()
+    keys = pd.MultiIndex.from_arrays([
+        pd.Series(categories, dtype=object).to_numpy(),
+        pd.Series(activities, dtype=object).to_numpy(),
+    ])
+    positions = table.index.get_indexer(keys)
+    found = positions >= 0
+    
+    factors = np.where(found, table["emission_factor"].to_numpy()[positions], np.nan)
+    factor_units = np.where(found, table["unit"].to_numpy(dtype=object)[positions], None)
+    if units is not None:
+        units = pd.Series(units, dtype=object).to_numpy()
+        mismatched = found & pd.notna(units) & (units != factor_units)
+        factors[mismatched] = np.nan
+        factor_units[mismatched] = None
+    return factors, factor_units
@@ -0,0 +1,227 @@
+"""
+File helpers for YourCarbonFootprint application.
+Crash-safe writes (temp file, fsync, atomic rename and numbered backups) and
+advisory file locks shared between threads and processes.
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; locks then only cover threads of one process
+    fcntl = None
+
+# Windows process access right and wait result used by process_alive()
+SYNCHRONIZE = 0x00100000
+WAIT_TIMEOUT = 0x102
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def fsync_file(path):
+    """Flush a file's contents to disk."""
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+def fsync_directory(path):
+    """Flush a directory entry (e.g. after a rename) to disk, where supported."""
+    try:
+        fd = os.open(path or ".", os.O_RDONLY)
+    except OSError:
+        # Directories cannot be opened on some platforms (e.g. Windows)
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def file_checksum(path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def backup_path(path, number):
+    """Return the path of numbered backup <path>.<number>."""
+    return f"{path}.{number}"
+
+
+def rotate_backups(path, count):
+    """
+    Keep the current file as backup .1, shifting older backups up to .count.
+
+    The current file is hard-linked rather than copied, so rotation costs
+    a few renames regardless of the file size.
+
+    Args:
+        path (str): File to back up
+        count (int): Number of backups to keep
+    """
+    if count <= 0 or not os.path.exists(path):
+        return
+    for number in range(count - 1, 0, -1):
+        older = backup_path(path, number)
+        if os.path.exists(older):
+            os.replace(older, backup_path(path, number + 1))
+
+    newest = backup_path(path, 1)
+    if os.path.exists(newest):
+        os.remove(newest)
+    try:
+        os.link(path, newest)
+    except OSError:
+        # File systems without hard links
+        shutil.copy2(path, newest)
+
+
+def replace_file(tmp_path, path, backup_count=0):
+    """
+    Atomically move a fully written temporary file over its target.
+
+    Args:
+        tmp_path (str): Temporary file, already written and fsynced
+        path (str): Target file
+        backup_count (int, optional): Numbered backups of the previous file to keep
+    """
+    rotate_backups(path, backup_count)
+    os.replace(tmp_path, path)
+    fsync_directory(os.path.dirname(path))
+
+
+def atomic_write(path, write, backup_count=0):
+    """
+    Write a file so readers only ever see the old or the new contents.
+
+    The data is written to <path>.tmp, fsynced and renamed over the target;
+    a crash at any point leaves the previous file intact.
+
+    Args:
+        path (str): Target file
+        write (callable): Called with the temporary path to write into
+        backup_count (int, optional): Numbered backups of the previous file to keep
+    """
+    tmp_path = f"{path}.tmp"
+    try:
+        write(tmp_path)
+        fsync_file(tmp_path)
+        replace_file(tmp_path, path, backup_count)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_write_text(path, text, backup_count=0):
+    """Atomically replace a text file with the given contents."""
+    def write(tmp_path):
+        with open(tmp_path, "w") as f:
+            f.write(text)
+
+    atomic_write(path, write, backup_count)
+
+
+def _thread_lock(path):
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+@contextmanager
+def file_lock(path, shared=False, blocking=True, timeout=None):
+    """
+    Hold an advisory lock on a lock file.
+
+    The lock is taken with flock on a fresh file descriptor, so it excludes
+    other threads of this process as well as other processes.
+
+    Args:
+        path (str): Lock file, created if missing
+        shared (bool, optional): Take a shared (reader) lock instead of an exclusive one
+        blocking (bool, optional): Wait for the lock; otherwise yield False if it is held
+        timeout (float, optional): Seconds to wait before raising TimeoutError
+
+    Yields:
+        bool: True if the lock was acquired
+    """
+    if fcntl is None:
+        lock = _thread_lock(path)
+        if not blocking:
+            acquired = lock.acquire(False)
+        else:
+            acquired = lock.acquire(timeout=-1 if timeout is None else timeout)
+            if not acquired:
+                raise TimeoutError(f"Timed out waiting for lock: {path}")
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+        return
+
+    mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(fd, mode | (fcntl.LOCK_NB if not blocking or deadline else 0))
+                acquired = True
+                break
+            except BlockingIOError:
+                if not blocking:
+                    acquired = False
+                    break
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Timed out waiting for lock: {path}")
+                time.sleep(0.01)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def process_alive(pid):
+    """
+    Whether a process with the given id is running on this machine.
+
+    Args:
+        pid (int): Process id
+
+    Returns:
+        bool: True if the process exists
+    """
+    if os.name == "nt":
+        import ctypes
+
+        # os.kill() would terminate the process on Windows, so open it instead
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(SYNCHRONIZE, False, pid)
+        if not handle:
+            return False
+        try:
+            return kernel32.WaitForSingleObject(handle, 0) == WAIT_TIMEOUT
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
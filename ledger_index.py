@@ -0,0 +1,222 @@
+"""
+Ledger index for YourCarbonFootprint application.
+Date-sorted positions and per-column value codes over an in-memory ledger,
+so date-range and dimension filters avoid scanning and copying it.
+"""
+
+import numpy as np
+import pandas as pd
+
+from config import LEDGER_COLUMNS
+from storage_backends import FLOAT_COLUMNS
+
+# Columns that can be filtered on: the ledger's dimensions. Dates have their
+# own range filter; amounts, ids and free-text notes are not dimensions
+FILTER_COLUMNS = [
+    column for column in LEDGER_COLUMNS
+    if column not in FLOAT_COLUMNS + ["entry_id", "date", "notes"]
+]
+
+# Above this many distinct values, a column's rows are looked up by value
+# instead of being compared against the accepted values
+MASK_MAX_VALUES = 256
+
+
+def _factorize(values):
+    """Return (codes, uniques) of a column; missing values get code -1."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+    return pd.factorize(values)
+
+
+class _ColumnIndex:
+    """
+    Value codes of one column, for building row masks of accepted values.
+
+    Every row holds the code of its value, so a filter is a comparison of
+    the codes against the few accepted ones (one byte of mask per row, no
+    per-value bitmaps kept). Columns with more than MASK_MAX_VALUES distinct
+    values, such as facility names, also keep their rows sorted by code, so
+    a filter only touches the matching rows.
+    """
+
+    def __init__(self, codes, uniques):
+        self.codes = codes
+        self.uniques = pd.Index(uniques)
+        # Row positions grouped by code and the start of each group, built on first use
+        self._positions = None
+        self._starts = None
+
+    @classmethod
+    def build(cls, values):
+        return cls(*_factorize(values))
+
+    def extended(self, values):
+        """Get the index of this column followed by appended values."""
+        codes, uniques = _factorize(values)
+        uniques = pd.Index(uniques)
+        # Map the new rows' codes onto this index's, adding unseen values
+        mapping = self.uniques.get_indexer(uniques)
+        unseen = mapping < 0
+        mapping[unseen] = len(self.uniques) + np.arange(unseen.sum())
+        codes = np.where(codes >= 0, mapping[codes] if len(mapping) else codes, -1)
+        return _ColumnIndex(
+            np.concatenate([self.codes, codes]),
+            self.uniques.append(uniques[unseen]),
+        )
+
+    def mask(self, values):
+        """Boolean mask of the rows holding any of the given values."""
+        wanted = self.uniques.get_indexer(pd.Index(values))
+        wanted = wanted[wanted >= 0]
+        if len(self.uniques) <= MASK_MAX_VALUES:
+            return np.isin(self.codes, wanted)
+
+        if self._positions is None:
+            self._positions = np.argsort(self.codes, kind="stable")
+            self._starts = np.searchsorted(self.codes[self._positions], np.arange(len(self.uniques) + 1))
+        mask = np.zeros(len(self.codes), dtype=bool)
+        for code in wanted:
+            mask[self._positions[self._starts[code]:self._starts[code + 1]]] = True
+        return mask
+
+
+def filter_values(value):
+    """Normalize a filter value (scalar or list) to a list, or None if unset."""
+    if isinstance(value, (list, tuple, set, frozenset, pd.Index, pd.Series, np.ndarray)):
+        return list(value) or None
+    if value is None or (isinstance(value, str) and not value):
+        return None
+    return [value]
+
+
+class LedgerIndex:
+    """
+    Read-only index over a ledger frame.
+
+    The row positions are sorted by date, so a date range is two binary
+    searches and a slice of the sorted positions. Each dimension column
+    filtered on is factorized once into integer codes (see _ColumnIndex),
+    so a filter with several values compares small integers rather than
+    the column's values, and filters on several dimensions are ANDs of
+    their row masks.
+
+    The frame must not be modified while the index is in use. When rows are
+    appended, extended() derives the index of the new frame from this one,
+    only indexing the new rows.
+    """
+
+    def __init__(self, data, _order=None, _columns=None):
+        """
+        Initialize the LedgerIndex class.
+
+        Args:
+            data (pandas.DataFrame): Ledger with a datetime64 date column
+        """
+        self.data = data
+        dates = data["date"].to_numpy(dtype="datetime64[ns]")
+        # NaT sorts last, so entries without a date never fall in a range
+        self.order = _order if _order is not None else np.argsort(dates, kind="stable")
+        self.dates = dates[self.order]
+        self.is_sorted = bool(np.array_equal(self.order, np.arange(len(data))))
+        # column -> _ColumnIndex, built on first use
+        self._columns = _columns if _columns is not None else {}
+
+    def extended(self, data):
+        """
+        Get the index of a frame made of this index's frame plus appended rows.
+
+        Args:
+            data (pandas.DataFrame): The indexed rows followed by new rows
+
+        Returns:
+            LedgerIndex: Index of data
+        """
+        old_count = len(self.data)
+
+        # Merge the sorted new rows into the sorted positions; ties keep
+        # existing rows first, matching a stable sort of the whole frame
+        new_dates = data["date"].iloc[old_count:].to_numpy(dtype="datetime64[ns]")
+        new_order = np.argsort(new_dates, kind="stable")
+        slots = np.searchsorted(self.dates, new_dates[new_order], side="right")
+        order = np.insert(self.order, slots, new_order + old_count)
+
+        columns = {
+            column: index.extended(data[column].iloc[old_count:])
+            for column, index in self._columns.items()
+        }
+        return LedgerIndex(data, _order=order, _columns=columns)
+
+    def mask(self, column, values):
+        """
+        Get the mask of rows whose column has any of the given values.
+
+        Args:
+            column (str): Column to match, one of FILTER_COLUMNS
+            values (list): Accepted values
+
+        Returns:
+            numpy.ndarray: Boolean mask over the ledger rows
+        """
+        if column not in self._columns:
+            if column not in FILTER_COLUMNS or column not in self.data.columns:
+                raise ValueError(f"Cannot filter on column: {column}")
+            self._columns[column] = _ColumnIndex.build(self.data[column])
+        return self._columns[column].mask(values)
+
+    def date_range(self, start_date, end_date):
+        """
+        Get the bounds of a date range in the date-sorted positions.
+
+        Args:
+            start_date (datetime): First date to include
+            end_date (datetime): Last date to include
+
+        Returns:
+            tuple: (i, j) such that order[i:j] are the rows dated in
+                [start_date, end_date], in date order
+        """
+        bounds = np.array([pd.Timestamp(start_date), pd.Timestamp(end_date)], dtype="datetime64[ns]")
+        i = int(np.searchsorted(self.dates, bounds[0], side="left"))
+        j = int(np.searchsorted(self.dates, bounds[1], side="right"))
+        return i, j
+
+    def filter(self, start_date=None, end_date=None, **filters):
+        """
+        Get the rows in a date range matching the given dimension filters.
+
+        Args:
+            start_date (datetime, optional): First date to include
+            end_date (datetime, optional): Last date to include; both dates
+                are needed to filter by date
+            **filters: Values to match per column, a single value or a list
+                of accepted values, e.g. scope="Scope 1" or
+                country=["India", "Germany"]; None or empty values are ignored
+
+        Returns:
+            pandas.DataFrame: Matching rows, in date order when filtered by
+                date and in ledger order otherwise
+        """
+        mask = None
+        for column, value in filters.items():
+            values = filter_values(value)
+            if values is None:
+                continue
+            column_mask = self.mask(column, values)
+            mask = column_mask if mask is None else mask & column_mask
+
+        if start_date and end_date:
+            i, j = self.date_range(start_date, end_date)
+            if self.is_sorted:
+                # The ledger is in date order: the range is a slice of it
+                if mask is None:
+                    return self.data.iloc[i:j]
+                return self.data.take(np.flatnonzero(mask[i:j]) + i)
+            positions = self.order[i:j]
+            if mask is not None:
+                positions = positions[mask[positions]]
+            return self.data.take(positions)
+
+        if mask is None:
+            return self.data
+        return self.data.take(np.flatnonzero(mask))
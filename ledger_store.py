@@ -0,0 +1,809 @@
+"""
+Ledger storage for YourCarbonFootprint application.
+Keeps emissions in a compacted snapshot plus an append-only journal.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from config import (
+    DATA_DIR,
+    EMISSIONS_FILE,
+    JOURNAL_DIR,
+    JOURNAL_SEGMENT_BYTES,
+    LEDGER_BACKEND,
+    LEDGER_BACKUP_COUNT,
+    LEDGER_COLUMNS,
+    LEDGER_COMPACT_INTERVAL,
+)
+from file_utils import (
+    atomic_write_text,
+    backup_path,
+    file_checksum,
+    file_lock,
+    fsync_file,
+    replace_file,
+    rotate_backups,
+)
+from sqlite_store import SqliteLedgerStore, migrate_ledger_to_sqlite
+from storage_backends import (
+    JsonBackend,
+    LedgerConflictError,
+    ParquetBackend,
+    concat_ledger,
+    file_signature,
+    format_dates,
+    get_backend,
+    migrate_json_snapshot,
+    new_entry_id,
+)
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+
+# Files kept next to the journal segments
+LOCK_FILE = "ledger.lock"
+COMPACT_LOCK_FILE = "compact.lock"
+VERSION_FILE = "VERSION"
+
+# Layout of the partitioned snapshot: <root>/<YYYY-MM>/emissions.parquet
+PARTITION_FILE = "emissions.parquet"
+UNDATED_PARTITION = "undated"
+PARTITION_MANIFEST_FILE = "MANIFEST.json"
+
+
+class LedgerStore:
+    """
+    Emissions ledger stored as a snapshot file plus journal segments.
+
+    Every add or delete is appended to the active journal segment as one
+    JSON line, so a write costs O(1) I/O regardless of ledger size. Deletes
+    are recorded as tombstones referencing the entry_id of the removed row.
+    Once the active segment grows past JOURNAL_SEGMENT_BYTES it is sealed and
+    a background thread folds the sealed segments into the snapshot, which is
+    read and written by a storage backend (JSON records or Parquet).
+
+    The snapshot is never written in place: a new one is written to a
+    temporary file, fsynced and renamed over the old one, which is kept as
+    numbered backup <snapshot>.1 (older ones shift up to .backup_count).
+
+    Every snapshot is described by a manifest (<snapshot>.manifest) with its
+    row count, size, SHA-256 checksum and the ledger version it contains.
+    The manifest is written after the snapshot and before the folded
+    segments are removed, so a snapshot that does not match it is treated
+    as unreadable and the previous one (plus the still present segments)
+    is used instead.
+
+    Several app processes can share one ledger. Every read and write holds
+    a lock file in the journal directory (shared for reads, exclusive for
+    writes), and a second lock file makes compactions and rewrites
+    exclusive. Each append, delete or rewrite increments a version number
+    stored in the journal directory; rewrite() takes the version it started
+    from and raises LedgerConflictError if another writer got there first.
+    """
+
+    supports_queries = False
+    supports_aggregates = False
+
+    def __init__(self, backend=None, journal_dir=JOURNAL_DIR,
+                 segment_bytes=JOURNAL_SEGMENT_BYTES, backup_count=LEDGER_BACKUP_COUNT):
+        """Initialize the LedgerStore class."""
+        self.backend = backend or JsonBackend(EMISSIONS_FILE)
+        self.snapshot_path = self.backend.path
+        self.journal_dir = journal_dir
+        self.segment_bytes = segment_bytes
+        self.backup_count = backup_count
+        os.makedirs(self.journal_dir, exist_ok=True)
+
+        # Guards journal appends, the version and snapshot replacement
+        self.lock_path = os.path.join(self.journal_dir, LOCK_FILE)
+        # Only one compaction or rewrite at a time, across processes
+        self.compact_lock_path = os.path.join(self.journal_dir, COMPACT_LOCK_FILE)
+        self.version_path = os.path.join(self.journal_dir, VERSION_FILE)
+        self.manifest_path = f"{self.snapshot_path}.manifest"
+        self._compaction_thread = None
+        self._scheduler_thread = None
+        # (mtime, size) of snapshot files already checked against the manifest
+        self._verified = {}
+
+    def _segment_path(self, seq):
+        return os.path.join(self.journal_dir, f"{SEGMENT_PREFIX}{seq:06d}{SEGMENT_SUFFIX}")
+
+    def _segments(self):
+        """Return the sequence numbers of existing journal segments, oldest first."""
+        seqs = []
+        for name in os.listdir(self.journal_dir):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                try:
+                    seqs.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+                except ValueError:
+                    continue
+        return sorted(seqs)
+
+    def _active_segment(self):
+        """
+        Return the sequence number appends go to: the newest segment.
+
+        Compaction creates the next (empty) segment when it seals the current
+        ones, so every process appending after that agrees on where to write.
+        """
+        segments = self._segments()
+        return segments[-1] if segments else 1
+
+    def _read_version(self):
+        try:
+            with open(self.version_path, "r") as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _bump_version(self):
+        """Increment the ledger version. Must be called holding the ledger lock."""
+        version = self._read_version() + 1
+        atomic_write_text(self.version_path, str(version))
+        return version
+
+    def version(self):
+        """Current ledger version, incremented by every append, delete and rewrite."""
+        with file_lock(self.lock_path, shared=True):
+            return self._read_version()
+
+    def read_manifest(self):
+        """
+        Read the manifest of the current snapshot.
+
+        Returns:
+            dict: Manifest fields, or None if there is no manifest
+        """
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    @staticmethod
+    def _describe_file(tmp_path, rows):
+        """Row count, size and checksum of a written snapshot file."""
+        return {
+            "rows": rows,
+            "size": os.path.getsize(tmp_path),
+            "sha256": file_checksum(tmp_path),
+        }
+
+    def _describe_snapshot(self, tmp_path, rows, version, segments):
+        """Build the manifest of a written snapshot before it is put in place."""
+        return {
+            "snapshot": os.path.basename(self.snapshot_path),
+            "backend": self.backend.name,
+            **self._describe_file(tmp_path, rows),
+            "version": version,
+            "segments": segments,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        }
+
+    def _write_manifest(self, manifest):
+        """Record the manifest of the snapshot just put in place. Must be called holding the ledger lock."""
+        atomic_write_text(self.manifest_path, json.dumps(manifest, indent=2))
+
+    def _mark_verified(self, path):
+        stat = os.stat(path)
+        self._verified[path] = (stat.st_mtime_ns, stat.st_size)
+
+    def _verify_file(self, path, expected):
+        """
+        Check a snapshot file against its manifest entry, once per file version.
+
+        Raises:
+            ValueError: If the size or checksum does not match
+        """
+        if expected is None or not os.path.exists(path):
+            # Snapshots written before manifests existed are trusted as is
+            return
+        stat = os.stat(path)
+        if (stat.st_mtime_ns, stat.st_size) == self._verified.get(path):
+            return
+        if stat.st_size != expected["size"] or file_checksum(path) != expected["sha256"]:
+            raise ValueError(f"Snapshot {path} does not match its manifest")
+        self._verified[path] = (stat.st_mtime_ns, stat.st_size)
+
+    def _read_file(self, path, expected):
+        """
+        Read a snapshot file, falling back to its newest readable backup.
+
+        Raises the original error (e.g. json.JSONDecodeError) if the file and
+        all of its backups are unreadable.
+        """
+        try:
+            self._verify_file(path, expected)
+            return type(self.backend)(path).read()
+        except Exception as error:
+            for number in range(1, self.backup_count + 1):
+                candidate = backup_path(path, number)
+                if not os.path.exists(candidate):
+                    continue
+                try:
+                    snapshot = type(self.backend)(candidate).read()
+                except Exception:
+                    continue
+                print(f"Emissions snapshot unreadable ({str(error)}), using backup {candidate}")
+                return snapshot
+            raise
+
+    def _read_backend_snapshot(self):
+        """Read the snapshot, verified against the manifest."""
+        return self._read_file(self.snapshot_path, self.read_manifest())
+
+    def _read_snapshot(self):
+        """Read the compacted snapshot. Raises json.JSONDecodeError if corrupted."""
+        snapshot = self._read_backend_snapshot()
+        if len(snapshot) == 0:
+            return pd.DataFrame(columns=LEDGER_COLUMNS)
+        # Rows written before the journal existed get ids derived from their
+        # position, which stay stable until the next compaction persists them
+        legacy_ids = pd.Series([f"legacy-{i}" for i in range(len(snapshot))], index=snapshot.index)
+        if "entry_id" not in snapshot.columns:
+            snapshot.insert(0, "entry_id", legacy_ids)
+        else:
+            snapshot["entry_id"] = snapshot["entry_id"].fillna(legacy_ids)
+        return snapshot
+
+    def _read_journal(self, seqs):
+        """
+        Replay journal segments.
+
+        Returns:
+            tuple: (list of added records, set of deleted entry ids)
+        """
+        added = []
+        deleted = set()
+        for seq in seqs:
+            path = self._segment_path(seq)
+            if not os.path.exists(path):
+                continue
+            with open(path, "r") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from an interrupted append
+                        continue
+                    if record.get("op") == "add":
+                        added.append(record["entry"])
+                    elif record.get("op") == "delete":
+                        deleted.add(record["entry_id"])
+        return added, deleted
+
+    @staticmethod
+    def _fold(snapshot, added, deleted):
+        """Apply journal additions and tombstones to a snapshot."""
+        frames = [snapshot] if len(snapshot) > 0 else []
+        if added:
+            tail = pd.DataFrame(added)
+            # Replay is idempotent: rows already folded into the snapshot are skipped
+            if len(snapshot) > 0:
+                tail = tail[~tail["entry_id"].isin(snapshot["entry_id"])]
+            frames.append(tail)
+        if not frames:
+            return snapshot.copy()
+
+        data = pd.concat(frames, ignore_index=True)
+        if deleted:
+            data = data[~data["entry_id"].isin(deleted)].reset_index(drop=True)
+        return data
+
+    def load_versioned(self):
+        """
+        Load the ledger together with the version it was read at.
+
+        Returns:
+            tuple: (pandas.DataFrame emissions data, int version)
+        """
+        with file_lock(self.lock_path, shared=True):
+            snapshot = self._read_snapshot()
+            added, deleted = self._read_journal(self._segments())
+            version = self._read_version()
+        return self.backend.normalize(self._fold(snapshot, added, deleted)), version
+
+    def load(self):
+        """
+        Load the ledger from the snapshot and the journal.
+
+        Returns:
+            pandas.DataFrame: Emissions data, typed by the storage backend
+        """
+        return self.load_versioned()[0]
+
+    def normalize(self, data):
+        """Convert data to the column types returned by load()."""
+        return self.backend.normalize(data)
+
+    def signature(self):
+        """
+        Cheap fingerprint of the files backing the ledger.
+
+        It changes whenever this or another process writes, so cached copies
+        of the ledger can tell they are stale without reading any data.
+        """
+        paths = [self.snapshot_path] + [self._segment_path(seq) for seq in self._segments()]
+        return file_signature(paths)
+
+    def _append_records(self, records):
+        """Append journal records to the active segment and return the new version."""
+        payload = "".join(json.dumps(record, default=str) + "\n" for record in records)
+        with file_lock(self.lock_path):
+            path = self._segment_path(self._active_segment())
+            with open(path, "a") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            version = self._bump_version()
+            segment_full = os.path.getsize(path) >= self.segment_bytes
+        if segment_full:
+            self.compact_async()
+        return version
+
+    def append_versioned(self, entries):
+        """
+        Append new emission entries to the journal.
+
+        Args:
+            entries (pandas.DataFrame): New emission entries; any entry_id
+                column is replaced by newly assigned ids
+
+        Returns:
+            tuple: (pandas.DataFrame entries with an entry_id assigned to
+                each row, int version the append produced)
+        """
+        # Ids are only ever assigned here, so they are unique across the ledger
+        entries = entries.drop(columns="entry_id", errors="ignore")
+        entries.insert(0, "entry_id", [new_entry_id() for _ in range(len(entries))])
+
+        records = format_dates(entries).to_dict("records")
+        version = self._append_records({"op": "add", "entry": record} for record in records)
+        return self.backend.normalize(entries), version
+
+    def append(self, entries):
+        """
+        Append new emission entries to the journal.
+
+        Args:
+            entries (pandas.DataFrame): New emission entries
+
+        Returns:
+            pandas.DataFrame: The entries with an entry_id assigned to each row
+        """
+        return self.append_versioned(entries)[0]
+
+    def delete_versioned(self, entry_ids):
+        """
+        Record tombstones for deleted emission entries.
+
+        Args:
+            entry_ids (list): Ids of the entries to delete
+
+        Returns:
+            int: Version the delete produced
+        """
+        return self._append_records({"op": "delete", "entry_id": entry_id} for entry_id in entry_ids)
+
+    def delete(self, entry_ids):
+        """
+        Record tombstones for deleted emission entries.
+
+        Args:
+            entry_ids (list): Ids of the entries to delete
+        """
+        self.delete_versioned(entry_ids)
+
+    def _write_snapshot_file(self, data, path=None):
+        """Write a snapshot to a temporary file, fsync it and return its path."""
+        tmp_path = f"{path or self.snapshot_path}.tmp"
+        try:
+            self.backend.write(data, tmp_path)
+            fsync_file(tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return tmp_path
+
+    def _prepare_snapshot(self, data, version, segments):
+        """
+        Write a new snapshot next to the current one without putting it in place.
+
+        Returns:
+            tuple: (temporary path, manifest) for _install_snapshot()
+        """
+        tmp_path = self._write_snapshot_file(data)
+        return tmp_path, self._describe_snapshot(tmp_path, len(data), version, segments)
+
+    def _install_snapshot(self, prepared):
+        """
+        Rename a prepared snapshot into place, rotating numbered backups, and
+        record its manifest. Must be called holding the ledger lock.
+        """
+        tmp_path, manifest = prepared
+        replace_file(tmp_path, self.snapshot_path, self.backup_count)
+        self._write_manifest(manifest)
+        self._mark_verified(self.snapshot_path)
+
+    def _prepare_compaction(self, sealed, version):
+        """Fold sealed segments into a prepared snapshot."""
+        snapshot = self._read_snapshot()
+        added, deleted = self._read_journal(sealed)
+        return self._prepare_snapshot(self._fold(snapshot, added, deleted), version, sealed)
+
+    def _start_segment(self, seq):
+        """Create an empty journal segment, making it the active one."""
+        open(self._segment_path(seq), "a").close()
+
+    def compact(self, blocking=True):
+        """
+        Fold sealed journal segments into the snapshot.
+
+        Args:
+            blocking (bool, optional): Wait for a compaction running in another
+                thread or process instead of skipping
+
+        Returns:
+            bool: True if any segments were compacted
+        """
+        with file_lock(self.compact_lock_path, blocking=blocking) as acquired:
+            if not acquired:
+                return False
+
+            # Seal the existing segments so new appends go to a fresh one
+            with file_lock(self.lock_path):
+                sealed = self._segments()
+                if not any(os.path.getsize(self._segment_path(seq)) for seq in sealed):
+                    return False
+                self._start_segment(sealed[-1] + 1)
+                version = self._read_version()
+
+            # Sealed segments are immutable and only a compaction or rewrite
+            # replaces the snapshot, so folding needs no ledger lock
+            prepared = self._prepare_compaction(sealed, version)
+
+            with file_lock(self.lock_path):
+                self._install_snapshot(prepared)
+                for seq in sealed:
+                    os.remove(self._segment_path(seq))
+            return True
+
+    def compact_async(self):
+        """Start a background compaction unless one is already running."""
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        self._compaction_thread = threading.Thread(target=self._compact_quietly, daemon=True)
+        self._compaction_thread.start()
+
+    def _compact_quietly(self):
+        try:
+            self.compact(blocking=False)
+        except Exception as e:
+            print(f"Error compacting emissions journal: {str(e)}")
+
+    def start_background_compaction(self, interval=LEDGER_COMPACT_INTERVAL):
+        """
+        Compact the journal every interval seconds on a daemon thread.
+
+        Keeps the journal tail that each load replays small even when no
+        segment fills up, e.g. for a ledger receiving a few entries a day.
+
+        Args:
+            interval (float, optional): Seconds between compactions; 0 disables
+        """
+        if interval <= 0 or self._scheduler_thread is not None:
+            return
+        self._scheduler_thread = threading.Thread(
+            target=self._compact_periodically, args=(interval,), daemon=True
+        )
+        self._scheduler_thread.start()
+
+    def _compact_periodically(self, interval):
+        while True:
+            time.sleep(interval)
+            self._compact_quietly()
+
+    def rewrite(self, data, expected_version=None):
+        """
+        Replace the whole ledger with the given data and clear the journal.
+
+        Args:
+            data (pandas.DataFrame): Complete emissions data
+            expected_version (int, optional): Version the data was derived from;
+                if the ledger has moved on since, nothing is written
+
+        Returns:
+            int: The new ledger version
+
+        Raises:
+            LedgerConflictError: If expected_version is not the current version
+        """
+        data = data.copy()
+        if "entry_id" not in data.columns:
+            data.insert(0, "entry_id", [new_entry_id() for _ in range(len(data))])
+
+        with file_lock(self.compact_lock_path), file_lock(self.lock_path):
+            version = self._read_version()
+            if expected_version is not None and expected_version != version:
+                raise LedgerConflictError(expected_version, version)
+
+            segments = self._segments()
+            self._install_snapshot(self._prepare_snapshot(data, version + 1, segments))
+            for seq in segments:
+                os.remove(self._segment_path(seq))
+            self._start_segment(segments[-1] + 1 if segments else 1)
+            return self._bump_version()
+
+
+def partition_keys(dates):
+    """
+    Return the reporting-month partition of each date.
+
+    Args:
+        dates (pandas.Series): Dates or date strings
+
+    Returns:
+        pandas.Series: "YYYY-MM" keys, "undated" for missing or invalid dates
+    """
+    dates = pd.to_datetime(dates, errors="coerce")
+    return dates.dt.strftime("%Y-%m").fillna(UNDATED_PARTITION)
+
+
+class PartitionedLedgerStore(LedgerStore):
+    """
+    Journal-backed ledger whose snapshot is split by reporting month.
+
+    Each month is a Parquet file in its own directory
+    (<root>/2024-03/emissions.parquet; rows without a valid date go to
+    <root>/undated/). Compaction only rewrites the months touched by the
+    journal, and query() only reads the months overlapping the requested
+    date range plus the journal tail. One manifest (<root>/MANIFEST.json)
+    records row count, size and checksum per partition.
+    """
+
+    name = "partitioned"
+    supports_queries = True
+
+    def __init__(self, root, journal_dir=JOURNAL_DIR,
+                 segment_bytes=JOURNAL_SEGMENT_BYTES, backup_count=LEDGER_BACKUP_COUNT):
+        """Initialize the PartitionedLedgerStore class."""
+        os.makedirs(root, exist_ok=True)
+        super().__init__(ParquetBackend(root), journal_dir, segment_bytes, backup_count)
+        self.root = root
+        self.manifest_path = os.path.join(root, PARTITION_MANIFEST_FILE)
+
+    def _partition_path(self, key):
+        return os.path.join(self.root, key, PARTITION_FILE)
+
+    def partitions(self):
+        """Return the keys of the existing partitions, oldest first."""
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.exists(self._partition_path(name))
+        )
+
+    @staticmethod
+    def _keys_in_range(keys, start_date=None, end_date=None):
+        """Prune partitions to those that can hold dates in the range."""
+        if start_date is None and end_date is None:
+            return keys
+        start = pd.Timestamp(start_date).strftime("%Y-%m") if start_date is not None else None
+        end = pd.Timestamp(end_date).strftime("%Y-%m") if end_date is not None else None
+        return [
+            key for key in keys
+            if key != UNDATED_PARTITION
+            and (start is None or key >= start)
+            and (end is None or key <= end)
+        ]
+
+    def _read_partitions(self, keys):
+        expected = (self.read_manifest() or {}).get("partitions", {})
+        frames = [self._read_file(self._partition_path(key), expected.get(key)) for key in keys]
+        frames = [frame for frame in frames if len(frame) > 0]
+        if not frames:
+            return pd.DataFrame(columns=LEDGER_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+    def _read_snapshot(self):
+        return self._read_partitions(self.partitions())
+
+    def signature(self):
+        paths = [self.manifest_path] + [self._partition_path(key) for key in self.partitions()]
+        paths += [self._segment_path(seq) for seq in self._segments()]
+        return file_signature(paths)
+
+    def _prepare_partition(self, key, data):
+        """Write one partition to a temporary file; (None, None) removes it."""
+        if len(data) == 0:
+            return None, None
+        path = self._partition_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = self._write_snapshot_file(data, path)
+        return tmp_path, self._describe_file(tmp_path, len(data))
+
+    def _prepare_snapshot(self, data, version, segments):
+        keys = partition_keys(data["date"]) if len(data) > 0 else pd.Series(dtype=object)
+        prepared = {key: (None, None) for key in self.partitions()}
+        for key, partition in data.groupby(keys.values, sort=True):
+            prepared[key] = self._prepare_partition(key, partition)
+        return prepared, version, segments
+
+    def _prepare_compaction(self, sealed, version):
+        added, deleted = self._read_journal(sealed)
+        tail = pd.DataFrame(added, columns=None if added else ["date"])
+        tail_keys = partition_keys(tail["date"])
+        keys = set(tail_keys)
+        existing = self.partitions()
+
+        # Tombstones only carry entry ids, so find the partitions holding them
+        for key in existing:
+            if deleted and key not in keys:
+                try:
+                    ids = pd.read_parquet(self._partition_path(key), columns=["entry_id"], engine="pyarrow")
+                    if ids["entry_id"].isin(deleted).any():
+                        keys.add(key)
+                except Exception:
+                    # Unreadable here; the full read below falls back to a backup
+                    keys.add(key)
+
+        prepared = {}
+        for key in sorted(keys):
+            snapshot = self._read_partitions([key] if key in existing else [])
+            key_added = tail[tail_keys == key].to_dict("records")
+            prepared[key] = self._prepare_partition(key, self._fold(snapshot, key_added, deleted))
+        return prepared, version, sealed
+
+    def _install_snapshot(self, prepared):
+        partitions, version, segments = prepared
+        manifest = self.read_manifest() or {}
+        described = manifest.get("partitions", {})
+        for key, (tmp_path, description) in partitions.items():
+            path = self._partition_path(key)
+            if tmp_path is None:
+                # Keep the last contents of an emptied month as its backup
+                if os.path.exists(path):
+                    rotate_backups(path, self.backup_count)
+                    os.remove(path)
+                described.pop(key, None)
+            else:
+                replace_file(tmp_path, path, self.backup_count)
+                described[key] = description
+                self._mark_verified(path)
+
+        self._write_manifest({
+            "snapshot": os.path.basename(self.root),
+            "backend": self.name,
+            "rows": sum(description["rows"] for description in described.values()),
+            "partitions": dict(sorted(described.items())),
+            "version": version,
+            "segments": segments,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        })
+
+    def query(self, start_date=None, end_date=None, **filters):
+        """
+        Read only the rows matching the given filters.
+
+        Only partitions overlapping the date range are read; the journal tail
+        is replayed on top and filtered the same way.
+
+        Args:
+            start_date (datetime, optional): Inclusive start date
+            end_date (datetime, optional): Inclusive end date
+            **filters: Filters on ledger columns, a value or a list of
+                accepted values, e.g. scope="Scope 1" or country=["India", "Germany"]
+
+        Returns:
+            pandas.DataFrame: Matching emissions data
+        """
+        for column in filters:
+            if column not in LEDGER_COLUMNS:
+                raise ValueError(f"Cannot filter on column: {column}")
+
+        with file_lock(self.lock_path, shared=True):
+            snapshot = self._read_partitions(self._keys_in_range(self.partitions(), start_date, end_date))
+            added, deleted = self._read_journal(self._segments())
+        data = self.normalize(self._fold(snapshot, added, deleted))
+
+        mask = pd.Series(True, index=data.index)
+        if start_date is not None:
+            mask &= data["date"] >= pd.Timestamp(start_date)
+        if end_date is not None:
+            mask &= data["date"] <= pd.Timestamp(end_date)
+        for column, value in filters.items():
+            if isinstance(value, (list, tuple, set)):
+                mask &= data[column].isin(value)
+            elif value is not None:
+                mask &= data[column] == value
+        return data[mask].reset_index(drop=True)
+
+
+def merge_concurrent_changes(data, base_ids, current):
+    """
+    Carry rows added or deleted by other writers over into edited data.
+
+    Rows in the current ledger that the edit never saw are added, and rows
+    the edit started from that are no longer in the ledger are dropped.
+    Rows present on both sides keep the edited values.
+
+    Args:
+        data (pandas.DataFrame): Edited emissions data, with entry ids
+        base_ids (set): Entry ids of the ledger version the edit started from
+        current (pandas.DataFrame): Ledger as currently stored
+
+    Returns:
+        pandas.DataFrame: Edited data merged with the concurrent changes
+    """
+    current_ids = set(current["entry_id"])
+    removed = base_ids - current_ids
+    added = current[~current["entry_id"].isin(base_ids) & ~current["entry_id"].isin(data["entry_id"])]
+
+    data = data[~data["entry_id"].isin(removed)]
+    return concat_ledger([data, added])
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def _open_sqlite_store(data_dir):
+    """Open the SQLite store, migrating emissions.json and its journal once."""
+    store = SqliteLedgerStore(os.path.join(data_dir, "emissions.db"))
+    json_path = os.path.join(data_dir, "emissions.json")
+    journal_dir = os.path.join(data_dir, "journal")
+    if os.path.exists(json_path):
+        legacy = LedgerStore(JsonBackend(json_path), journal_dir)
+        migrate_ledger_to_sqlite(store, legacy.load())
+        for seq in legacy._segments():
+            os.remove(legacy._segment_path(seq))
+        os.replace(json_path, f"{json_path}.migrated")
+    return store
+
+
+def _open_partitioned_store(data_dir):
+    """Open the partitioned store, migrating emissions.json and its journal once."""
+    journal_dir = os.path.join(data_dir, "journal")
+    store = PartitionedLedgerStore(os.path.join(data_dir, "emissions"), journal_dir)
+    json_path = os.path.join(data_dir, "emissions.json")
+    if os.path.exists(json_path) and not store.partitions():
+        # The journal is shared, so rewrite() folds it in and clears it
+        store.rewrite(LedgerStore(JsonBackend(json_path), journal_dir).load())
+        os.replace(json_path, f"{json_path}.migrated")
+    return store
+
+
+def get_ledger_store(backend_name=LEDGER_BACKEND, data_dir=DATA_DIR):
+    """
+    Get the process-wide ledger store for a backend and data directory.
+
+    Streamlit re-executes app.py on every interaction, so the store (and its
+    locks and compaction threads) lives here, in an imported module. The
+    first time a non-JSON backend is used, an existing emissions.json is
+    migrated into it. Journal-backed stores compact in the background every
+    LEDGER_COMPACT_INTERVAL seconds.
+    """
+    key = (backend_name, os.path.abspath(data_dir))
+    with _stores_lock:
+        if key not in _stores:
+            if backend_name == SqliteLedgerStore.name:
+                store = _open_sqlite_store(data_dir)
+            elif backend_name == PartitionedLedgerStore.name:
+                store = _open_partitioned_store(data_dir)
+            else:
+                backend = get_backend(backend_name, data_dir)
+                migrate_json_snapshot(backend, os.path.join(data_dir, "emissions.json"))
+                store = LedgerStore(backend, os.path.join(data_dir, "journal"))
+            if isinstance(store, LedgerStore):
+                store.start_background_compaction()
+            _stores[key] = store
+        return _stores[key]
@@ -0,0 +1,206 @@
+"""
+PDF tables for YourCarbonFootprint application.
+Writes ledger tables into FPDF reports from preformatted column arrays, one
+content-stream line per row, with a row cap and a summarized appendix for
+periods with too many entries to list.
+"""
+
+import pandas as pd
+
+# (header, width in mm) of the emissions data table
+ENTRY_COLUMNS = [
+    ("Date", 25),
+    ("Scope", 25),
+    ("Category", 30),
+    ("Activity", 30),
+    ("Quantity", 20),
+    ("Unit", 15),
+    ("Factor", 25),
+    ("Emissions (kgCO2e)", 30),
+]
+
+# (header, width in mm) of the appendix summarizing entries left out of the table
+APPENDIX_COLUMNS = [
+    ("Month", 25),
+    ("Scope", 25),
+    ("Category", 50),
+    ("Entries", 25),
+    ("Emissions (kgCO2e)", 40),
+]
+
+ROW_HEIGHT = 10
+
+
+def _text(values):
+    """Format a column as text, with missing values empty."""
+    return values.astype(object).where(values.notna(), "").astype(str).tolist()
+
+
+def _number(values, decimals):
+    """Format a numeric column with a fixed number of decimals."""
+    return values.astype("float64").map(f"{{:.{decimals}f}}".format).tolist()
+
+
+def format_entries(data):
+    """
+    Format the columns of the emissions data table.
+
+    Each column is converted to text in one vectorized pass, so writing the
+    table never touches pandas per row.
+
+    Args:
+        data (pandas.DataFrame): Emission entries
+
+    Returns:
+        list: One list of strings per ENTRY_COLUMNS column
+    """
+    dates = pd.to_datetime(data["date"], errors="coerce")
+    return [
+        dates.dt.strftime("%Y-%m-%d").where(dates.notna(), data["date"].astype(str)).tolist(),
+        _text(data["scope"]),
+        _text(data["category"]),
+        _text(data["activity"]),
+        _number(data["quantity"], 2),
+        _text(data["unit"]),
+        _number(data["emission_factor"], 4),
+        _number(data["emissions_kgCO2e"], 2),
+    ]
+
+
+def format_breakdown(breakdown):
+    """
+    Format the columns of the appendix table.
+
+    Args:
+        breakdown (pandas.DataFrame): month, scope, category, entries and
+            emissions_kgCO2e per group, as ReportSummary.breakdown
+
+    Returns:
+        list: One list of strings per APPENDIX_COLUMNS column
+    """
+    return [
+        _text(breakdown["month"]),
+        _text(breakdown["scope"]),
+        _text(breakdown["category"]),
+        breakdown["entries"].astype(str).tolist(),
+        _number(breakdown["emissions_kgCO2e"], 2),
+    ]
+
+
+def _escape(text):
+    """Escape text for a PDF string literal."""
+    return text.replace("\\", "\\\\").replace(")", "\\)").replace("(", "\\(").replace("\r", "\\r")
+
+
+def write_table(pdf, columns, values, row_height=ROW_HEIGHT, font_size=8, progress=None):
+    """
+    Write a bordered table, repeating its header on every page.
+
+    Rows are written straight to the page's content stream, one line per
+    row, in the same layout cell() would produce; pages are added as the
+    table fills them.
+
+    Args:
+        pdf (FPDF): Document to write to, positioned where the table starts
+        columns (list): (header, width in mm) per column
+        values (list): One list of strings per column, as from format_entries()
+        row_height (float, optional): Row height in mm
+        font_size (float, optional): Font size of the rows, in points
+        progress (callable, optional): Called with the fraction of rows
+            written after each page
+    """
+    widths = [width for _, width in columns]
+    headers = [header for header, _ in columns]
+    rows = len(values[0]) if values else 0
+    k = pdf.k
+    left = pdf.l_margin
+
+    def write_header():
+        pdf.set_font("Arial", "B", 10)
+        for header, width in zip(headers, widths):
+            pdf.cell(width, row_height, header, 1)
+        pdf.ln()
+        pdf.set_font("Arial", "", font_size)
+
+    # Row template: a bordered rectangle and a left-aligned text per cell,
+    # laid out like cell(); only the page coordinates vary per row
+    offsets = [left + sum(widths[:i]) for i in range(len(widths))]
+    baseline = 0.5 * row_height + 0.3 * font_size / k
+    template = " ".join(
+        f"{x * k:.2f} {{top:.2f}} {width * k:.2f} {-row_height * k:.2f} re S "
+        f"BT {(x + pdf.c_margin) * k:.2f} {{base:.2f}} Td ({{{i}}}) Tj ET"
+        for i, (x, width) in enumerate(zip(offsets, widths))
+    )
+
+    # Start on a new page unless the header and a first row fit
+    if pdf.y + 2 * row_height > pdf.page_break_trigger:
+        pdf.add_page()
+    write_header()
+    row = 0
+    while row < rows:
+        # Rows that fit on the rest of this page
+        fit = max(int((pdf.page_break_trigger - pdf.y) // row_height), 1)
+        end = min(row + fit, rows)
+        lines = []
+        y = pdf.y
+        for cells in zip(*(column[row:end] for column in values)):
+            lines.append(template.format(
+                *(_escape(cell) for cell in cells),
+                top=(pdf.h - y) * k,
+                base=(pdf.h - (y + baseline)) * k,
+            ))
+            y += row_height
+        pdf._out("\n".join(lines))
+        pdf.set_xy(left, y)
+        row = end
+        if progress is not None:
+            progress(row / rows)
+        if row < rows:
+            pdf.add_page()
+            write_header()
+
+
+def write_entries_table(pdf, values, total_rows, progress=None):
+    """
+    Write the emissions data table of a report.
+
+    When the table lists fewer than total_rows entries, it ends with a note
+    and write_entries_appendix() should summarize all of them.
+
+    Args:
+        pdf (FPDF): Document to write to
+        values (list): Formatted columns of the listed entries, as from
+            format_entries()
+        total_rows (int): Number of entries in the report
+        progress (callable, optional): Called with the fraction of rows
+            written after each page
+
+    Returns:
+        int: Number of entries left out of the table
+    """
+    write_table(pdf, ENTRY_COLUMNS, values, progress=progress)
+    listed = len(values[0])
+    omitted = total_rows - listed
+    if omitted > 0:
+        pdf.set_font("Arial", "I", 10)
+        pdf.cell(
+            0, 10,
+            f"Showing {listed} of {total_rows} entries; all entries are summarized in the appendix.",
+            0, 1,
+        )
+    return omitted
+
+
+def write_entries_appendix(pdf, breakdown):
+    """
+    Write an appendix summarizing entries per month, scope and category.
+
+    Args:
+        pdf (FPDF): Document to write to
+        breakdown (pandas.DataFrame): Entries and emissions per group, as
+            ReportSummary.breakdown
+    """
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, "Appendix: Emissions by Month, Scope and Category", 0, 1)
+    write_table(pdf, APPENDIX_COLUMNS, format_breakdown(breakdown))
@@ -0,0 +1,257 @@
+"""
+Report charts for YourCarbonFootprint application.
+Renders the report charts to PNG images on the server, cached on disk by a
+hash of the aggregated data they plot, for embedding in PDF reports.
+"""
+
+import glob
+import hashlib
+import io
+import os
+import threading
+
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.patches import Patch
+from PIL import Image
+
+from config import CHART_CACHE_FILES, CHARTS_DIR
+
+# Colors of the scopes, as in the dashboard's Plotly charts
+SCOPE_COLORS = {
+    "Scope 1": "#4CAF50",
+    "Scope 2": "#2196F3",
+    "Scope 3": "#FFC107",
+}
+
+# Bump when the chart styling changes, so cached images are not reused
+CHART_STYLE_VERSION = 1
+
+# Image size in inches and resolution
+CHART_SIZE = (6.4, 4.8)
+CHART_DPI = 110
+
+# Activities shown in the activity chart
+TOP_ACTIVITIES = 10
+
+
+def chart_data(summary):
+    """
+    Get the data of each report chart from a report's aggregates.
+
+    Args:
+        summary (ReportSummary): Aggregates of the report's entries
+
+    Returns:
+        dict: {chart name: pandas.Series or DataFrame} for the scope pie,
+            category bar, monthly time series and top activities charts
+    """
+    by_scope = summary.by_scope
+    breakdown = summary.breakdown
+    monthly = (
+        breakdown.dropna(subset=["month"])
+        .groupby(["month", "scope"], observed=True, sort=True)["emissions_kgCO2e"]
+        .sum()
+        .unstack("scope", fill_value=0.0)
+    )
+    return {
+        # A pie can only show positive shares; with none it says "No data"
+        "scope": by_scope[by_scope > 0],
+        "category": summary.by_category.sort_values(ascending=False),
+        "time_series": monthly,
+        "activity": summary.by_activity.nlargest(TOP_ACTIVITIES),
+    }
+
+
+def _scope_color(scope):
+    return SCOPE_COLORS.get(str(scope), "#9E9E9E")
+
+
+def _draw_scope(ax, data):
+    ax.pie(
+        data.to_numpy(),
+        labels=[str(scope) for scope in data.index],
+        colors=[_scope_color(scope) for scope in data.index],
+        autopct="%1.1f%%",
+        startangle=90,
+    )
+    ax.axis("equal")
+    ax.set_title("Emissions by Scope")
+
+
+def _draw_category(ax, data):
+    ax.bar([str(category) for category in data.index], data.to_numpy(), color="#059669")
+    ax.set_title("Emissions by Category")
+    ax.set_ylabel("Emissions (kgCO2e)")
+    ax.tick_params(axis="x", labelrotation=45)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment("right")
+
+
+def _draw_time_series(ax, data):
+    for scope in data.columns:
+        ax.plot(list(data.index), data[scope].to_numpy(), marker="o", label=str(scope), color=_scope_color(scope))
+    ax.set_title("Emissions Over Time")
+    ax.set_xlabel("Month")
+    ax.set_ylabel("Emissions (kgCO2e)")
+    if len(data.columns):
+        ax.legend(title="Scope")
+    # Label at most about a dozen months
+    ticks = list(data.index)[::max(len(data.index) // 12, 1)]
+    ax.set_xticks(ticks)
+    ax.tick_params(axis="x", labelrotation=45)
+
+
+def _draw_activity(ax, data):
+    # Largest at the top; bars colored by scope, as in the breakdown treemap.
+    # Bars are placed by position, as an activity can appear under several scopes
+    data = data.iloc[::-1]
+    positions = range(len(data))
+    ax.barh(positions, data.to_numpy(), color=[_scope_color(scope) for scope, _, _ in data.index])
+    ax.set_yticks(positions, [
+        f"{activity if pd.notna(activity) else 'Unspecified'} ({category})"
+        for _, category, activity in data.index
+    ])
+    scopes = sorted({str(scope) for scope, _, _ in data.index})
+    ax.legend(
+        handles=[Patch(color=_scope_color(scope), label=scope) for scope in scopes],
+        title="Scope", loc="upper left", bbox_to_anchor=(1.0, 1.0),
+    )
+    ax.set_title("Top Activities")
+    ax.set_xlabel("Emissions (kgCO2e)")
+    ax.locator_params(axis="x", nbins=4)
+
+
+_DRAW = {
+    "scope": _draw_scope,
+    "category": _draw_category,
+    "time_series": _draw_time_series,
+    "activity": _draw_activity,
+}
+
+
+def _render_png(name, data):
+    """Draw a chart and encode it as an RGB PNG (fpdf embeds RGB without decoding)."""
+    figure = Figure(figsize=CHART_SIZE, dpi=CHART_DPI)
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    if len(data):
+        _DRAW[name](ax, data)
+    else:
+        ax.set_title(name.replace("_", " ").title())
+        ax.text(0.5, 0.5, "No data", ha="center", va="center", transform=ax.transAxes)
+        ax.set_axis_off()
+    figure.tight_layout()
+
+    rgba = io.BytesIO()
+    figure.savefig(rgba, format="png", facecolor="white")
+    rgb = io.BytesIO()
+    Image.open(rgba).convert("RGB").save(rgb, format="PNG")
+    return rgb.getvalue()
+
+
+def chart_key(name, data):
+    """
+    Content hash of a chart: its name, style version and plotted data.
+
+    Args:
+        name (str): Chart name, a key of chart_data()
+        data (pandas.Series or DataFrame): Aggregated data the chart plots
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    payload = f"{name}:{CHART_STYLE_VERSION}:{data.to_json(orient='split', double_precision=6)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ChartCache:
+    """
+    Content-addressed cache of chart images.
+
+    Each image is stored as <charts_dir>/<sha256>.png, named by the hash of
+    the chart and the aggregated data it plots, so any report showing the
+    same numbers reuses the image instead of drawing it again, across
+    reports, processes and restarts. Images are written whole under a
+    temporary name and renamed into place, and never modified; the least
+    recently used are removed once more than max_files are kept.
+    """
+
+    def __init__(self, charts_dir=CHARTS_DIR, max_files=CHART_CACHE_FILES):
+        """
+        Initialize the ChartCache class.
+
+        Args:
+            charts_dir (str, optional): Directory of the cached images
+            max_files (int, optional): Images kept at most
+        """
+        self.charts_dir = charts_dir
+        self.max_files = max_files
+
+    def path(self, name, data):
+        """
+        Get the image of a chart, rendering it only if not cached.
+
+        Args:
+            name (str): Chart name, a key of chart_data()
+            data (pandas.Series or DataFrame): Aggregated data to plot
+
+        Returns:
+            str: Path of the PNG image
+        """
+        path = os.path.join(self.charts_dir, f"{chart_key(name, data)}.png")
+        if os.path.exists(path):
+            try:
+                # Mark as recently used
+                os.utime(path)
+                return path
+            except FileNotFoundError:
+                # Removed by another process's pruning in the meantime
+                pass
+
+        os.makedirs(self.charts_dir, exist_ok=True)
+        self._write(path, _render_png(name, data))
+        self._prune()
+        return path
+
+    def _write(self, path, png):
+        """Write an image whole; threads and processes may write the same one at once."""
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(png)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _prune(self):
+        """Remove the least recently used images beyond max_files."""
+        paths = glob.glob(os.path.join(self.charts_dir, "*.png"))
+        if len(paths) <= self.max_files:
+            return
+
+        def last_used(path):
+            try:
+                return os.path.getmtime(path)
+            except FileNotFoundError:
+                return 0.0
+        for path in sorted(paths, key=last_used)[:len(paths) - self.max_files]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def report_charts(self, summary):
+        """
+        Get the images of all charts of a report.
+
+        Args:
+            summary (ReportSummary): Aggregates of the report's entries
+
+        Returns:
+            list: PNG image paths, in chart_data() order
+        """
+        return [self.path(name, data) for name, data in chart_data(summary).items()]
@@ -0,0 +1,478 @@
+"""
+Report engine for YourCarbonFootprint application.
+Renders the PDF emissions report from aggregates computed once per period,
+caching aggregates and rendered reports per ledger version.
+"""
+
+import json
+import multiprocessing
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import pandas as pd
+from fpdf import FPDF
+
+from config import REPORT_BATCH_WORKERS, REPORT_CACHE_ENTRIES, REPORT_TABLE_MAX_ROWS
+from pdf_table import format_entries, write_entries_appendix, write_entries_table
+from report_charts import CHART_SIZE, ChartCache
+
+# Statements printed in every report's compliance section
+COMPLIANCE_NOTES = [
+    "EU CBAM: This report can be used as supporting documentation for EU CBAM compliance.",
+    "Japan GX League: This report follows the GX League reporting format.",
+    "Indonesia ETS/ETP: This report can be used for Indonesia ETS/ETP compliance.",
+]
+
+# Dimensions batch reports are usually split by, with their labels
+BATCH_DIMENSIONS = {
+    "business_unit": "Business Unit",
+    "facility": "Facility",
+    "country": "Country",
+}
+
+# Space between charts, in mm
+CHART_GAP = 4
+
+RECOMMENDATIONS = [
+    "1. Focus on reducing emissions from the top categories identified in this report.",
+    "2. Consider implementing energy efficiency measures for Scope 2 emissions.",
+    "3. Explore renewable energy options to reduce your carbon footprint.",
+    "4. Engage with suppliers to address Scope 3 emissions in your value chain.",
+]
+
+
+class ReportSummary:
+    """
+    Aggregates of a report's entries, computed in one pass.
+
+    A single groupby by month, scope and category gives the appendix
+    breakdown; the scope and category totals of the summary section are
+    sums over that breakdown rather than further passes over the entries.
+    Emissions per activity, for the top activities chart, take a second
+    groupby, as the breakdown does not split activities.
+    """
+
+    def __init__(self, data):
+        """
+        Initialize the ReportSummary class.
+
+        Args:
+            data (pandas.DataFrame): Emission entries of the report
+        """
+        months = pd.to_datetime(data["date"], errors="coerce").dt.strftime("%Y-%m")
+        # Undated entries form their own month group, so totals include them
+        self.breakdown = (
+            data.assign(month=months)
+            .groupby(["month", "scope", "category"], observed=True, sort=True, dropna=False)
+            .agg(entries=("emissions_kgCO2e", "size"), emissions_kgCO2e=("emissions_kgCO2e", "sum"))
+            .reset_index()
+        )
+        self.entries = len(data)
+        self.total = float(self.breakdown["emissions_kgCO2e"].sum())
+        self.by_scope = self.breakdown.groupby("scope", observed=True, sort=True)["emissions_kgCO2e"].sum()
+        self.by_category = self.breakdown.groupby("category", observed=True, sort=True)["emissions_kgCO2e"].sum()
+        self.by_activity = data.groupby(
+            ["scope", "category", "activity"], observed=True, sort=True, dropna=False
+        )["emissions_kgCO2e"].sum()
+
+    def top_categories(self, n=5):
+        """Get the n categories with the most emissions, largest first."""
+        return self.by_category.nlargest(n)
+
+
+def _period_key(start_date, end_date):
+    """Cache key of a reporting period."""
+    return (
+        pd.Timestamp(start_date) if start_date else None,
+        pd.Timestamp(end_date) if end_date else None,
+    )
+
+
+def _share(emissions, total):
+    """Percentage of the total, 0 when there are no emissions."""
+    return emissions / total * 100 if total else 0.0
+
+
+def _company_key(company_info):
+    """Cache key of the company information printed in a report."""
+    return json.dumps(company_info or {}, sort_keys=True, default=str)
+
+
+class ReportEngine:
+    """
+    Renders PDF emissions reports from a ledger.
+
+    The ledger source is a DataHandler or SharedLedger, or any object with
+    get_filtered_data(start_date, end_date) and a report_version() that
+    changes whenever the data does.
+
+    The entries of a period are filtered, aggregated (ReportSummary) and
+    formatted for the data table once per (period, table rows, ledger
+    version); reports for other company details reuse them. Rendered
+    reports are cached per (period, company_info, table rows, ledger
+    version, day), so generating an unchanged report again returns the
+    cached bytes. Both caches keep the REPORT_CACHE_ENTRIES most recently
+    used entries, so those of superseded versions age out. Chart images
+    come from a ChartCache, so reports plotting the same numbers share them.
+    """
+
+    def __init__(self, source, cache_entries=REPORT_CACHE_ENTRIES, charts=None):
+        """
+        Initialize the ReportEngine class.
+
+        Args:
+            source (DataHandler or SharedLedger): Source of the ledger
+            cache_entries (int, optional): Cached reports and aggregates kept
+            charts (ChartCache, optional): Cache of the chart images
+        """
+        self.source = source
+        self.cache_entries = cache_entries
+        self.charts = charts or ChartCache()
+        self._sections = OrderedDict()
+        self._reports = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, cache, key, compute):
+        """Get a value from an LRU cache, computing and storing it if missing."""
+        with self._lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+        value = compute()
+        with self._lock:
+            cache[key] = value
+            while len(cache) > self.cache_entries:
+                cache.popitem(last=False)
+        return value
+
+    def sections(self, start_date=None, end_date=None, max_rows=REPORT_TABLE_MAX_ROWS):
+        """
+        Get the aggregates and formatted data table of a period.
+
+        Args:
+            start_date (datetime, optional): Start date for filtering
+            end_date (datetime, optional): End date for filtering
+            max_rows (int, optional): Entries listed in the data table
+
+        Returns:
+            tuple: (ReportSummary, formatted table columns)
+        """
+        key = (_period_key(start_date, end_date), max_rows, self.source.report_version())
+
+        def compute():
+            data = self.source.get_filtered_data(start_date, end_date)
+            return ReportSummary(data), format_entries(data.iloc[:max_rows])
+
+        return self._cached(self._sections, key, compute)
+
+    def render(self, start_date=None, end_date=None, company_info=None, max_rows=REPORT_TABLE_MAX_ROWS,
+               progress=None):
+        """
+        Render the PDF report of a period.
+
+        Args:
+            start_date (datetime, optional): Start date for filtering
+            end_date (datetime, optional): End date for filtering
+            company_info (dict, optional): Company information
+            max_rows (int, optional): Entries listed in the data table; when
+                the period has more, an appendix summarizes them per month,
+                scope and category
+            progress (callable, optional): Called with the fraction of the
+                report rendered, from 0 to 1
+
+        Returns:
+            bytes: The PDF document
+        """
+        generated_on = datetime.now().strftime('%Y-%m-%d')
+        key = (
+            _period_key(start_date, end_date),
+            _company_key(company_info),
+            max_rows,
+            self.source.report_version(),
+            generated_on,
+        )
+
+        def compute():
+            summary, table = self.sections(start_date, end_date, max_rows)
+            charts = self.charts.report_charts(summary)
+            if progress is not None:
+                progress(0.3)
+            return render_pdf(
+                summary, table, start_date, end_date, company_info, generated_on, progress, charts=charts,
+            )
+
+        pdf_bytes = self._cached(self._reports, key, compute)
+        if progress is not None:
+            progress(1.0)
+        return pdf_bytes
+
+
+def _write_charts(pdf, charts):
+    """Lay out chart images two per row, each keeping its aspect ratio."""
+    width = (pdf.w - pdf.l_margin - pdf.r_margin - CHART_GAP) / 2
+    height = width * CHART_SIZE[1] / CHART_SIZE[0]
+    for i in range(0, len(charts), 2):
+        if pdf.y + height > pdf.page_break_trigger:
+            pdf.add_page()
+        y = pdf.y
+        for j, path in enumerate(charts[i:i + 2]):
+            pdf.image(path, pdf.l_margin + j * (width + CHART_GAP), y, width)
+        pdf.set_xy(pdf.l_margin, y + height + CHART_GAP)
+
+
+def render_pdf(summary, table, start_date=None, end_date=None, company_info=None, generated_on=None,
+               progress=None, subject=None, charts=None):
+    """
+    Lay out a report's sections into a PDF document.
+
+    Args:
+        summary (ReportSummary): Aggregates of the report's entries
+        table (list): Formatted columns of the listed entries
+        start_date (datetime, optional): Start of the reporting period
+        end_date (datetime, optional): End of the reporting period
+        company_info (dict, optional): Company information
+        generated_on (str, optional): Generation date; defaults to today
+        progress (callable, optional): Called with the fraction rendered
+        subject (tuple, optional): (label, value) of the entity the report
+            covers, e.g. ("Business Unit", "Logistics")
+        charts (list, optional): PNG images of the charts, as from
+            ChartCache.report_charts()
+
+    Returns:
+        bytes: The PDF document
+    """
+    generated_on = generated_on or datetime.now().strftime('%Y-%m-%d')
+    pdf = FPDF()
+    pdf.add_page()
+
+    # Title
+    pdf.set_font("Arial", "B", 16)
+    pdf.cell(0, 10, "Carbon Emissions Report", 0, 1, "C")
+    pdf.set_font("Arial", "", 12)
+
+    # Company info
+    if company_info:
+        pdf.cell(0, 10, f"Company: {company_info.get('name') or 'N/A'}", 0, 1)
+        pdf.cell(0, 10, f"Industry: {company_info.get('industry') or 'N/A'}", 0, 1)
+        pdf.cell(0, 10, f"Location: {company_info.get('location') or 'N/A'}", 0, 1)
+
+    # Entity covered, for reports of one business unit, facility, ...
+    if subject:
+        pdf.cell(0, 10, f"{subject[0]}: {subject[1]}", 0, 1)
+
+    # Reporting period
+    pdf.cell(0, 10, f"Reporting Period: {start_date.strftime('%Y-%m-%d') if start_date else 'All'} to {end_date.strftime('%Y-%m-%d') if end_date else 'All'}", 0, 1)
+    pdf.cell(0, 10, f"Generated on: {generated_on}", 0, 1)
+
+    # Summary
+    pdf.ln(10)
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, "Summary", 0, 1)
+    pdf.set_font("Arial", "", 12)
+
+    total = summary.total
+    pdf.cell(0, 10, f"Total Emissions: {total:.2f} kgCO2e", 0, 1)
+
+    pdf.ln(5)
+    pdf.cell(0, 10, "Emissions by Scope:", 0, 1)
+    for scope, emissions in summary.by_scope.items():
+        pdf.cell(0, 10, f"{scope}: {emissions:.2f} kgCO2e ({_share(emissions, total):.1f}%)", 0, 1)
+
+    pdf.ln(5)
+    pdf.cell(0, 10, "Top Categories:", 0, 1)
+    for category, emissions in summary.top_categories().items():
+        pdf.cell(0, 10, f"{category}: {emissions:.2f} kgCO2e ({_share(emissions, total):.1f}%)", 0, 1)
+
+    # Charts
+    if charts:
+        pdf.ln(10)
+        pdf.set_font("Arial", "B", 14)
+        pdf.cell(0, 10, "Charts", 0, 1)
+        _write_charts(pdf, charts)
+
+    # Data table, capped at max_rows entries
+    pdf.ln(10)
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, "Emissions Data", 0, 1)
+
+    def table_progress(fraction):
+        # Writing the table is most of the rendering
+        if progress is not None:
+            progress(0.3 + 0.6 * fraction)
+
+    omitted = write_entries_table(pdf, table, summary.entries, table_progress)
+
+    # Compliance section
+    pdf.ln(10)
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, "Regulatory Compliance", 0, 1)
+    pdf.set_font("Arial", "", 12)
+    for note in COMPLIANCE_NOTES:
+        pdf.cell(0, 10, note, 0, 1)
+
+    # Recommendations
+    pdf.ln(10)
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, "Recommendations", 0, 1)
+    pdf.set_font("Arial", "", 12)
+    for recommendation in RECOMMENDATIONS:
+        pdf.cell(0, 10, recommendation, 0, 1)
+
+    if omitted > 0:
+        write_entries_appendix(pdf, summary.breakdown)
+
+    return pdf.output(dest='S').encode('latin1')
+
+
+def render_report(data, start_date=None, end_date=None, company_info=None,
+                  max_rows=REPORT_TABLE_MAX_ROWS, subject=None):
+    """
+    Render the PDF report of a set of entries, without caching the report
+    (its chart images are still shared through a ChartCache).
+
+    Args:
+        data (pandas.DataFrame): Emission entries of the report
+        start_date (datetime, optional): Start of the reporting period
+        end_date (datetime, optional): End of the reporting period
+        company_info (dict, optional): Company information
+        max_rows (int, optional): Entries listed in the data table
+        subject (tuple, optional): (label, value) of the entity the report covers
+
+    Returns:
+        bytes: The PDF document
+    """
+    summary = ReportSummary(data)
+    return render_pdf(
+        summary, format_entries(data.iloc[:max_rows]),
+        start_date, end_date, company_info, subject=subject,
+        charts=ChartCache().report_charts(summary),
+    )
+
+
+def entries_csv(data):
+    """
+    Render entries as CSV, with dates as YYYY-MM-DD.
+
+    The internal entry_id column is left out, so an export can be edited
+    and imported again as new entries.
+
+    Args:
+        data (pandas.DataFrame): Emission entries
+
+    Returns:
+        bytes: UTF-8 encoded CSV
+    """
+    data = data.drop(columns="entry_id", errors="ignore")
+    if "date" in data.columns:
+        data = data.assign(date=pd.to_datetime(data["date"]).dt.strftime("%Y-%m-%d"))
+    return data.to_csv(index=False).encode("utf-8")
+
+
+def write_report(pdf_bytes, file_path):
+    """
+    Save a rendered report.
+
+    Args:
+        pdf_bytes (bytes): The PDF document
+        file_path (str or file-like): Path or binary file object to write to
+    """
+    if hasattr(file_path, "write"):
+        file_path.write(pdf_bytes)
+    else:
+        with open(file_path, "wb") as f:
+            f.write(pdf_bytes)
+
+
+def _file_stem(by, value, used):
+    """File name (without extension) of a group's reports, unique within a batch."""
+    stem = f"{by}_{re.sub(r'[^A-Za-z0-9._-]+', '_', str(value)).strip('_') or 'unknown'}"
+    candidate, number = stem, 1
+    while candidate in used:
+        number += 1
+        candidate = f"{stem}_{number}"
+    used.add(candidate)
+    return candidate
+
+
+def _write_group(data, paths, start_date, end_date, company_info, max_rows, subject):
+    """Write one group's reports; runs in a worker process."""
+    if "pdf" in paths:
+        write_report(render_report(data, start_date, end_date, company_info, max_rows, subject), paths["pdf"])
+    if "csv" in paths:
+        write_report(entries_csv(data), paths["csv"])
+    return paths
+
+
+def write_batch_reports(data, by, output_dir, start_date=None, end_date=None, company_info=None,
+                        formats=("pdf", "csv"), max_rows=REPORT_TABLE_MAX_ROWS,
+                        max_workers=REPORT_BATCH_WORKERS, progress=None):
+    """
+    Write a report per value of a dimension, e.g. one per business unit.
+
+    The entries are split in a single groupby pass; each group's PDF and
+    CSV are then rendered in parallel worker processes, which write them
+    to output_dir as <by>_<value>.pdf and .csv. A group whose reports
+    fail is recorded with its error and the other groups are still written.
+
+    Args:
+        data (pandas.DataFrame): Emission entries of the reporting period
+        by (str): Column to split by, e.g. "business_unit", "facility" or "country"
+        output_dir (str): Directory to write the reports to
+        start_date (datetime, optional): Start of the reporting period
+        end_date (datetime, optional): End of the reporting period
+        company_info (dict, optional): Company information
+        formats (tuple, optional): "pdf" and/or "csv"
+        max_rows (int, optional): Entries listed in each PDF's data table
+        max_workers (int, optional): Worker processes to use at most
+        progress (callable, optional): Called with (groups_done, groups_total)
+            as reports are written
+
+    Returns:
+        dict: {value: {format: path}} per group, or {value: {"error": message}}
+            for a group whose reports could not be written
+    """
+    if by not in data.columns:
+        raise ValueError(f"Cannot split reports by column: {by}")
+    label = BATCH_DIMENSIONS.get(by, by.replace("_", " ").title())
+    os.makedirs(output_dir, exist_ok=True)
+
+    used = set()
+    groups = []
+    for value, rows in data.groupby(by, observed=True, sort=True).indices.items():
+        stem = _file_stem(by, value, used)
+        paths = {fmt: os.path.join(output_dir, f"{stem}.{fmt}") for fmt in formats}
+        groups.append((value, data.take(rows), paths))
+
+    results = {}
+    if max_workers <= 1 or len(groups) <= 1:
+        for done, (value, group, paths) in enumerate(groups, start=1):
+            try:
+                results[value] = _write_group(
+                    group, paths, start_date, end_date, company_info, max_rows, (label, value)
+                )
+            except Exception as e:
+                results[value] = {"error": str(e)}
+            if progress is not None:
+                progress(done, len(groups))
+    else:
+        # Spawned workers, as forking a threaded server process is unsafe
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(groups)), mp_context=context) as pool:
+            futures = {
+                pool.submit(
+                    _write_group, group, paths, start_date, end_date, company_info, max_rows, (label, value)
+                ): value
+                for value, group, paths in groups
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    results[futures[future]] = {"error": str(e)}
+                if progress is not None:
+                    progress(done, len(groups))
+    return {value: results[value] for value, _, _ in groups}
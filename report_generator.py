@@ -8,139 +8,103 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
-from fpdf import FPDF
-import os
-from datetime import datetime
 import base64
 from io import BytesIO
 
+from config import REPORT_BATCH_WORKERS, REPORT_TABLE_MAX_ROWS
+from report_engine import write_batch_reports, write_report
+
 class ReportGenerator:
     def __init__(self, data_handler):
         """Initialize the ReportGenerator class."""
         self.data_handler = data_handler
     
-    def generate_pdf_report(self, file_path=None, start_date=None, end_date=None, company_info=None):
+    def generate_pdf_report(self, file_path=None, start_date=None, end_date=None, company_info=None,
+                            max_rows=REPORT_TABLE_MAX_ROWS):
         """
         Generate PDF report.
         
+        Rendered by the data handler's ReportEngine, so regenerating an
+        unchanged report returns the cached document.
+        
         Args:
-            file_path (str, optional): Path to save PDF file
+            file_path (str or file-like, optional): Path or binary file object
+                to save the PDF to
             start_date (datetime, optional): Start date for filtering
             end_date (datetime, optional): End date for filtering
             company_info (dict, optional): Company information
+            max_rows (int, optional): Entries listed in the data table; when
+                the period has more, an appendix summarizes them per month,
+                scope and category
             
         Returns:
             bytes or bool: PDF bytes if file_path is None, otherwise True if successful
         """
         try:
-            # Get filtered data
-            data = self.data_handler.get_filtered_data(start_date, end_date)
+            engine = self.data_handler.get_report_engine()
+            summary, _ = engine.sections(start_date, end_date, max_rows)
             
-            if len(data) == 0:
+            if summary.entries == 0:
                 return False, "No data available for the selected period."
             
-            # Create PDF
-            pdf = FPDF()
-            pdf.add_page()
-            
-            # Set font
-            pdf.set_font("Arial", "B", 16)
-            
-            # Title
-            pdf.cell(0, 10, "Carbon Emissions Report", 0, 1, "C")
-            pdf.set_font("Arial", "", 12)
-            
-            # Company info
-            if company_info:
-                pdf.cell(0, 10, f"Company: {company_info.get('name', 'N/A')}", 0, 1)
-                pdf.cell(0, 10, f"Industry: {company_info.get('industry', 'N/A')}", 0, 1)
-                pdf.cell(0, 10, f"Location: {company_info.get('location', 'N/A')}", 0, 1)
-            
-            # Reporting period
-            pdf.cell(0, 10, f"Reporting Period: {start_date.strftime('%Y-%m-%d') if start_date else 'All'} to {end_date.strftime('%Y-%m-%d') if end_date else 'All'}", 0, 1)
-            pdf.cell(0, 10, f"Generated on: {datetime.now().strftime('%Y-%m-%d')}", 0, 1)
-            
-            # Summary
-            pdf.ln(10)
-            pdf.set_font("Arial", "B", 14)
-            pdf.cell(0, 10, "Summary", 0, 1)
-            pdf.set_font("Arial", "", 12)
-            
-            total_emissions = data['emissions_kgCO2e'].sum()
-            pdf.cell(0, 10, f"Total Emissions: {total_emissions:.2f} kgCO2e", 0, 1)
-            
-            # Emissions by scope
-            scope_data = data.groupby('scope')['emissions_kgCO2e'].sum().reset_index()
-            pdf.ln(5)
-            pdf.cell(0, 10, "Emissions by Scope:", 0, 1)
-            for _, row in scope_data.iterrows():
-                pdf.cell(0, 10, f"{row['scope']}: {row['emissions_kgCO2e']:.2f} kgCO2e ({row['emissions_kgCO2e'] / total_emissions * 100:.1f}%)", 0, 1)
-            
-            # Emissions by category
-            category_data = data.groupby('category')['emissions_kgCO2e'].sum().reset_index()
-            pdf.ln(5)
-            pdf.cell(0, 10, "Top Categories:", 0, 1)
-            for _, row in category_data.nlargest(5, 'emissions_kgCO2e').iterrows():
-                pdf.cell(0, 10, f"{row['category']}: {row['emissions_kgCO2e']:.2f} kgCO2e ({row['emissions_kgCO2e'] / total_emissions * 100:.1f}%)", 0, 1)
-            
-            # Data table
-            pdf.ln(10)
-            pdf.set_font("Arial", "B", 14)
-            pdf.cell(0, 10, "Emissions Data", 0, 1)
-            pdf.set_font("Arial", "B", 10)
-            
-            # Table header
-            col_widths = [25, 25, 30, 30, 20, 15, 25, 30]
-            headers = ['Date', 'Scope', 'Category', 'Activity', 'Quantity', 'Unit', 'Factor', 'Emissions (kgCO2e)']
-            
-            for i, header in enumerate(headers):
-                pdf.cell(col_widths[i], 10, header, 1)
-            pdf.ln()
-            
-            # Table data
-            pdf.set_font("Arial", "", 8)
-            for _, row in data.iterrows():
-                pdf.cell(col_widths[0], 10, row['date'].strftime('%Y-%m-%d') if isinstance(row['date'], pd.Timestamp) else str(row['date']), 1)
-                pdf.cell(col_widths[1], 10, str(row['scope']), 1)
-                pdf.cell(col_widths[2], 10, str(row['category']), 1)
-                pdf.cell(col_widths[3], 10, str(row['activity']), 1)
-                pdf.cell(col_widths[4], 10, f"{row['quantity']:.2f}", 1)
-                pdf.cell(col_widths[5], 10, str(row['unit']), 1)
-                pdf.cell(col_widths[6], 10, f"{row['emission_factor']:.4f}", 1)
-                pdf.cell(col_widths[7], 10, f"{row['emissions_kgCO2e']:.2f}", 1)
-                pdf.ln()
-            
-            # Compliance section
-            pdf.ln(10)
-            pdf.set_font("Arial", "B", 14)
-            pdf.cell(0, 10, "Regulatory Compliance", 0, 1)
-            pdf.set_font("Arial", "", 12)
-            
-            pdf.cell(0, 10, "EU CBAM: This report can be used as supporting documentation for EU CBAM compliance.", 0, 1)
-            pdf.cell(0, 10, "Japan GX League: This report follows the GX League reporting format.", 0, 1)
-            pdf.cell(0, 10, "Indonesia ETS/ETP: This report can be used for Indonesia ETS/ETP compliance.", 0, 1)
-            
-            # Recommendations
-            pdf.ln(10)
-            pdf.set_font("Arial", "B", 14)
-            pdf.cell(0, 10, "Recommendations", 0, 1)
-            pdf.set_font("Arial", "", 12)
-            
-            pdf.cell(0, 10, "1. Focus on reducing emissions from the top categories identified in this report.", 0, 1)
-            pdf.cell(0, 10, "2. Consider implementing energy efficiency measures for Scope 2 emissions.", 0, 1)
-            pdf.cell(0, 10, "3. Explore renewable energy options to reduce your carbon footprint.", 0, 1)
-            pdf.cell(0, 10, "4. Engage with suppliers to address Scope 3 emissions in your value chain.", 0, 1)
+            pdf_bytes = engine.render(start_date, end_date, company_info, max_rows)
             
             if file_path:
                 # Save to file
-                pdf.output(file_path)
+                write_report(pdf_bytes, file_path)
                 return True, "Report generated successfully."
             else:
                 # Return PDF bytes
-                return pdf.output(dest='S').encode('latin1'), "Report generated successfully."
+                return pdf_bytes, "Report generated successfully."
         except Exception as e:
             return False, f"Error generating PDF report: {str(e)}"
     
+    def generate_batch_reports(self, output_dir, by="business_unit", start_date=None, end_date=None,
+                               company_info=None, formats=("pdf", "csv"), max_rows=REPORT_TABLE_MAX_ROWS,
+                               max_workers=REPORT_BATCH_WORKERS, progress=None):
+        """
+        Generate a PDF and/or CSV report per business unit, facility or country.
+        
+        The period's entries are filtered and split once, and the reports
+        are rendered in parallel worker processes.
+        
+        Args:
+            output_dir (str): Directory to write the reports to
+            by (str, optional): Column to split by: "business_unit",
+                "facility", "country" or another ledger column
+            start_date (datetime, optional): Start date for filtering
+            end_date (datetime, optional): End date for filtering
+            company_info (dict, optional): Company information
+            formats (tuple, optional): "pdf" and/or "csv"
+            max_rows (int, optional): Entries listed in each PDF's data table
+            max_workers (int, optional): Worker processes to use at most
+            progress (callable, optional): Called with (reports_done, reports_total)
+            
+        Returns:
+            tuple: ({value: {format: path}}, message), or (False, message) on error;
+                values whose reports failed map to {"error": message} and are
+                listed in the message
+        """
+        try:
+            data = self.data_handler.get_filtered_data(start_date, end_date)
+            
+            if len(data) == 0:
+                return False, "No data available for the selected period."
+            
+            results = write_batch_reports(
+                data, by, output_dir, start_date, end_date, company_info,
+                formats=formats, max_rows=max_rows, max_workers=max_workers, progress=progress,
+            )
+            failed = {value: paths["error"] for value, paths in results.items() if "error" in paths}
+            message = (
+                f"Generated reports for {len(results) - len(failed)} {by.replace('_', ' ')} values in {output_dir}."
+            )
+            if failed:
+                message += " Failed: " + "; ".join(f"{value} ({error})" for value, error in failed.items())
+            return results, message
+        except Exception as e:
+            return False, f"Error generating batch reports: {str(e)}"
+    
     def create_scope_pie_chart(self, data):
         """
         Create pie chart of emissions by scope.
@@ -0,0 +1,303 @@
+"""
+Report jobs for YourCarbonFootprint application.
+A background queue that renders PDF reports and CSV exports in worker
+threads, tracks their progress and keeps finished files in data/reports/
+for download.
+"""
+
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from config import REPORT_RETENTION_HOURS, REPORT_TABLE_MAX_ROWS, REPORT_WORKERS, REPORTS_DIR
+from file_utils import atomic_write, atomic_write_text, process_alive
+from report_engine import entries_csv
+
+# Job states, in order
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# File extension and MIME type of each job kind
+JOB_KINDS = {
+    "pdf": ("pdf", "application/pdf"),
+    "csv": ("csv", "text/csv"),
+}
+
+
+def _export_csv(source, start_date, end_date, progress):
+    """Render the entries of a period as CSV bytes."""
+    data = source.get_filtered_data(start_date, end_date)
+    progress(0.5)
+    return entries_csv(data)
+
+
+def _period_name(start_date, end_date):
+    """Describe a reporting period in file names."""
+    if start_date and end_date:
+        return f"{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}"
+    return "all"
+
+
+class ReportJobQueue:
+    """
+    Background queue of report jobs.
+
+    Jobs run in a pool of REPORT_WORKERS threads, so a Streamlit session
+    only submits a job and polls it, and several sessions can request
+    large reports at once. Each job's state is kept in memory and written
+    next to its output in the reports directory (<id>.json and
+    <id>.pdf/.csv); jobs found there on start are listed again.
+
+    Several processes can share the reports directory, so each job records
+    the id of the process rendering it. An unfinished job found on start is
+    marked failed only if that process is no longer running (or the job is
+    older than the retention period, in case the id has been reused), and
+    is left alone while its owner may still finish it. Finished jobs are
+    removed, with their files, retention_hours after they finished.
+    """
+
+    def __init__(self, reports_dir=REPORTS_DIR, max_workers=REPORT_WORKERS,
+                 retention_hours=REPORT_RETENTION_HOURS):
+        """
+        Initialize the ReportJobQueue class.
+
+        Args:
+            reports_dir (str, optional): Directory of job states and outputs
+            max_workers (int, optional): Jobs rendered at a time
+            retention_hours (int, optional): Hours finished jobs are kept
+        """
+        self.reports_dir = reports_dir
+        self.retention = timedelta(hours=retention_hours)
+        os.makedirs(reports_dir, exist_ok=True)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report")
+        self._load_jobs()
+        self.remove_expired()
+
+    def _state_path(self, job_id):
+        return os.path.join(self.reports_dir, f"{job_id}.json")
+
+    def _output_path(self, job):
+        return os.path.join(self.reports_dir, f"{job['id']}.{JOB_KINDS[job['kind']][0]}")
+
+    def _interrupted(self, job, cutoff):
+        """Whether an unfinished job's process stopped before finishing it."""
+        pid = job.get("pid")
+        if pid is None or pid == os.getpid() or job["submitted_at"] < cutoff:
+            return True
+        return not process_alive(pid)
+
+    def _load_jobs(self):
+        """List the jobs persisted by earlier runs and by other processes."""
+        cutoff = (datetime.now() - self.retention).isoformat(timespec="seconds")
+        for name in os.listdir(self.reports_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.reports_dir, name), "r") as f:
+                    job = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            if job.get("status") in (QUEUED, RUNNING) and self._interrupted(job, cutoff):
+                job.update(status=FAILED, error="Interrupted before it finished")
+                self._save(job)
+            self._jobs[job["id"]] = job
+
+    def remove_expired(self):
+        """
+        Remove finished jobs older than the retention period, with their files.
+
+        Returns:
+            int: Number of jobs removed
+        """
+        cutoff = (datetime.now() - self.retention).isoformat(timespec="seconds")
+        with self._lock:
+            expired = [
+                job for job in self._jobs.values()
+                if job["status"] in (DONE, FAILED) and (job["finished_at"] or job["submitted_at"]) < cutoff
+            ]
+            for job in expired:
+                del self._jobs[job["id"]]
+        for job in expired:
+            for path in (self._output_path(job), self._state_path(job["id"])):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return len(expired)
+
+    def _save(self, job):
+        """Persist a job's state."""
+        atomic_write_text(self._state_path(job["id"]), json.dumps(job, indent=2))
+
+    def _update(self, job_id, save=True, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            snapshot = dict(job)
+        if save:
+            self._save(snapshot)
+
+    def submit(self, kind, render, file_name):
+        """
+        Queue a job.
+
+        Args:
+            kind (str): "pdf" or "csv"
+            render (callable): Called in a worker thread with a progress
+                callback (taking a fraction from 0 to 1); returns the file's bytes
+            file_name (str): Name to offer the file for download under
+
+        Returns:
+            str: Job id
+        """
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "file_name": file_name,
+            "mime": JOB_KINDS[kind][1],
+            "status": QUEUED,
+            "progress": 0.0,
+            "error": None,
+            "submitted_at": datetime.now().isoformat(timespec="seconds"),
+            "finished_at": None,
+            "pid": os.getpid(),
+        }
+        with self._lock:
+            self._jobs[job["id"]] = job
+        self._save(job)
+        self._pool.submit(self._run, job["id"], render)
+        self.remove_expired()
+        return job["id"]
+
+    def _run(self, job_id, render):
+        """Render a job and store its output."""
+        self._update(job_id, status=RUNNING)
+
+        def progress(fraction):
+            # Progress is only polled, so it is not persisted on every step
+            self._update(job_id, save=False, progress=round(min(max(fraction, 0.0), 1.0), 3))
+
+        try:
+            content = render(progress)
+
+            def write(tmp_path):
+                with open(tmp_path, "wb") as f:
+                    f.write(content)
+
+            atomic_write(self._output_path(self.get(job_id)), write)
+            self._update(
+                job_id, status=DONE, progress=1.0,
+                finished_at=datetime.now().isoformat(timespec="seconds"),
+            )
+        except Exception as e:
+            self._update(
+                job_id, status=FAILED, error=str(e),
+                finished_at=datetime.now().isoformat(timespec="seconds"),
+            )
+
+    def submit_pdf(self, source, start_date=None, end_date=None, company_info=None,
+                   max_rows=REPORT_TABLE_MAX_ROWS):
+        """
+        Queue a PDF report of a period.
+
+        Args:
+            source (DataHandler or SharedLedger): Ledger to report on; its
+                ReportEngine renders (and caches) the report
+            start_date (datetime, optional): Start date for filtering
+            end_date (datetime, optional): End date for filtering
+            company_info (dict, optional): Company information
+            max_rows (int, optional): Entries listed in the data table
+
+        Returns:
+            str: Job id
+        """
+        engine = source.get_report_engine()
+        company_info = dict(company_info) if company_info else None
+
+        def render(progress):
+            return engine.render(start_date, end_date, company_info, max_rows, progress=progress)
+
+        return self.submit("pdf", render, f"emissions_report_{_period_name(start_date, end_date)}.pdf")
+
+    def submit_csv(self, source, start_date=None, end_date=None):
+        """
+        Queue a CSV export of a period.
+
+        Args:
+            source (DataHandler or SharedLedger): Ledger to export
+            start_date (datetime, optional): Start date for filtering
+            end_date (datetime, optional): End date for filtering
+
+        Returns:
+            str: Job id
+        """
+        def render(progress):
+            return _export_csv(source, start_date, end_date, progress)
+
+        return self.submit("csv", render, f"emissions_data_{_period_name(start_date, end_date)}.csv")
+
+    def get(self, job_id):
+        """
+        Get a job's state.
+
+        Returns:
+            dict: id, kind, file_name, mime, status, progress, error,
+                submitted_at, finished_at and pid, or None for an unknown job
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def jobs(self, job_ids=None):
+        """
+        List jobs, most recently submitted first.
+
+        Args:
+            job_ids (iterable, optional): Only list these jobs
+
+        Returns:
+            list: Job states, as from get()
+        """
+        with self._lock:
+            jobs = [
+                dict(job) for job_id, job in self._jobs.items()
+                if job_ids is None or job_id in job_ids
+            ]
+        return sorted(jobs, key=lambda job: job["submitted_at"], reverse=True)
+
+    def read(self, job_id):
+        """
+        Read the output of a finished job.
+
+        Returns:
+            bytes: The report file, or None if the job has not finished or
+                has been removed
+        """
+        job = self.get(job_id)
+        if job is None or job["status"] != DONE:
+            return None
+        try:
+            with open(self._output_path(job), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_report_queue(reports_dir=REPORTS_DIR):
+    """Get the process-wide ReportJobQueue for a reports directory."""
+    key = os.path.abspath(reports_dir)
+    with _queues_lock:
+        if key not in _queues:
+            _queues[key] = ReportJobQueue(reports_dir)
+        return _queues[key]
@@ -0,0 +1,425 @@
+"""
+Shared ledger for YourCarbonFootprint application.
+Holds one process-wide copy of the emissions ledger that every Streamlit
+session reads, backed by a memory-mapped Arrow snapshot file.
+"""
+
+import glob
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+
+from aggregate_cube import AggregateCube
+from config import DATA_DIR
+from content_index import ContentIndex, ImportFilter
+from file_utils import process_alive
+from report_engine import ReportEngine
+from storage_backends import apply_schema, concat_ledger
+
+ARROW_SNAPSHOT_FILE = os.path.join(DATA_DIR, "emissions.arrow")
+
+
+class SharedLedger:
+    """
+    Process-wide, read-only view of the ledger with write-through updates.
+
+    The ledger is loaded from its store once and cached under the store's
+    file signature (paths, modification times and sizes). Writes made
+    through append() and delete() go to the store and update the cached
+    frame in place, so every session sees them on its next rerun without
+    re-reading anything. If the signature changes for any other reason,
+    such as another process writing, the next frame() call reloads.
+
+    Sessions keep no overlay of their own edits over the shared frame:
+    every add, delete and import is committed to the store when it is made
+    and published to all sessions by the write-through update, so there
+    are no uncommitted edits to layer on top. Form drafts stay in the
+    session's state and never reach the ledger.
+
+    Writes through the ledger run one at a time, but do not block readers:
+    while a write (such as a large import) is being stored, frame() keeps
+    returning the last published frame, and the updated frame is swapped
+    in only once the write has been stored.
+
+    The cached frame is also persisted as an Arrow IPC file and
+    memory-mapped back, so numeric columns of the pandas frame are views
+    into pages the OS can evict and reload rather than private copies.
+    Every mapping gets a file of its own (<path>.<pid>.<uuid>), which no
+    other process or thread ever rewrites; it is unlinked once mapped, so
+    it lives exactly as long as the mapping. Each change increments version.
+
+    Alongside the frame, an AggregateCube of emission sums per month, scope,
+    category, business unit and country is kept up to date with every
+    append and delete, so dashboard metrics never scan the rows. A
+    ContentIndex of row content hashes, built on the first import, is kept
+    up to date the same way so imports can skip rows already present.
+    """
+
+    def __init__(self, store, path=ARROW_SNAPSHOT_FILE):
+        """Initialize the SharedLedger class."""
+        self.store = store
+        self.path = path
+        self.version = 0
+        self._frame = None
+        self._cube = None
+        self._content = None
+        self._report_engine = None
+        self._signature = None
+        # Store version the cached frame reflects
+        self._store_version = None
+        # Guards the cached frame, its signature and version
+        self._lock = threading.RLock()
+        # One write through this ledger at a time, held while it is stored
+        self._write_lock = threading.Lock()
+        # Set while a write is stored, so readers keep the published frame
+        # rather than reloading the store's partial changes
+        self._writing = False
+        self._persist_thread = None
+        self._persist_requested = False
+        # Mapping files that could not be removed yet
+        self._unremoved = set()
+        self._remove_stale_maps()
+
+    def normalize(self, data):
+        """Convert data to the column types of the shared frame."""
+        return apply_schema(data)
+
+    def _remove_stale_maps(self):
+        """Remove mapping files left behind by processes that have exited."""
+        for path in glob.glob(f"{glob.escape(self.path)}.*.*"):
+            try:
+                pid = int(path[len(self.path) + 1:].split(".")[0])
+            except ValueError:
+                continue
+            if pid == os.getpid() or _process_alive(pid):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _remove_unmapped(self):
+        """Retry removing this process's mapping files that were still in use."""
+        for path in list(self._unremoved):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            self._unremoved.remove(path)
+
+    def _map(self, data):
+        """Write data as an Arrow IPC file and return a frame mapped from it."""
+        table = pa.Table.from_pandas(data, preserve_index=False)
+        self._remove_unmapped()
+        path = f"{self.path}.{os.getpid()}.{uuid.uuid4().hex}"
+        try:
+            with pa.OSFile(path, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            source = pa.memory_map(path, "r")
+            return pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+        finally:
+            # The mapping keeps the data alive; nothing else needs the name.
+            # Windows refuses to remove mapped files, so retry those later
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                self._unremoved.add(path)
+
+    def reload(self):
+        """
+        Load the ledger from the store, replacing the cached frame.
+
+        Returns:
+            int: The new version
+        """
+        with self._lock:
+            signature = self.store.signature()
+            data, store_version = self.store.load_versioned()
+            self._frame = self._map(self.normalize(data))
+            self._cube = AggregateCube(self._frame)
+            self._content = None
+            self._signature = signature
+            self._store_version = store_version
+            self.version += 1
+            return self.version
+
+    def frame(self):
+        """
+        Get the cached frame, reloading if the store changed underneath it.
+
+        Returns:
+            pandas.DataFrame: Shared, read-only emissions data
+        """
+        with self._lock:
+            if self._frame is None or (not self._writing and self.store.signature() != self._signature):
+                self.reload()
+            return self._frame
+
+    def cube(self):
+        """
+        Get the aggregate cube matching frame(), reloading if the store changed.
+
+        Returns:
+            AggregateCube: Emission sums and counts per dimension cell
+        """
+        with self._lock:
+            self.frame()
+            return self._cube
+
+    def snapshot(self):
+        """
+        Get the version, frame and cube together, as of the same change.
+
+        Returns:
+            tuple: (int version, pandas.DataFrame frame, AggregateCube cube)
+        """
+        with self._lock:
+            frame = self.frame()
+            return self.version, frame, self._cube
+
+    def report_version(self):
+        """Get the version of the frame reports are built from, reloading if stale."""
+        with self._lock:
+            self.frame()
+            return self.version
+
+    def get_filtered_data(self, start_date=None, end_date=None):
+        """
+        Get the entries dated within a period.
+
+        Args:
+            start_date (datetime, optional): First date to include
+            end_date (datetime, optional): Last date to include; both dates
+                are needed to filter by date
+
+        Returns:
+            pandas.DataFrame: Matching entries, sharing memory with the frame
+        """
+        frame = self.frame()
+        if not (start_date and end_date):
+            return frame
+        dates = frame["date"]
+        return frame[(dates >= pd.Timestamp(start_date)) & (dates <= pd.Timestamp(end_date))]
+
+    def get_report_engine(self):
+        """Get the ReportEngine rendering reports of this ledger, shared by all sessions."""
+        with self._lock:
+            if self._report_engine is None:
+                self._report_engine = ReportEngine(self)
+            return self._report_engine
+
+    @contextmanager
+    def _write(self):
+        """
+        Hold this ledger's write lock for a write through it.
+
+        Yields the published (frame, cube) the write builds on. Readers keep
+        getting that frame without waiting until _publish() swaps in the
+        result; if the write fails, the next read reloads what was stored.
+        """
+        with self._write_lock:
+            with self._lock:
+                base = (self.frame(), self._cube)
+                self._writing = True
+            try:
+                yield base
+            except BaseException:
+                with self._lock:
+                    self._signature = None
+                raise
+            finally:
+                with self._lock:
+                    self._writing = False
+
+    def _publish(self, frame, cube, store_version, writes=1):
+        """
+        Swap in the frame and cube updated by a write through this ledger.
+
+        The frame only holds every stored change if the last write produced
+        exactly `writes` versions past the one the frame was at, and no
+        other write lands before the store's signature is read back.
+        Otherwise another process wrote in between, so the signature is
+        cleared and the next frame() call reloads.
+        """
+        signature = self.store.signature()
+        if store_version != self._store_version + writes or self.store.version() != store_version:
+            signature = None
+        with self._lock:
+            self._frame = frame
+            self._cube = cube
+            self._signature = signature
+            self._store_version = store_version
+            self._writing = False
+            self.version += 1
+            self._persist_async()
+
+    def append(self, entries):
+        """
+        Append entries to the store and to the cached frame.
+
+        Args:
+            entries (pandas.DataFrame): New emission entries
+
+        Returns:
+            pandas.DataFrame: The entries as stored, with entry ids
+        """
+        with self._write() as (current, cube):
+            entries, store_version = self.store.append_versioned(entries)
+            entries = self.normalize(entries)
+            if self._content is not None:
+                self._content.add(entries)
+            self._publish(concat_ledger([current, entries]), cube.with_entries(entries), store_version)
+            return entries
+
+    def append_chunks(self, chunks, skip_existing=True):
+        """
+        Append entries chunk by chunk, publishing them to readers together.
+
+        Each chunk is written to the store as it arrives, so only one chunk
+        of input is held at a time besides the stored entries themselves.
+        Readers are not blocked meanwhile; they see the new entries once all
+        chunks are stored.
+
+        Args:
+            chunks (iterable): DataFrames of new emission entries
+            skip_existing (bool, optional): Skip rows whose content is
+                already in the ledger (see ContentIndex)
+
+        Returns:
+            tuple: (int entries appended, int entries skipped)
+        """
+        with self._write() as (current, cube):
+            select = ImportFilter(self._content_index(current)) if skip_existing else None
+            return self._store_chunks(chunks, select, current, cube)
+
+    def _store_chunks(self, chunks, select, current, cube):
+        """Store chunks and publish them; must be called inside _write()."""
+        parts = []
+        skipped = 0
+        for chunk in chunks:
+            if select is not None:
+                new = select.new_rows(chunk)
+                skipped += int((~new).sum())
+                chunk = chunk[new]
+            if len(chunk) == 0:
+                continue
+            entries, store_version = self.store.append_versioned(chunk)
+            entries = self.normalize(entries)
+            cube = cube.with_entries(entries)
+            parts.append(entries)
+        if parts:
+            if self._content is not None:
+                for entries in parts:
+                    self._content.add(entries)
+            self._publish(concat_ledger([current, *parts]), cube, store_version, len(parts))
+        return sum(len(entries) for entries in parts), skipped
+
+    def append_files(self, frames, skip_existing=True):
+        """
+        Append the entries of several files in one batch.
+
+        Rows already in the ledger are skipped file by file, so files that
+        overlap add their shared rows once, as if imported one at a time.
+
+        Args:
+            frames (list): DataFrame of new emission entries per file
+            skip_existing (bool, optional): Skip rows whose content is
+                already in the ledger
+
+        Returns:
+            tuple: (int entries appended, int entries skipped)
+        """
+        with self._write() as (current, cube):
+            kept = list(frames)
+            skipped = 0
+            if skip_existing:
+                select = ImportFilter(self._content_index(current))
+                for position, frame in enumerate(kept):
+                    new = select.new_rows(frame)
+                    skipped += int((~new).sum())
+                    kept[position] = frame[new]
+                    select.next_file()
+            kept = [frame for frame in kept if len(frame) > 0]
+            if not kept:
+                return 0, skipped
+            appended, _ = self._store_chunks([pd.concat(kept, ignore_index=True)], None, current, cube)
+            return appended, skipped
+
+    def delete(self, entry_ids):
+        """
+        Delete entries from the store and from the cached frame.
+
+        Args:
+            entry_ids (list): Ids of the entries to delete
+        """
+        with self._write() as (current, cube):
+            store_version = self.store.delete_versioned(entry_ids)
+            deleted = current["entry_id"].isin(entry_ids)
+            if self._content is not None:
+                self._content.remove(current[deleted])
+            self._publish(
+                current[~deleted].reset_index(drop=True), cube.without_entries(current[deleted]), store_version,
+            )
+
+    def _content_index(self, current):
+        """Get the ContentIndex of the current frame, building it on first use."""
+        if self._content is None:
+            self._content = ContentIndex(current)
+        return self._content
+
+    def _persist_async(self):
+        """Re-persist the cached frame in the background, coalescing requests."""
+        self._persist_requested = True
+        if self._persist_thread is not None:
+            return
+        self._persist_thread = threading.Thread(target=self._persist_pending, daemon=True)
+        self._persist_thread.start()
+
+    def _persist_pending(self):
+        while True:
+            with self._lock:
+                if not self._persist_requested:
+                    self._persist_thread = None
+                    return
+                self._persist_requested = False
+                frame, version = self._frame, self.version
+            try:
+                mapped = self._map(frame)
+            except Exception as e:
+                print(f"Error persisting ledger snapshot: {str(e)}")
+                continue
+            with self._lock:
+                # Only swap in the mapped copy if no write happened meanwhile
+                if self.version == version:
+                    self._frame = mapped
+
+
+def _process_alive(pid):
+    """Whether a process is running (always False on Windows, see below)."""
+    if os.name == "nt":
+        # Windows refuses to remove files that are open or mapped, so removal
+        # is safe to attempt regardless
+        return False
+    return process_alive(pid)
+
+
+_ledgers = {}
+_ledgers_lock = threading.Lock()
+
+
+def get_shared_ledger(store, path=ARROW_SNAPSHOT_FILE):
+    """Get the process-wide SharedLedger for a store."""
+    key = (os.path.abspath(store.snapshot_path), os.path.abspath(path))
+    with _ledgers_lock:
+        if key not in _ledgers:
+            _ledgers[key] = SharedLedger(store, path)
+        return _ledgers[key]
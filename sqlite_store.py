@@ -0,0 +1,380 @@
+"""
+SQLite storage for YourCarbonFootprint application.
+Stores the emissions ledger in a local SQLite file with indexed columns, so
+filters and aggregates run in SQL and only matching rows are materialized.
+"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+from config import LEDGER_COLUMNS, LEDGER_DEFAULTS
+from storage_backends import (
+    FLOAT_COLUMNS,
+    LedgerConflictError,
+    apply_schema,
+    file_signature,
+    format_dates,
+    new_entry_id,
+)
+
+TABLE_NAME = "emissions"
+META_TABLE = "ledger_meta"
+
+# Columns with an index, used by date-range and dimension filters
+INDEXED_COLUMNS = ["date", "scope", "category", "business_unit", "country"]
+
+# Columns that can be used in WHERE equality filters and GROUP BY
+QUERY_COLUMNS = [column for column in LEDGER_COLUMNS if column not in FLOAT_COLUMNS + ["entry_id"]]
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+class SqliteLedgerStore:
+    """
+    Emissions ledger stored in a SQLite database file.
+
+    Exposes the same load/append/delete/rewrite interface as LedgerStore,
+    plus query() and aggregate() which push filtering and grouping down to
+    SQL. Dates are stored as YYYY-MM-DD text so they sort and compare in
+    index order.
+
+    SQLite's own locking serializes writers across processes. The ledger
+    version lives in a meta table and is incremented in the same transaction
+    as every write, so rewrite() can check it atomically.
+    """
+
+    name = "sqlite"
+    supports_queries = True
+    supports_aggregates = True
+
+    def __init__(self, db_path):
+        """Initialize the SqliteLedgerStore class."""
+        self.db_path = db_path
+        self.snapshot_path = db_path
+        self._write_lock = threading.Lock()
+        self._create_schema()
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection, commit on success and always close it."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _create_schema(self):
+        column_defs = []
+        for column in LEDGER_COLUMNS:
+            if column == "entry_id":
+                column_defs.append(f"{_quote(column)} TEXT NOT NULL UNIQUE")
+            elif column in FLOAT_COLUMNS:
+                column_defs.append(f"{_quote(column)} REAL")
+            else:
+                column_defs.append(f"{_quote(column)} TEXT")
+
+        with self._connect() as conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {TABLE_NAME} ({', '.join(column_defs)})")
+            for column in INDEXED_COLUMNS:
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{TABLE_NAME}_{column} "
+                    f"ON {TABLE_NAME} ({_quote(column)})"
+                )
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {META_TABLE} (key TEXT PRIMARY KEY, value INTEGER)"
+            )
+            conn.execute(f"INSERT OR IGNORE INTO {META_TABLE} VALUES ('version', 0)")
+            conn.execute(f"INSERT OR IGNORE INTO {META_TABLE} VALUES ('defaults_filled', 0)")
+            self._fill_defaults(conn)
+
+    def _fill_defaults(self, conn):
+        """
+        Store the defaults of rows written without them, once per database.
+
+        Rows are inserted with their defaults filled (see _insert()), so
+        filters compare the bare, indexed columns; this backfills rows
+        stored before that. They already read back with their defaults, so
+        the ledger version is unchanged.
+        """
+        filled = conn.execute(f"SELECT value FROM {META_TABLE} WHERE key = 'defaults_filled'").fetchone()[0]
+        if filled:
+            return
+        existing = self._table_columns(conn)
+        for column, default in LEDGER_DEFAULTS.items():
+            if column in existing:
+                conn.execute(
+                    f"UPDATE {TABLE_NAME} SET {_quote(column)} = ? WHERE {_quote(column)} IS NULL", (default,)
+                )
+        conn.execute(f"UPDATE {META_TABLE} SET value = 1 WHERE key = 'defaults_filled'")
+
+    def _read_version(self, conn):
+        return conn.execute(f"SELECT value FROM {META_TABLE} WHERE key = 'version'").fetchone()[0]
+
+    def _bump_version(self, conn):
+        conn.execute(f"UPDATE {META_TABLE} SET value = value + 1 WHERE key = 'version'")
+        return self._read_version(conn)
+
+    def version(self):
+        """Current ledger version, incremented by every append, delete and rewrite."""
+        with self._connect() as conn:
+            return self._read_version(conn)
+
+    def _table_columns(self, conn):
+        return [row[1] for row in conn.execute(f"PRAGMA table_info({TABLE_NAME})")]
+
+    def _insert(self, conn, data):
+        """Insert rows with their defaults filled, adding columns for any fields not yet in the table."""
+        data = apply_schema(data)
+        existing = self._table_columns(conn)
+        for column in data.columns:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN {_quote(column)}")
+
+        records = format_dates(data).astype(object).where(data.notna(), None)
+        columns = ", ".join(_quote(column) for column in records.columns)
+        placeholders = ", ".join("?" for _ in records.columns)
+        conn.executemany(
+            f"INSERT OR IGNORE INTO {TABLE_NAME} ({columns}) VALUES ({placeholders})",
+            records.itertuples(index=False, name=None),
+        )
+
+    def _read(self, where="", params=()):
+        with self._connect() as conn:
+            data = pd.read_sql_query(
+                f"SELECT * FROM {TABLE_NAME} {where} ORDER BY rowid", conn, params=params
+            )
+        return self.normalize(data)
+
+    def load(self):
+        """
+        Load the full ledger.
+
+        Returns:
+            pandas.DataFrame: Emissions data with typed columns
+        """
+        return self._read()
+
+    def load_versioned(self):
+        """
+        Load the full ledger together with the version it was read at.
+
+        Returns:
+            tuple: (pandas.DataFrame emissions data, int version)
+        """
+        with self._connect() as conn:
+            # One read transaction, so the rows and version are consistent
+            conn.execute("BEGIN")
+            data = pd.read_sql_query(f"SELECT * FROM {TABLE_NAME} ORDER BY rowid", conn)
+            version = self._read_version(conn)
+        return self.normalize(data), version
+
+    def normalize(self, data):
+        """Convert data to the column types returned by load()."""
+        return apply_schema(data)
+
+    def append_versioned(self, entries):
+        """
+        Insert new emission entries.
+
+        Args:
+            entries (pandas.DataFrame): New emission entries; any entry_id
+                column is replaced by newly assigned ids
+
+        Returns:
+            tuple: (pandas.DataFrame entries with an entry_id assigned to
+                each row, int version the insert produced)
+        """
+        # Ids are only ever assigned here, so they are unique across the ledger
+        entries = entries.drop(columns="entry_id", errors="ignore")
+        entries.insert(0, "entry_id", [new_entry_id() for _ in range(len(entries))])
+
+        with self._write_lock, self._connect() as conn:
+            # Take the write lock first, so the version read back is this write's
+            conn.execute("BEGIN IMMEDIATE")
+            self._insert(conn, entries)
+            version = self._bump_version(conn)
+        return self.normalize(entries), version
+
+    def append(self, entries):
+        """
+        Insert new emission entries.
+
+        Args:
+            entries (pandas.DataFrame): New emission entries
+
+        Returns:
+            pandas.DataFrame: The entries with an entry_id assigned to each row
+        """
+        return self.append_versioned(entries)[0]
+
+    def delete_versioned(self, entry_ids):
+        """
+        Delete emission entries.
+
+        Args:
+            entry_ids (list): Ids of the entries to delete
+
+        Returns:
+            int: Version the delete produced
+        """
+        with self._write_lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                f"DELETE FROM {TABLE_NAME} WHERE entry_id = ?",
+                [(entry_id,) for entry_id in entry_ids],
+            )
+            return self._bump_version(conn)
+
+    def delete(self, entry_ids):
+        """
+        Delete emission entries.
+
+        Args:
+            entry_ids (list): Ids of the entries to delete
+        """
+        self.delete_versioned(entry_ids)
+
+    def rewrite(self, data, expected_version=None):
+        """
+        Replace the whole ledger with the given data.
+
+        Args:
+            data (pandas.DataFrame): Complete emissions data
+            expected_version (int, optional): Version the data was derived from;
+                if the ledger has moved on since, nothing is written
+
+        Returns:
+            int: The new ledger version
+
+        Raises:
+            LedgerConflictError: If expected_version is not the current version
+        """
+        data = data.copy()
+        if "entry_id" not in data.columns:
+            data.insert(0, "entry_id", [new_entry_id() for _ in range(len(data))])
+
+        with self._write_lock, self._connect() as conn:
+            # Take the write lock before checking the version
+            conn.execute("BEGIN IMMEDIATE")
+            version = self._read_version(conn)
+            if expected_version is not None and expected_version != version:
+                raise LedgerConflictError(expected_version, version)
+            conn.execute(f"DELETE FROM {TABLE_NAME}")
+            self._insert(conn, data)
+            return self._bump_version(conn)
+
+    def signature(self):
+        """Fingerprint of the database files, which changes on every commit."""
+        return file_signature([self.db_path, f"{self.db_path}-wal"])
+
+    def compact(self):
+        """SQLite writes in place, so there is nothing to compact."""
+        return False
+
+    def compact_async(self):
+        pass
+
+    @staticmethod
+    def _where(start_date=None, end_date=None, not_null=(), **filters):
+        """Build a WHERE clause and its parameters; not_null lists columns that must be set."""
+        clauses = [f"{_quote(column)} IS NOT NULL" for column in not_null]
+        params = []
+        if start_date is not None:
+            clauses.append("date >= ?")
+            params.append(pd.Timestamp(start_date).strftime("%Y-%m-%d"))
+        if end_date is not None:
+            clauses.append("date <= ?")
+            params.append(pd.Timestamp(end_date).strftime("%Y-%m-%d"))
+        for column, value in filters.items():
+            if value is None:
+                continue
+            if column not in QUERY_COLUMNS:
+                raise ValueError(f"Cannot filter on column: {column}")
+            # Defaults are stored with the rows, so the column's index applies
+            expression = _quote(column)
+            if isinstance(value, (list, tuple, set)):
+                clauses.append(f"{expression} IN ({', '.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                clauses.append(f"{expression} = ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def query(self, start_date=None, end_date=None, **filters):
+        """
+        Read only the rows matching the given filters.
+
+        Args:
+            start_date (datetime, optional): Inclusive start date
+            end_date (datetime, optional): Inclusive end date
+            **filters: Filters on ledger columns, a value or a list of
+                accepted values, e.g. scope="Scope 1" or country=["India", "Germany"]
+
+        Returns:
+            pandas.DataFrame: Matching emissions data
+        """
+        where, params = self._where(start_date, end_date, **filters)
+        return self._read(where, params)
+
+    def aggregate(self, group_by, start_date=None, end_date=None, **filters):
+        """
+        Sum emissions per group in SQL.
+
+        Args:
+            group_by (list): Columns to group by; "month" groups by YYYY-MM
+            start_date (datetime, optional): Inclusive start date
+            end_date (datetime, optional): Inclusive end date
+            **filters: Equality filters on ledger columns
+
+        Returns:
+            pandas.DataFrame: One row per group with emissions_kgCO2e and entries;
+                rows missing a group value (e.g. undated rows when grouping by
+                month) are left out, as in a pandas groupby
+        """
+        select = []
+        not_null = []
+        for column in group_by:
+            if column == "month":
+                select.append("substr(date, 1, 7) AS month")
+                not_null.append("date")
+            elif column in QUERY_COLUMNS:
+                select.append(_quote(column))
+                not_null.append(column)
+            else:
+                raise ValueError(f"Cannot group by column: {column}")
+
+        where, params = self._where(start_date, end_date, not_null, **filters)
+        group_clause = f"GROUP BY {', '.join(str(i + 1) for i in range(len(group_by)))}" if group_by else ""
+        sql = (
+            f"SELECT {', '.join(select + ['SUM(emissions_kgCO2e) AS emissions_kgCO2e', 'COUNT(*) AS entries'])} "
+            f"FROM {TABLE_NAME} {where} {group_clause}"
+        )
+        with self._connect() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+
+def migrate_ledger_to_sqlite(store, data):
+    """
+    Copy an existing ledger into an empty SQLite store.
+
+    Args:
+        store (SqliteLedgerStore): Target store
+        data (pandas.DataFrame): Ledger loaded from the JSON snapshot and journal
+
+    Returns:
+        bool: True if rows were migrated
+    """
+    with store._connect() as conn:
+        has_rows = conn.execute(f"SELECT 1 FROM {TABLE_NAME} LIMIT 1").fetchone() is not None
+    if has_rows or len(data) == 0:
+        return False
+    store.rewrite(data)
+    return True
@@ -0,0 +1,285 @@
+"""
+Storage backends for YourCarbonFootprint application.
+Read and write the compacted emissions snapshot in different file formats.
+"""
+
+import json
+import os
+import uuid
+from datetime import date, datetime
+
+import pandas as pd
+
+from config import DATA_DIR, LEDGER_COLUMNS, LEDGER_DEFAULTS, LEDGER_SCHEMA
+from file_utils import atomic_write
+
+# Text columns with few distinct values, stored as categoricals
+CATEGORICAL_COLUMNS = [column for column, dtype in LEDGER_SCHEMA.items() if dtype == "category"]
+
+# Numeric columns, stored as float64
+FLOAT_COLUMNS = [column for column, dtype in LEDGER_SCHEMA.items() if dtype == "float64"]
+
+
+class LedgerConflictError(Exception):
+    """Raised when the ledger changed since the version a writer started from."""
+
+    def __init__(self, expected_version, current_version):
+        super().__init__(
+            f"Ledger changed concurrently (expected version {expected_version}, "
+            f"found {current_version})"
+        )
+        self.expected_version = expected_version
+        self.current_version = current_version
+
+
+def new_entry_id():
+    """Return a new unique identifier for an emission entry."""
+    return uuid.uuid4().hex
+
+
+def file_signature(paths):
+    """
+    Fingerprint files by name, modification time and size.
+
+    Args:
+        paths (list): File paths; missing files are skipped
+
+    Returns:
+        tuple: Hashable signature that changes when any file changes
+    """
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        signature.append((os.path.basename(path), stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def format_dates(data):
+    """
+    Format the date column of a dataframe as YYYY-MM-DD strings.
+
+    Args:
+        data (pandas.DataFrame): Emissions data
+
+    Returns:
+        pandas.DataFrame: Copy of the data with string dates
+    """
+    data = data.copy()
+    if "date" in data.columns:
+        if pd.api.types.is_datetime64_any_dtype(data["date"]):
+            data["date"] = data["date"].dt.strftime("%Y-%m-%d")
+        else:
+            data["date"] = data["date"].map(
+                lambda value: value.strftime("%Y-%m-%d")
+                if isinstance(value, (datetime, date))
+                else value
+            )
+    return data
+
+
+def _has_schema_type(series, dtype):
+    if dtype == "category":
+        return isinstance(series.dtype, pd.CategoricalDtype)
+    if dtype == "float64":
+        return series.dtype == "float64"
+    if dtype.startswith("datetime64"):
+        # Any resolution, e.g. datetime64[us] as read back from Arrow
+        return pd.api.types.is_datetime64_dtype(series.dtype)
+    # Free text: object or pandas string columns
+    return pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype)
+
+
+def _convert(series, dtype):
+    if dtype.startswith("datetime64"):
+        return pd.to_datetime(series, errors="coerce")
+    if dtype == "float64":
+        return pd.to_numeric(series, errors="coerce").astype("float64")
+    return series.astype(dtype)
+
+
+def apply_schema(data):
+    """
+    Convert emissions data to the declared ledger schema.
+
+    Missing enterprise fields are filled with their defaults, columns are
+    put in schema order (extra columns follow) and converted to their
+    declared types. Columns that already have the right type are left as is,
+    so applying the schema twice is cheap.
+
+    Args:
+        data (pandas.DataFrame): Emissions data
+
+    Returns:
+        pandas.DataFrame: Data with datetime64 dates, categorical text
+            dimensions and float64 measures
+    """
+    data = data.copy()
+    for column, default in LEDGER_DEFAULTS.items():
+        if column not in data.columns:
+            data[column] = default
+        elif data[column].isna().any():
+            data[column] = data[column].fillna(default)
+    for column in LEDGER_COLUMNS:
+        if column not in data.columns:
+            data[column] = None
+
+    for column, dtype in LEDGER_SCHEMA.items():
+        if not _has_schema_type(data[column], dtype):
+            data[column] = _convert(data[column], dtype)
+
+    extra_columns = [column for column in data.columns if column not in LEDGER_SCHEMA]
+    return data[LEDGER_COLUMNS + extra_columns]
+
+
+def concat_ledger(frames):
+    """
+    Concatenate ledger frames, keeping categorical columns categorical.
+
+    pandas falls back to object dtype when categoricals with different
+    categories are concatenated, so the categories are unioned first.
+
+    Args:
+        frames (list): Frames already converted with apply_schema()
+
+    Returns:
+        pandas.DataFrame: Concatenated data
+    """
+    frames = [frame for frame in frames if len(frame) > 0]
+    if not frames:
+        return apply_schema(pd.DataFrame(columns=LEDGER_COLUMNS))
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+
+    frames = [frame.copy() for frame in frames]
+    for column in CATEGORICAL_COLUMNS:
+        # Keep the first frame's categories (and codes) and add new ones after
+        categories = frames[0][column].cat.categories
+        for frame in frames[1:]:
+            new_categories = frame[column].cat.categories.difference(categories)
+            if len(new_categories) > 0:
+                categories = categories.append(new_categories)
+        for frame in frames:
+            if not frame[column].cat.categories.equals(categories):
+                frame[column] = frame[column].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+class JsonBackend:
+    """Snapshot stored as a JSON list of records with string dates."""
+
+    name = "json"
+    extension = ".json"
+
+    def __init__(self, path):
+        """Initialize the JsonBackend class."""
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def read(self):
+        """
+        Read the snapshot.
+
+        Returns:
+            pandas.DataFrame: Snapshot data. Raises json.JSONDecodeError if corrupted.
+        """
+        if not self.exists():
+            return pd.DataFrame(columns=LEDGER_COLUMNS)
+        with open(self.path, "r") as f:
+            raw = f.read().strip()
+        if not raw:
+            return pd.DataFrame(columns=LEDGER_COLUMNS)
+        return pd.DataFrame(json.loads(raw))
+
+    def write(self, data, path):
+        """Write the snapshot to the given path."""
+        with open(path, "w") as f:
+            json.dump(format_dates(data).to_dict("records"), f, default=str)
+
+    def normalize(self, data):
+        """Convert data to the declared ledger schema."""
+        return apply_schema(data)
+
+
+class ParquetBackend:
+    """Snapshot stored as a columnar Parquet file with typed columns."""
+
+    name = "parquet"
+    extension = ".parquet"
+
+    def __init__(self, path):
+        """Initialize the ParquetBackend class."""
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def read(self):
+        """
+        Read the snapshot.
+
+        Returns:
+            pandas.DataFrame: Snapshot data with typed columns
+        """
+        if not self.exists():
+            return pd.DataFrame(columns=LEDGER_COLUMNS)
+        return pd.read_parquet(self.path, engine="pyarrow")
+
+    def write(self, data, path):
+        """Write the snapshot to the given path."""
+        # Journal rows can carry mixed types, so coerce before handing to Arrow
+        self.normalize(data).to_parquet(path, engine="pyarrow", index=False)
+
+    def normalize(self, data):
+        """Convert data to the declared ledger schema."""
+        return apply_schema(data)
+
+
+BACKENDS = {
+    JsonBackend.name: JsonBackend,
+    ParquetBackend.name: ParquetBackend,
+}
+
+
+def get_backend(name, data_dir=DATA_DIR):
+    """
+    Create the snapshot backend for a name.
+
+    Args:
+        name (str): Backend name ("json" or "parquet")
+        data_dir (str): Directory holding the snapshot
+
+    Returns:
+        Backend instance storing data_dir/emissions.<ext>
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown ledger backend: {name}. Available: {', '.join(BACKENDS)}")
+    backend_class = BACKENDS[name]
+    return backend_class(os.path.join(data_dir, f"emissions{backend_class.extension}"))
+
+
+def migrate_json_snapshot(backend, json_path):
+    """
+    Migrate a legacy emissions.json snapshot into another backend, once.
+
+    The JSON file is renamed to <name>.migrated afterwards so the migration
+    is not repeated and the old file is kept for reference.
+
+    Args:
+        backend: Target backend
+        json_path (str): Path of the legacy JSON snapshot
+
+    Returns:
+        bool: True if a migration was performed
+    """
+    if backend.name == JsonBackend.name or backend.exists() or not os.path.exists(json_path):
+        return False
+
+    data = JsonBackend(json_path).read()
+    atomic_write(backend.path, lambda tmp_path: backend.write(data, tmp_path))
+    os.replace(json_path, f"{json_path}.migrated")
+    return True
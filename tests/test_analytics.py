@@ -0,0 +1,22 @@
+import pandas as pd
+
+from analytics import EmissionsAnalytics
+
+
+def _analytics():
+    data = pd.DataFrame({
+        "date": pd.to_datetime(["2024-01-15", "2024-02-15", "2024-03-15", "2024-04-15", "2024-05-15"]),
+        "scope": ["Scope 1", "Scope 2", "Scope 1", "Scope 2", "Scope 1"],
+        "emissions_kgCO2e": [2.0, 4.0, 6.0, 8.0, 10.0],
+    })
+    return EmissionsAnalytics(data)
+
+
+def test_cumulative_to_date_from_all_history():
+    analytics = _analytics()
+    assert analytics.cumulative_to_date("2024-03-31")["total"] == 12.0
+    assert analytics.cumulative_to_date("2024-03-31", by="scope").to_dict() == {"Scope 1": 8.0, "Scope 2": 4.0}
+
+
+def test_cumulative_to_date_from_start():
+    assert _analytics().cumulative_to_date("2024-03-31", start="2024-02-01")["total"] == 10.0
@@ -0,0 +1,96 @@
+import pandas as pd
+import pytest
+
+from content_index import ContentIndex, ImportFilter, content_hashes
+from csv_import import iter_csv_chunks, normalize_chunk
+from ledger_store import LedgerStore
+from shared_ledger import SharedLedger
+from storage_backends import JsonBackend
+
+
+def _entries(activities, quantity=1.0):
+    return normalize_chunk(pd.DataFrame({
+        "date": "2024-01-01",
+        "scope": "Scope 1",
+        "category": "Fuel",
+        "activity": activities,
+        "quantity": quantity,
+        "unit": "L",
+        "emission_factor": 2.0,
+    }))
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    store = LedgerStore(JsonBackend(str(tmp_path / "emissions.json")), str(tmp_path / "journal"))
+    return SharedLedger(store, str(tmp_path / "ledger.arrow"))
+
+
+def test_hash_is_the_same_for_imported_and_stored_rows(ledger):
+    entries = _entries(["a", "b"])
+    ledger.append(entries)
+
+    # Stored rows have entry ids and categorical columns; the hash ignores both
+    assert content_hashes(ledger.frame()).tolist() == content_hashes(entries).tolist()
+    assert content_hashes(ledger.store.load()).tolist() == content_hashes(entries).tolist()
+
+
+def test_hash_changes_with_any_value():
+    hashes = content_hashes(pd.concat([_entries(["a"]), _entries(["b"]), _entries(["a"], quantity=2.0)]))
+
+    assert len(set(hashes.tolist())) == 3
+
+
+def test_repeated_rows_are_kept_as_often_as_they_are_new():
+    index = ContentIndex(_entries(["a", "b"]))
+
+    new = index.new_rows(_entries(["a", "a", "a", "b", "c"]))
+
+    # One "a" and the "b" are in the ledger already
+    assert new.tolist() == [False, True, True, False, True]
+
+
+def test_rows_are_counted_across_the_chunks_of_a_file():
+    select = ImportFilter(ContentIndex(_entries(["a"])))
+
+    assert select.new_rows(_entries(["a"])).tolist() == [False]
+    assert select.new_rows(_entries(["a", "b"])).tolist() == [True, True]
+
+
+def test_overlapping_files_add_shared_rows_once():
+    select = ImportFilter(ContentIndex())
+
+    assert select.new_rows(_entries(["a", "b"])).tolist() == [True, True]
+    select.next_file()
+    assert select.new_rows(_entries(["b", "c"])).tolist() == [False, True]
+
+
+def test_removed_rows_count_as_new_again():
+    entries = _entries(["a"])
+    index = ContentIndex(entries)
+
+    index.remove(entries)
+
+    assert index.new_rows(entries).tolist() == [True]
+
+
+def test_reimporting_a_file_adds_nothing(ledger, tmp_path):
+    path = tmp_path / "entries.csv"
+    _entries(["a", "b", "c"]).assign(date="2024-01-01").to_csv(path, index=False)
+
+    assert ledger.append_chunks(iter_csv_chunks(path, chunk_rows=2)) == (3, 0)
+    assert ledger.append_chunks(iter_csv_chunks(path, chunk_rows=2)) == (0, 3)
+    assert len(ledger.store.load()) == 3
+
+    # Deleting a row lets the next import restore it
+    ledger.delete([ledger.frame()["entry_id"].iloc[0]])
+    assert ledger.append_chunks(iter_csv_chunks(path)) == (1, 2)
+
+
+def test_batch_of_files_skips_rows_file_by_file(ledger):
+    ledger.append(_entries(["a"]))
+
+    appended, skipped = ledger.append_files([_entries(["a", "b"]), _entries(["b", "c", "c"])])
+
+    assert (appended, skipped) == (3, 2)
+    assert sorted(ledger.frame()["activity"].tolist()) == ["a", "b", "c", "c"]
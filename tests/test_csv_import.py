@@ -0,0 +1,73 @@
+import pandas as pd
+import pytest
+
+from csv_import import CSVImportError, iter_csv_chunks
+from shared_ledger import SharedLedger
+from sqlite_store import SqliteLedgerStore
+
+
+def _entries(rows):
+    return pd.DataFrame({
+        "date": pd.date_range("2024-01-01", periods=rows, freq="D"),
+        "scope": ["Scope 1", "Scope 2"] * (rows // 2) + ["Scope 1"] * (rows % 2),
+        "category": "Electricity",
+        "activity": [f"Meter {i}" for i in range(rows)],
+        "quantity": [float(i + 1) for i in range(rows)],
+        "unit": "kWh",
+        "emission_factor": 0.5,
+    })
+
+
+def _write_csv(data, path):
+    data.assign(date=data["date"].dt.strftime("%Y-%m-%d")).to_csv(path, index=False)
+    return path
+
+
+def test_chunks_are_normalized_and_bounded(tmp_path):
+    path = _write_csv(_entries(5), tmp_path / "entries.csv")
+    progress = []
+
+    chunks = list(iter_csv_chunks(path, chunk_rows=2, progress=lambda done, total: progress.append((done, total))))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert progress == [(2, 5), (4, 5), (5, 5)]
+    data = pd.concat(chunks, ignore_index=True)
+    assert data["emissions_kgCO2e"].tolist() == [0.5, 1.0, 1.5, 2.0, 2.5]
+    assert pd.api.types.is_datetime64_any_dtype(data["date"])
+    assert (data["notes"] == "").all()
+
+
+def test_invalid_file_yields_nothing(tmp_path):
+    data = _entries(5).astype({"quantity": object})
+    data.loc[4, "quantity"] = "lots"
+    chunks = iter_csv_chunks(_write_csv(data, tmp_path / "entries.csv"), chunk_rows=2)
+
+    with pytest.raises(CSVImportError, match="rows 5-5"):
+        next(chunks)
+
+
+def test_missing_columns_are_reported(tmp_path):
+    path = _write_csv(_entries(2).drop(columns=["unit"]), tmp_path / "entries.csv")
+
+    with pytest.raises(CSVImportError, match="unit"):
+        next(iter_csv_chunks(path))
+
+
+def test_reimported_export_gets_new_entry_ids(tmp_path):
+    ledger = SharedLedger(SqliteLedgerStore(str(tmp_path / "ledger.db")), str(tmp_path / "ledger.arrow"))
+    ledger.append(_entries(3))
+    # An export as written before entry ids were left out of exports
+    path = _write_csv(ledger.frame(), tmp_path / "export.csv")
+
+    appended, skipped = ledger.append_chunks(iter_csv_chunks(path), skip_existing=False)
+
+    assert (appended, skipped) == (3, 0)
+    frame = ledger.frame()
+    assert len(frame) == 6
+    assert frame["entry_id"].is_unique
+    assert len(ledger.store.load()) == 6
+
+    ledger.delete([frame["entry_id"].iloc[0]])
+
+    assert len(ledger.frame()) == 5
+    assert len(ledger.store.load()) == 5
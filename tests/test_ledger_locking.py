@@ -0,0 +1,127 @@
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+from file_utils import file_lock
+from ledger_store import LedgerStore, merge_concurrent_changes
+from storage_backends import JsonBackend, LedgerConflictError
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Appends entries one at a time to a ledger, as an app process would
+APPEND_SCRIPT = """
+import sys
+import pandas as pd
+from ledger_store import LedgerStore
+from storage_backends import JsonBackend
+
+snapshot, journal_dir, name, count = sys.argv[1:]
+# Small segments, so compactions run while the other processes append
+store = LedgerStore(JsonBackend(snapshot), journal_dir, segment_bytes=2048)
+for number in range(int(count)):
+    store.append(pd.DataFrame([{
+        "date": pd.Timestamp("2024-01-01"), "scope": "Scope 1", "category": "Fuel",
+        "activity": f"{name} {number}", "quantity": 1.0, "unit": "L",
+        "emission_factor": 2.0, "emissions_kgCO2e": 2.0, "notes": "",
+    }]))
+store.compact()
+"""
+
+# Tries to take a lock without waiting and prints whether it got it
+TRY_LOCK_SCRIPT = """
+import sys
+from file_utils import file_lock
+
+with file_lock(sys.argv[1], shared=sys.argv[2] == "shared", blocking=False) as acquired:
+    print(acquired)
+"""
+
+
+def _run(script, *args):
+    return subprocess.Popen(
+        [sys.executable, "-c", script, *map(str, args)],
+        cwd=REPO_ROOT, stdout=subprocess.PIPE, text=True,
+    )
+
+
+def _entries(activities):
+    return pd.DataFrame({
+        "date": pd.Timestamp("2024-01-01"),
+        "scope": "Scope 1",
+        "category": "Fuel",
+        "activity": activities,
+        "quantity": 1.0,
+        "unit": "L",
+        "emission_factor": 2.0,
+        "emissions_kgCO2e": 2.0,
+        "notes": "",
+    })
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LedgerStore(JsonBackend(str(tmp_path / "emissions.json")), str(tmp_path / "journal"))
+
+
+def test_concurrent_processes_lose_no_appends(store):
+    processes = [
+        _run(APPEND_SCRIPT, store.snapshot_path, store.journal_dir, f"worker{number}", 25)
+        for number in range(4)
+    ]
+    for process in processes:
+        assert process.wait(timeout=120) == 0
+
+    data, version = store.load_versioned()
+
+    assert len(data) == 100
+    assert data["activity"].is_unique
+    assert data["entry_id"].is_unique
+    assert version == 100
+
+
+@pytest.mark.parametrize("shared, other, acquired", [
+    (False, "shared", "False"),
+    (False, "exclusive", "False"),
+    (True, "shared", "True"),
+    (True, "exclusive", "False"),
+])
+def test_lock_excludes_other_processes(tmp_path, shared, other, acquired):
+    path = tmp_path / "ledger.lock"
+    with file_lock(str(path), shared=shared):
+        output, _ = _run(TRY_LOCK_SCRIPT, path, other).communicate(timeout=60)
+
+    assert output.strip() == acquired
+
+
+def test_stale_rewrite_is_rejected(store):
+    store.append(_entries(["a"]))
+    data, version = store.load_versioned()
+    store.append(_entries(["b"]))
+
+    with pytest.raises(LedgerConflictError):
+        store.rewrite(data, expected_version=version)
+
+    assert store.load()["activity"].tolist() == ["a", "b"]
+    assert store.version() == 2
+
+
+def test_conflicting_edit_is_merged_and_retried(store):
+    store.append(_entries(["a", "b"]))
+    data, version = store.load_versioned()
+    base_ids = set(data["entry_id"])
+    # Another writer adds one entry and deletes another meanwhile
+    store.append(_entries(["c"]))
+    store.delete([data["entry_id"].iloc[0]])
+    edited = data.assign(quantity=[1.0, 5.0])
+
+    with pytest.raises(LedgerConflictError):
+        store.rewrite(edited, expected_version=version)
+    current, version = store.load_versioned()
+    store.rewrite(merge_concurrent_changes(edited, base_ids, current), expected_version=version)
+
+    merged = store.load()
+    assert merged["activity"].tolist() == ["b", "c"]
+    assert merged["quantity"].tolist() == [5.0, 1.0]
@@ -0,0 +1,120 @@
+import os
+
+import pandas as pd
+import pytest
+
+from report_charts import ChartCache
+from report_engine import ReportEngine, write_batch_reports
+from shared_ledger import SharedLedger
+from sqlite_store import SqliteLedgerStore
+
+
+def _entry(quantity, scope="Scope 1", activity="Boiler"):
+    return pd.DataFrame([{
+        "date": pd.Timestamp("2024-03-01"),
+        "scope": scope,
+        "category": "Fuel",
+        "activity": activity,
+        "quantity": quantity,
+        "unit": "L",
+        "emission_factor": 2.0,
+        "emissions_kgCO2e": 2.0 * quantity,
+        "notes": "",
+    }])
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return SharedLedger(SqliteLedgerStore(str(tmp_path / "ledger.db")), str(tmp_path / "ledger.arrow"))
+
+
+@pytest.fixture
+def engine(ledger, tmp_path):
+    return ReportEngine(ledger, charts=ChartCache(str(tmp_path / "charts")))
+
+
+class _CountingSource:
+    """A ledger source that counts how often its entries are read."""
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self.reads = 0
+
+    def get_filtered_data(self, start_date=None, end_date=None):
+        self.reads += 1
+        return self.ledger.get_filtered_data(start_date, end_date)
+
+    def report_version(self):
+        return self.ledger.report_version()
+
+
+def test_unchanged_report_is_rendered_once(ledger, tmp_path):
+    ledger.append(_entry(10.0))
+    source = _CountingSource(ledger)
+    engine = ReportEngine(source, charts=ChartCache(str(tmp_path / "charts")))
+
+    first = engine.render(company_info={"name": "Acme"})
+    again = engine.render(company_info={"name": "Acme"})
+
+    assert again is first
+    assert source.reads == 1
+
+
+def test_other_company_details_reuse_the_aggregates(ledger, tmp_path):
+    ledger.append(_entry(10.0))
+    source = _CountingSource(ledger)
+    engine = ReportEngine(source, charts=ChartCache(str(tmp_path / "charts")))
+
+    acme = engine.render(company_info={"name": "Acme"})
+    other = engine.render(company_info={"name": "Other"})
+
+    assert other != acme
+    assert source.reads == 1
+
+
+def test_ledger_changes_invalidate_the_report(ledger, engine):
+    ledger.append(_entry(10.0))
+    first = engine.render()
+    summary, _ = engine.sections()
+
+    ledger.append(_entry(5.0, scope="Scope 2"))
+
+    assert engine.render() != first
+    assert engine.sections()[0].total == summary.total + 10.0
+
+
+def test_chart_images_are_shared_between_engines(ledger, tmp_path):
+    ledger.append(_entry(10.0))
+    charts = ChartCache(str(tmp_path / "charts"))
+    paths = charts.report_charts(ReportEngine(ledger, charts=charts).sections()[0])
+    inodes = [os.stat(path).st_ino for path in paths]
+
+    # A second engine, e.g. in another process, reuses the images as written
+    ReportEngine(ledger, charts=ChartCache(str(tmp_path / "charts"))).render()
+
+    assert sorted(os.listdir(tmp_path / "charts")) == sorted(os.path.basename(path) for path in paths)
+    assert [os.stat(path).st_ino for path in paths] == inodes
+
+
+@pytest.mark.parametrize("quantities", [[0.0], [-5.0], [-5.0, 0.0]])
+def test_report_without_positive_scope_totals(ledger, engine, quantities):
+    for position, quantity in enumerate(quantities):
+        ledger.append(_entry(quantity, scope=f"Scope {position + 1}"))
+
+    assert engine.render().startswith(b"%PDF")
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_batch_keeps_writing_after_a_failed_group(tmp_path, max_workers):
+    data = pd.concat([_entry(1.0), _entry(2.0), _entry(3.0)], ignore_index=True)
+    data["business_unit"] = ["A", "B", "C"]
+    output_dir = tmp_path / "reports"
+    # B's report cannot be written where a directory is in the way
+    (output_dir / "business_unit_B.csv").mkdir(parents=True)
+
+    results = write_batch_reports(data, "business_unit", str(output_dir), formats=("csv",), max_workers=max_workers)
+
+    assert list(results) == ["A", "B", "C"]
+    assert "error" in results["B"]
+    for value in ["A", "C"]:
+        assert pd.read_csv(results[value]["csv"])["business_unit"].tolist() == [value]
@@ -0,0 +1,115 @@
+import json
+import subprocess
+import sys
+import time
+
+import pytest
+
+from report_jobs import DONE, FAILED, RUNNING, ReportJobQueue
+
+
+def _wait(queue, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while queue.get(job_id)["status"] not in (DONE, FAILED):
+        assert time.monotonic() < deadline, "job did not finish"
+        time.sleep(0.01)
+    return queue.get(job_id)
+
+
+def _persist(reports_dir, job_id, **fields):
+    job = {
+        "id": job_id,
+        "kind": "csv",
+        "file_name": f"{job_id}.csv",
+        "mime": "text/csv",
+        "status": RUNNING,
+        "progress": 0.5,
+        "error": None,
+        "submitted_at": "2099-01-01T00:00:00",
+        "finished_at": None,
+        **fields,
+    }
+    (reports_dir / f"{job_id}.json").write_text(json.dumps(job))
+    (reports_dir / f"{job_id}.csv").write_bytes(b"a,b\n")
+
+
+@pytest.fixture
+def other_process():
+    process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    yield process
+    process.kill()
+    process.wait()
+
+
+def test_finished_job_can_be_read(tmp_path):
+    queue = ReportJobQueue(str(tmp_path))
+
+    def render(progress):
+        progress(0.5)
+        return b"a,b\n1,2\n"
+
+    job = _wait(queue, queue.submit("csv", render, "data.csv"))
+
+    assert job["status"] == DONE
+    assert job["progress"] == 1.0
+    assert queue.read(job["id"]) == b"a,b\n1,2\n"
+    # The state on disk is listed again by a new queue
+    assert ReportJobQueue(str(tmp_path)).read(job["id"]) == b"a,b\n1,2\n"
+
+
+def test_failed_job_records_its_error(tmp_path):
+    queue = ReportJobQueue(str(tmp_path))
+
+    def render(progress):
+        raise ValueError("no data")
+
+    job = _wait(queue, queue.submit("pdf", render, "report.pdf"))
+
+    assert job["status"] == FAILED
+    assert job["error"] == "no data"
+    assert queue.read(job["id"]) is None
+
+
+def test_expired_jobs_are_removed_with_their_files(tmp_path):
+    _persist(tmp_path, "old", status=DONE, submitted_at="2000-01-01T00:00:00", finished_at="2000-01-01T00:00:00")
+    _persist(tmp_path, "new", status=DONE, finished_at="2099-01-01T00:00:00")
+
+    queue = ReportJobQueue(str(tmp_path), retention_hours=1)
+
+    assert queue.get("old") is None
+    assert not (tmp_path / "old.json").exists()
+    assert not (tmp_path / "old.csv").exists()
+    assert queue.read("new") == b"a,b\n"
+
+
+def test_jobs_of_a_running_process_are_left_alone(tmp_path, other_process):
+    _persist(tmp_path, "theirs", pid=other_process.pid)
+
+    queue = ReportJobQueue(str(tmp_path))
+
+    assert queue.get("theirs")["status"] == RUNNING
+    assert json.loads((tmp_path / "theirs.json").read_text())["status"] == RUNNING
+
+
+def test_jobs_of_a_stopped_process_are_failed(tmp_path):
+    stopped = subprocess.Popen([sys.executable, "-c", "pass"])
+    stopped.wait()
+    _persist(tmp_path, "stopped", pid=stopped.pid)
+    # Written before jobs recorded their process
+    _persist(tmp_path, "legacy")
+
+    queue = ReportJobQueue(str(tmp_path))
+
+    for job_id in ["stopped", "legacy"]:
+        assert queue.get(job_id)["status"] == FAILED
+        assert json.loads((tmp_path / f"{job_id}.json").read_text())["status"] == FAILED
+
+
+def test_stale_jobs_are_removed_even_if_their_process_id_is_in_use(tmp_path, other_process):
+    _persist(tmp_path, "stale", pid=other_process.pid, submitted_at="2000-01-01T00:00:00")
+
+    queue = ReportJobQueue(str(tmp_path), retention_hours=1)
+
+    # Failed as interrupted, then removed as older than the retention period
+    assert queue.get("stale") is None
+    assert not (tmp_path / "stale.csv").exists()
@@ -0,0 +1,43 @@
+import pandas as pd
+
+from sqlite_store import SqliteLedgerStore
+
+
+def _store(tmp_path):
+    store = SqliteLedgerStore(str(tmp_path / "emissions.db"))
+    store.append(pd.DataFrame({
+        "date": pd.to_datetime(["2024-01-10", "2024-01-20", "2024-02-05", None]),
+        "scope": ["Scope 1", "Scope 2", "Scope 1", "Scope 1"],
+        "category": ["Fuel", "Electricity", "Fuel", "Fuel"],
+        "activity": ["Boiler", "Grid", "Boiler", "Boiler"],
+        "quantity": [1.0, 2.0, 3.0, 4.0],
+        "unit": ["L", "kWh", "L", "L"],
+        "emission_factor": 1.0,
+        "emissions_kgCO2e": [1.0, 2.0, 3.0, 4.0],
+        "notes": "",
+    }))
+    return store
+
+
+def test_monthly_aggregate_leaves_out_undated_rows(tmp_path):
+    store = _store(tmp_path)
+
+    monthly = store.aggregate(["month", "scope"])
+
+    assert monthly[["month", "scope", "emissions_kgCO2e"]].values.tolist() == [
+        ["2024-01", "Scope 1", 1.0],
+        ["2024-01", "Scope 2", 2.0],
+        ["2024-02", "Scope 1", 3.0],
+    ]
+
+
+def test_aggregate_keeps_undated_rows_without_month(tmp_path):
+    by_scope = _store(tmp_path).aggregate(["scope"]).set_index("scope")["emissions_kgCO2e"]
+
+    assert by_scope.to_dict() == {"Scope 1": 8.0, "Scope 2": 2.0}
+
+
+def test_query_filters_in_the_store(tmp_path):
+    data = _store(tmp_path).query("2024-01-15", "2024-12-31", scope=["Scope 1", "Scope 2"])
+
+    assert data["emissions_kgCO2e"].tolist() == [2.0, 3.0]